@@ -0,0 +1,229 @@
+"""
+Adaptive number of bootstrap replicates.
+
+Replicates are generated in batches until the Monte Carlo error of the
+interval endpoints is small compared to the interval itself. The standard
+error of an endpoint, the p-quantile of B replicates, is estimated from the
+distribution-free confidence interval of that quantile: the order statistics
+at B p -+ z sqrt(B p (1 - p)) cover it like a normal interval of z standard
+errors, so half their distance divided by z estimates the standard error
+without a density estimate. The endpoints are those of the requested
+interval: the alpha / 2 and 1 - alpha / 2 quantiles of the percentile
+interval, the quantiles at the ends of the shortest interval, or the
+bias-corrected and accelerated quantiles of the BCa interval, so the
+precision target holds for the interval that is reported.
+
+The batches are the tasks of ``parallel_replicates``: batch i is drawn from
+the i-th child of the root seed, so an adaptive run returns exactly the
+first B replicates of a fixed run with the same seed and task size, and the
+B it stops at does not depend on the number of workers.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import norm
+
+import instrumentation
+from intervals import bca_probabilities, shortest_interval
+from jackknife import acceleration, leave_one_out
+from parallel import TASK_SIZE
+from resampling import CHUNK_BYTES, multi_replicates
+
+INTERVALS = ('percentile', 'shortest', 'bca')
+
+AdaptiveReplicates = namedtuple('AdaptiveReplicates',
+                                ['replicates', 'n_replications', 'mcse',
+                                 'converged'])
+
+# smallest and largest number of replicates of an adaptive run
+MIN_REPLICATIONS = 1000
+MAX_REPLICATIONS = 100000
+
+
+def _sorted_quantile(replicates, probabilities):
+    # np.quantile (linear interpolation) of sorted replicates, with their own
+    # probabilities for every statistic in the last dimension
+    n = replicates.shape[-1]
+    p = np.broadcast_to(probabilities,
+                        replicates.shape[:-1] + np.shape(probabilities)[-1:])
+    position = p * (n - 1)
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below + 1, n - 1)
+    low = np.take_along_axis(replicates, below, axis=-1)
+    high = np.take_along_axis(replicates, above, axis=-1)
+    return low + (position - below) * (high - low)
+
+
+def _sorted_mcse(replicates, probabilities, coverage):
+    # half the distance of the order statistics around every quantile
+    p = np.asarray(probabilities, dtype=float)
+    z = norm.ppf(0.5 + coverage / 2)
+    spread = z * np.sqrt(p * (1 - p) / replicates.shape[-1])
+    low = _sorted_quantile(replicates, np.clip(p - spread, 0, 1))
+    high = _sorted_quantile(replicates, np.clip(p + spread, 0, 1))
+    return (high - low) / (2 * z)
+
+
+def quantile_mcse(replicates, probabilities, axis=-1, coverage=0.95):
+    """
+    Monte Carlo standard error of quantiles of bootstrap replicates.
+
+    Parameters
+    ----------
+    replicates : array-like
+        Bootstrap replicates of one or several statistics.
+    probabilities : array-like of float
+        The probabilities of the quantiles, e.g. (alpha / 2, 1 - alpha / 2),
+        the same for every statistic or with the other dimensions of the
+        replicates in front.
+    axis : int, optional
+        The axis holding the replicates. Default is the last one.
+    coverage : float, optional
+        The coverage of the order statistic interval the error is derived
+        from. Default is 0.95.
+
+    Returns
+    -------
+    ndarray
+        The standard errors, the probabilities in the last dimension.
+    """
+    replicates = np.sort(np.moveaxis(np.asarray(replicates, dtype=float), axis, -1),
+                         axis=-1)
+    return _sorted_mcse(replicates, probabilities, coverage)
+
+
+def _endpoints(replicates, interval, alpha, estimates, accelerations):
+    # probabilities of the quantiles at the ends of the requested interval,
+    # of shape (columns, statistics, 2)
+    if interval == 'percentile':
+        return np.array([alpha / 2, 1 - alpha / 2])
+    if interval == 'shortest':
+        bounds = shortest_interval(replicates, 1 - alpha)
+        below = np.sum(replicates < bounds[..., :1], axis=-1)
+        through = np.sum(replicates <= bounds[..., 1:], axis=-1)
+        return np.stack([below, through - 1], axis=-1) / (replicates.shape[-1] - 1)
+    return np.array([[bca_probabilities(replicates[j, i], estimates[j, i],
+                                        accelerations[j, i], alpha)
+                      for i in range(replicates.shape[1])]
+                     for j in range(replicates.shape[0])])
+
+
+def _batch(values, statistics, method, size, seed, chunk_bytes, bandwidth,
+           sample_size):
+    return multi_replicates(values, statistics, method, size,
+                            np.random.default_rng(seed), chunk_bytes, bandwidth,
+                            sample_size)
+
+
+def adaptive_replicates(values, statistics, method='percentile', alpha=0.05,
+                        tolerance=0.02, min_replications=MIN_REPLICATIONS,
+                        max_replications=MAX_REPLICATIONS, seed=None,
+                        n_workers=1, batch_size=TASK_SIZE,
+                        chunk_bytes=CHUNK_BYTES, bandwidth='silverman',
+                        sample_size=None, interval='percentile'):
+    """
+    Replicates of several statistics on several columns, as many as needed.
+
+    Batches of replicates are added until the Monte Carlo standard error of
+    every endpoint of every interval is at most ``tolerance`` times the
+    width of that interval.
+
+    Parameters
+    ----------
+    values : ndarray
+        Data of shape (n, columns).
+    statistics : sequence of functions
+        The statistics of interest.
+    method : str, optional
+        'percentile' (ordinary bootstrap), 'smoothed' or 'bayesian'.
+    alpha : float, optional
+        The significance level of the intervals. Default is 0.05.
+    tolerance : float, optional
+        The largest standard error of an endpoint relative to the interval
+        width. Default is 0.02.
+    min_replications : int, optional
+        The number of replicates before the first check. Default is 1000.
+    max_replications : int, optional
+        The number of replicates after which the run stops anyway.
+        Default is 100000.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed of the batches.
+    n_workers : int, optional
+        The number of worker processes; every round draws one batch per
+        worker. Default is 1.
+    batch_size : int, optional
+        The number of replicates per batch.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk within a batch.
+    bandwidth : str or float, optional
+        Kernel bandwidth of the smoothed bootstrap. Default is 'silverman'.
+    sample_size : int, optional
+        The size of each resample. Defaults to the size of the data.
+    interval : str, optional
+        The interval whose endpoints are checked: 'percentile' (default),
+        'shortest' or 'bca'.
+
+    Returns
+    -------
+    AdaptiveReplicates
+        The replicates of shape (columns, len(statistics), n_replications),
+        the number of replicates used, the standard errors of the lower and
+        upper endpoints relative to the interval widths (shape (columns,
+        len(statistics), 2)) and whether the tolerance was met.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"unknown interval: {interval!r}, expected one of {INTERVALS}")
+    values = np.asarray(values, dtype=float)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    statistics = list(statistics)
+    estimates = accelerations = None
+    if interval == 'bca':
+        estimates = np.array([[func(column) for func in statistics]
+                              for column in values.T])
+        accelerations = np.array([[acceleration(leave_one_out(column, func,
+                                                              chunk_bytes))
+                                   for func in statistics]
+                                  for column in values.T])
+    batches = []
+    total = 0
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+    profiled = executor is not None and instrumentation.enabled()
+    try:
+        while True:
+            # one batch per worker; the check below still goes batch by batch
+            remaining = max_replications - total
+            sizes = [size for size in (min(batch_size, remaining - i * batch_size)
+                                       for i in range(max(n_workers, 1)))
+                     if size > 0]
+            tasks = [(_batch, values, statistics, method, size, child, chunk_bytes,
+                      bandwidth, sample_size, profiled)
+                     for size, child in zip(sizes, seed.spawn(len(sizes)))]
+            results = (executor.map(instrumentation.run_task, tasks)
+                       if executor is not None
+                       else map(instrumentation.run_task, tasks))
+            for replicates, report in results:
+                instrumentation.merge(report)
+                batches.append(replicates)
+                total += replicates.shape[-1]
+                if total < min(min_replications, max_replications):
+                    continue
+                replicates = np.concatenate(batches, axis=-1)
+                batches = [replicates]
+                probabilities = _endpoints(replicates, interval, alpha, estimates,
+                                           accelerations)
+                ordered = np.sort(replicates, axis=-1)
+                bounds = _sorted_quantile(ordered, probabilities)
+                width = bounds[..., 1:] - bounds[..., :1]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    # a degenerate interval (zero width) has no error at all
+                    mcse = np.where(width > 0, _sorted_mcse(ordered, probabilities,
+                                                            0.95) / width, 0.0)
+                converged = bool(np.all(mcse <= tolerance))
+                if converged or total >= max_replications:
+                    return AdaptiveReplicates(replicates, total, mcse, converged)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
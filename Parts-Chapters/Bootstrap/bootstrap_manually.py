@@ -6,8 +6,11 @@
 # Percentile
 
 import numpy as np
+from resampling import sample_std
+from parallel import parallel_bootstrap
+from intervals import percentile_interval
 
-def percentile_bootstrap(data, statistic, alpha=0.05, n_bootstraps=1000):
+def percentile_bootstrap(data, statistic, alpha=0.05, n_bootstraps=1000, seed=None, n_workers=1):
     """
     Perform a percentile bootstrap on the data and compute the confidence interval for a given statistic.
 
@@ -16,40 +19,40 @@ def percentile_bootstrap(data, statistic, alpha=0.05, n_bootstraps=1000):
     statistic (function): A function that computes the statistic of interest on a data sample.
     alpha (float): The desired level of confidence, between 0 and 1.
     n_bootstraps (int): The number of bootstrap samples to generate.
+    seed (int): The seed of the random streams, the same seed gives the same interval.
+    n_workers (int): The number of worker processes.
 
     Returns:
     A tuple containing the lower and upper bounds of the confidence interval.
     """
 
-    # Generate n_bootstraps bootstrap samples
-    bootstraps = []
-    for i in range(n_bootstraps):
-        sample = np.random.choice(data, size=len(data), replace=True)
-        bootstraps.append(statistic(sample))
+    # Generate n_bootstraps bootstrap replicates of the statistic
+    bootstraps = parallel_bootstrap(data, statistic, 'percentile', n_bootstraps, seed, n_workers)
 
     # Compute the empirical percentiles of the bootstrap distribution
-    lower_percentile = np.percentile(bootstraps, 100 * alpha / 2)
-    upper_percentile = np.percentile(bootstraps, 100 * (1 - alpha / 2))
+    lower_percentile, upper_percentile = percentile_interval(bootstraps, alpha)
 
     # Return the confidence interval as a tuple
     return lower_percentile, upper_percentile
 
-This function takes in three required parameters: the original data to be bootstrapped (data), a function that computes the statistic of interest on a data sample (statistic), and the desired level of confidence for the confidence interval (alpha). It also takes an optional parameter specifying the number of bootstrap samples to generate (n_bootstraps), which defaults to 1000.
+# This function takes in three required parameters: the original data to be bootstrapped (data), a function that computes the statistic of interest on a data sample (statistic), and the desired level of confidence for the confidence interval (alpha). It also takes an optional parameter specifying the number of bootstrap samples to generate (n_bootstraps), which defaults to 1000.
 
-The function first generates n_bootstraps bootstrap samples by sampling from the original data with replacement. It then applies the statistic function to each bootstrap sample to compute the value of the statistic of interest. Next, it computes the lower and upper bounds of the confidence interval using the empirical percentiles of the bootstrap distribution, as determined by the desired level of confidence alpha. Finally, it returns the confidence interval as a tuple containing the lower and upper bounds.
+# The function first generates n_bootstraps bootstrap samples by sampling from the original data with replacement. It then applies the statistic function to each bootstrap sample to compute the value of the statistic of interest. Next, it computes the lower and upper bounds of the confidence interval using the empirical percentiles of the bootstrap distribution, as determined by the desired level of confidence alpha. Finally, it returns the confidence interval as a tuple containing the lower and upper bounds.
 
-To use this function, you would need to provide your own data and statistic arguments. For example, if you wanted to estimate the confidence interval for the mean of a dataset x, you could use the following code:
+# To use this function, you would need to provide your own data and statistic arguments. For example, if you wanted to estimate the confidence interval for the mean of a dataset x, you could use the following code:
     
-    lower, upper = percentile_bootstrap(x, np.mean)
-print(f"95% confidence interval for the mean: [{lower:.2f}, {upper:.2f}]")
+#    lower, upper = percentile_bootstrap(x, np.mean)
+#    print(f"95% confidence interval for the mean: [{lower:.2f}, {upper:.2f}]")
 
-This would call the percentile_bootstrap function with the dataset x and the np.mean function as the statistic argument, and return the 95% confidence interval for the mean as a tuple containing the lower and upper bounds. The f-string is used to print the confidence interval with two decimal places.
+# This would call the percentile_bootstrap function with the dataset x and the np.mean function as the statistic argument, and return the 95% confidence interval for the mean as a tuple containing the lower and upper bounds. The f-string is used to print the confidence interval with two decimal places.
 
 # Smoothed
 
 import numpy as np
+from parallel import parallel_bootstrap
+from intervals import percentile_interval
 
-def smoothed_bootstrap(data, n_bootstraps=1000, alpha=0.05):
+def smoothed_bootstrap(data, n_bootstraps=1000, alpha=0.05, bandwidth='silverman', seed=None, n_workers=1):
     """
     Computes smoothed bootstrap for mean and standard deviation of data.
     
@@ -61,6 +64,12 @@ def smoothed_bootstrap(data, n_bootstraps=1000, alpha=0.05):
         The number of bootstrap samples to generate. Default is 1000.
     alpha : float, optional
         The significance level used for computing confidence intervals. Default is 0.05.
+    bandwidth : str or float, optional
+        The bandwidth of the Gaussian kernel: 'silverman' (default), 'scott' or a number.
+    seed : int, optional
+        The seed of the random streams, the same seed gives the same result.
+    n_workers : int, optional
+        The number of worker processes. Default is 1.
     
     Returns:
     --------
@@ -68,50 +77,30 @@ def smoothed_bootstrap(data, n_bootstraps=1000, alpha=0.05):
         - The smoothed bootstrap mean and its confidence interval.
         - The smoothed bootstrap standard deviation and its confidence interval.
     """
-    n = len(data)
-    bootstrap_means = []
-    bootstrap_stds = []
-    for i in range(n_bootstraps):
-        sample_indices = np.random.choice(range(n), size=n, replace=True)
-        bootstrap_mean = np.mean(data[sample_indices])
-        bootstrap_std = np.std(data[sample_indices])
-        bootstrap_means.append(bootstrap_mean)
-        bootstrap_stds.append(bootstrap_std)
+    bootstrap_means, bootstrap_stds = parallel_bootstrap(
+        data, [np.mean, np.std], 'smoothed', n_bootstraps, seed, n_workers, bandwidth=bandwidth)
     
-    smoothed_means = []
-    smoothed_stds = []
-    for i in range(n_bootstraps):
-        kernel_weights = np.exp(-(i - np.arange(n_bootstraps))**2 / (2 * (alpha * n_bootstraps)**2))
-        smoothed_mean = np.sum(kernel_weights * bootstrap_means) / np.sum(kernel_weights)
-        smoothed_std = np.sum(kernel_weights * bootstrap_stds) / np.sum(kernel_weights)
-        smoothed_means.append(smoothed_mean)
-        smoothed_stds.append(smoothed_std)
-    
-    mean_ci = np.percentile(smoothed_means, [100 * alpha / 2, 100 * (1 - alpha / 2)])
-    std_ci = np.percentile(smoothed_stds, [100 * alpha / 2, 100 * (1 - alpha / 2)])
-    return (np.mean(smoothed_means), mean_ci), (np.mean(smoothed_stds), std_ci)
+    mean_ci, std_ci = percentile_interval([bootstrap_means, bootstrap_stds], alpha)
+    return (np.mean(bootstrap_means), mean_ci), (np.mean(bootstrap_stds), std_ci)
 
 # Here is an explanation of the code:
 
-#    The smoothed_bootstrap function takes in the data to be analyzed, the number of bootstrap samples to generate (n_bootstraps), and the     significance level used for computing confidence intervals (alpha).
-#    The function generates n_bootstraps bootstrap samples from the data and computes the mean and standard deviation of each sample.
-#    The function then computes a smoothed bootstrap estimate for the mean and standard deviation by applying a Gaussian kernel to the bootstrap means and standard deviations. The kernel width is controlled by the alpha parameter.
-#    Finally, the function computes confidence intervals for the smoothed bootstrap mean and standard deviation using the percentiles of the smoothed bootstrap estimates.
+#    The smoothed_bootstrap function takes in the data to be analyzed, the number of bootstrap samples to generate (n_bootstraps), the     significance level used for computing confidence intervals (alpha) and the kernel bandwidth rule (bandwidth).
+#    The function generates n_bootstraps bootstrap samples from the data and adds Gaussian kernel noise to every resampled observation, i.e. it samples from a kernel density estimate of the data instead of the data itself. The bandwidth is chosen by Silverman's or Scott's rule, and the jittered samples are rescaled so that they keep the variance of the data.
+#    All samples are generated in a single vectorized pass (in memory-bounded chunks), and the mean and standard deviation of each sample are computed along an axis.
+#    Finally, the function computes confidence intervals for the mean and standard deviation using the percentiles of the smoothed bootstrap estimates.
 #    The function returns a tuple containing the smoothed bootstrap mean and its confidence interval, and the smoothed bootstrap standard deviation and its confidence interval.
 
-#You can use this function like this:
+#You can use this function like this (see main below):
     
-data = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-mean, std = smoothed_bootstrap(data)
-print(f"Smoothed bootstrap mean: {mean[0]:.2f} ({mean[1][0]:.2f}, {mean[1][1]:.2f})")
-print(f"Smoothed bootstrap standard deviation: {std[0]:.2f} ({std[1][0]:.2f}, {std[1][1]:.2f})")
+#    mean, std = smoothed_bootstrap([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
 
 
 # Basic 
 
 import numpy as np
 
-def bootstrap_mean_std(data, n_bootstrap=1000):
+def bootstrap_mean_std(data, n_bootstrap=1000, seed=None, n_workers=1):
     """Calculate the bootstrap mean and standard deviation of a dataset.
     
     Parameters
@@ -120,19 +109,19 @@ def bootstrap_mean_std(data, n_bootstrap=1000):
         The dataset for which to calculate the bootstrap mean and standard deviation.
     n_bootstrap : int, optional
         The number of bootstrap samples to generate. Default is 1000.
+    seed : int, optional
+        The seed of the random streams, the same seed gives the same result.
+    n_workers : int, optional
+        The number of worker processes. Default is 1.
     
     Returns
     -------
     tuple
         A tuple containing the bootstrap mean and standard deviation.
     """
-    n = len(data)
-    bootstrap_means = np.zeros(n_bootstrap)
-    bootstrap_stds = np.zeros(n_bootstrap)
-    for i in range(n_bootstrap):
-        bootstrap_sample = np.random.choice(data, size=n, replace=True)
-        bootstrap_means[i] = np.mean(bootstrap_sample)
-        bootstrap_stds[i] = np.std(bootstrap_sample, ddof=1)
+    # both statistics are evaluated on the same bootstrap samples
+    bootstrap_means, bootstrap_stds = parallel_bootstrap(
+        data, [np.mean, sample_std(ddof=1)], 'percentile', n_bootstrap, seed, n_workers)
     bootstrap_mean = np.mean(bootstrap_means)
     bootstrap_std = np.mean(bootstrap_stds)
     return (bootstrap_mean, bootstrap_std)
@@ -143,8 +132,11 @@ def bootstrap_mean_std(data, n_bootstrap=1000):
 # Bayesian
 
 import numpy as np
+from resampling import CHUNK_BYTES, WEIGHTED_KINDS, statistic_kind
+from parallel import parallel_bootstrap
+from intervals import shortest_interval
 
-def bayesian_bootstrap(data, num_samples=1000):
+def bayesian_bootstrap(data, num_samples=1000, statistics=(np.mean, np.std), seed=None, n_workers=1):
     """
     Perform Bayesian bootstrap on data.
     
@@ -154,66 +146,54 @@ def bayesian_bootstrap(data, num_samples=1000):
         Input data.
     num_samples : int, optional
         Number of samples to generate.
+    statistics : sequence of functions, optional
+        Statistics to compute for every sample. Default is mean and standard deviation.
+    seed : int, optional
+        The seed of the random streams, the same seed gives the same samples.
+    n_workers : int, optional
+        The number of worker processes. Default is 1.
     
     Returns
     -------
-    resamples : ndarray
-        Array of resampled data.
+    replicates : ndarray
+        Array of the statistics with shape (len(statistics), num_samples).
+        These are the statistics of every sample, not the samples: earlier
+        versions returned the (num_samples, len(data)) matrix of resamples,
+        which the statistics no longer need.
     """
     
-    # Generate uniform weights for each data point
-    weights = np.ones_like(data) / len(data)
-    
-    # Generate resamples by drawing samples with replacement
-    # using the weights as probabilities
-    resamples = np.zeros((num_samples, len(data)))
-    for i in range(num_samples):
-        resamples[i] = np.random.choice(data, size=len(data), replace=True, p=weights)
-    
-    return resamples
-
-# To use this function, simply pass in your data as an array and specify the number of samples you want to generate (default is 1000). The function will return an array of resampled data with shape (num_samples, len(data)).
+    # Every sample is a flat Dirichlet weighting of the data points,
+    # the statistics are computed directly from the weights
+    return parallel_bootstrap(data, statistics, 'bayesian', num_samples, seed, n_workers)
 
-# Here's an example usage:
+# To use this function, simply pass in your data as an array and specify the number of samples you want to generate (default is 1000). The function will return an array of the weighted mean and standard deviation of every sample with shape (2, num_samples).
 
-# Generate some random data
-data = np.random.normal(loc=0, scale=1, size=100)
+# Here's an example usage (see main below):
 
-# Perform Bayesian bootstrap
-resamples = bayesian_bootstrap(data)
+#    mean, std = bayesian_bootstrap(np.random.normal(loc=0, scale=1, size=100))
 
-# Calculate mean and standard deviation of resampled data
-mean = np.mean(resamples, axis=1)
-std = np.std(resamples, axis=1)
 
-# Print results
-print("Mean:", np.mean(data))
-print("95% credible interval for mean:", np.percentile(mean, [2.5, 97.5]))
-print("Standard deviation:", np.std(data))
-print("95% credible interval for standard deviation:", np.percentile(std, [2.5, 97.5]))
 
+# Confidence intervals are a statistical measure used to estimate the range of values within which a population parameter is likely to fall. The following are some common methods used to calculate confidence intervals:
 
+# Standard Error Method: This method involves calculating the standard error of the sample mean and using it to construct a confidence interval.
 
-Confidence intervals are a statistical measure used to estimate the range of values within which a population parameter is likely to fall. The following are some common methods used to calculate confidence intervals:
+# T-distribution Method: This method is used when the sample size is small or the population standard deviation is unknown. It involves using the t-distribution instead of the normal distribution to construct the confidence interval.
 
-    Standard Error Method: This method involves calculating the standard error of the sample mean and using it to construct a confidence interval.
+# Bootstrap Method: This method involves generating a large number of bootstrap samples from the original sample and using these samples to estimate the confidence interval.
 
-    T-distribution Method: This method is used when the sample size is small or the population standard deviation is unknown. It involves using the t-distribution instead of the normal distribution to construct the confidence interval.
+# Bayesian Method: This method involves using prior knowledge or assumptions about the population to construct the confidence interval.
 
-    Bootstrap Method: This method involves generating a large number of bootstrap samples from the original sample and using these samples to estimate the confidence interval.
+# Asymptotic Method: This method is used when the sample size is large and involves using the central limit theorem to construct the confidence interval.
 
-    Bayesian Method: This method involves using prior knowledge or assumptions about the population to construct the confidence interval.
+# Exact Method: This method is used when the sample size is small and the population follows a normal distribution. It involves using the exact distribution of the sample mean to construct the confidence interval.
 
-    Asymptotic Method: This method is used when the sample size is large and involves using the central limit theorem to construct the confidence interval.
-
-    Exact Method: This method is used when the sample size is small and the population follows a normal distribution. It involves using the exact distribution of the sample mean to construct the confidence interval.
-
-The choice of method depends on the nature of the data, the size of the sample, and the assumptions made about the population.
+# The choice of method depends on the nature of the data, the size of the sample, and the assumptions made about the population.
 
 
 
 import numpy as np
-from scipy.stats import scoreatpercentile
+from intervals import percentile_interval
 
 def asymptotic_ci(bootstrap_statistics, ci=95):
     """
@@ -227,16 +207,22 @@ def asymptotic_ci(bootstrap_statistics, ci=95):
         A tuple containing the lower and upper bounds of the confidence interval.
     """
     # Calculate the empirical quantiles of the bootstrap statistics
-    alpha = (100 - ci) / 2
-    lower = scoreatpercentile(bootstrap_statistics, alpha)
-    upper = scoreatpercentile(bootstrap_statistics, 100 - alpha)
+    lower, upper = percentile_interval(bootstrap_statistics, (100 - ci) / 100)
 
     return lower, upper
 
 
-Percentile
+# Percentile
+
+# results of seeded calls on unchanged data come from .result-cache
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from result_cache import cached
 
-def appr_percentile_bootstrap(data, stat_func=np.mean, num_samples=20000, sample_size=None, alpha=0.05):
+@cached
+def appr_percentile_bootstrap(data, stat_func=np.mean, num_samples=20000, sample_size=None, alpha=0.05,
+                              seed=None, n_workers=1):
     """
     Perform a percentile bootstrap on the data and compute the confidence interval for a given statistic.
 
@@ -245,53 +231,38 @@ def appr_percentile_bootstrap(data, stat_func=np.mean, num_samples=20000, sample
     statistic (function): A function that computes the statistic of interest on a data sample.
     alpha (float): The desired level of confidence, between 0 and 1.
     n_bootstraps (int): The number of bootstrap samples to generate.
+    seed (int): The seed of the random streams, the same seed gives the same interval.
+    n_workers (int): The number of worker processes.
 
     Returns:
     A tuple containing the lower and upper bounds of the confidence interval.
     """
     
-    if sample_size is None:
-        sample_size = len(data)
-    
-    # Generate n_bootstraps bootstrap samples
-    bootstraps = []
-    for i in range(num_samples):
-        sample = np.random.choice(data, sample_size, replace=True)
-        bootstraps.append(stat_func(sample))
+    # Generate num_samples bootstrap replicates of the statistic
+    bootstraps = parallel_bootstrap(data, stat_func, 'percentile', num_samples, seed, n_workers,
+                                    sample_size=sample_size)
         
     # Compute the statistic and empirical percentiles of the bootstrap distribution
-    bootstrap_statistics = np.apply_along_axis(stat_func, axis = 0, arr=bootstraps)
-    statistic = np.mean(bootstrap_statistics)
-    lower_percentile = np.percentile(bootstraps, 100 * alpha / 2)
-    upper_percentile = np.percentile(bootstraps, 100 * (1 - alpha / 2))
+    statistic = np.mean(bootstraps)
+    lower_percentile, upper_percentile = percentile_interval(bootstraps, alpha)
 
     # Return the confidence interval as a tuple
     return statistic, lower_percentile, upper_percentile
 
-# apply the 'appr_percentile_bootstrap' function to data
-tp_percentile_bootstrap_mean = appr_percentile_bootstrap(data['price'])
-tp_percentile_bootstrap_std  = appr_percentile_bootstrap(data['price'], stat_func = appr_sam_std)
-up_percentile_bootstrap_mean = appr_percentile_bootstrap(data['price_m'])
-up_percentile_bootstrap_std  = appr_percentile_bootstrap(data['price_m'], stat_func = appr_sam_std)
-
-# extract single balues from tuple
-tp_perb_mean, tp_perb_mean_lowCI, tp_perb_mean_upperCI = tp_percentile_bootstrap_mean
-tp_perb_std, tp_perb_std_lowCI, tp_mean_perb_upperCI = tp_percentile_bootstrap_std
-up_perb_mean, up_perb_mean_lowCI, up_perb_mean_upperCI = up_percentile_bootstrap_mean
-up_perb_std, up_perb_std_lowCI, up_mean_perb_upperCI = up_percentile_bootstrap_std
-
-# output the result to the user
-print(f'The mean price obtained by the percentile bootstrap is {tp_perb_mean:.2f} \
-with 95% confidence interval [{tp_perb_mean_lowCI:.2f}, {tp_perb_mean_upperCI:.2f}].')
-print(f'The standard deviation of the price obtained by the percentile bootstrap is {tp_perb_std:.2f} \
-with 95% confidence interval [{tp_perb_std_lowCI:.2f}, {tp_mean_perb_upperCI:.2f}].')
-print(f'The mean unit price obtained by the percentile bootstrap is {up_perb_mean:.2f} \
-with 95% confidence interval [{up_perb_mean_lowCI:.2f}, {up_perb_mean_upperCI:.2f}].')
-print(f'The standard deviation of the unit price obtained by the percentile bootstrap is {up_perb_std:.2f} \
-with 95% confidence interval [{up_perb_std_lowCI:.2f}, {up_mean_perb_upperCI:.2f}].')
-
-
-def appr_bayesian_bootstrap(X, statistic=np.mean, n_replications=2000, resample_size=None, low_mem=False, alpha=0.05):
+# tables of the driver, data loaded by the shared loader
+from bootstrap_summary import bootstrap_summary
+from listings import load_listing
+import instrumentation
+from grouped import grouped_bootstrap
+
+# the tables are seeded, so reruns on the same data are read from the cache
+# (the wrapper does nothing until called; the cache is opened on first use)
+bootstrap_summary = cached(bootstrap_summary)
+
+
+@cached
+def appr_bayesian_bootstrap(X, statistic=np.mean, n_replications=2000, resample_size=None, low_mem=False, alpha=0.05,
+                            seed=None, n_workers=1):
     """Simulate the posterior distribution of the given statistic.
 
     Parameter X: The observed data (array like)
@@ -300,65 +271,124 @@ def appr_bayesian_bootstrap(X, statistic=np.mean, n_replications=2000, resample_
 
     Parameter n_replications: The number of bootstrap replications to perform (positive integer)
 
-    Parameter resample_size: The size of the dataset in each replication
+    Parameter resample_size: The size of the dataset in each replication, only for statistics without a weighted
+    form; means, variances, standard deviations, quantiles and trimmed means are computed from the Dirichlet weights
+    directly and raise ValueError if it is given
     
-    Parameter low_mem(bool): Generate the weights for each iteration lazily instead of in a single batch. Will use
-    less memory, but will run slower as a result.
+    Parameter low_mem(bool): Generate the weights one replication at a time (chunks of a single row) instead of in
+    chunks of up to 64 MB. Will use less memory, but will run slower as a result.
+
+    Parameter seed: The seed of the random streams, the same seed gives the same interval (integer)
+
+    Parameter n_workers: The number of worker processes (positive integer)
 
     Returns: Statistoc for the samples from the posterior
     """
     
-    if resample_size is None:
-        resample_size = len(X)
-    
-    if isinstance(X, list):
-        X = np.array(X)
-    samples = []
-    if low_mem:
-        weights = (np.random.dirichlet([1] * len(X)) for _ in range(n_replications))
-    else:
-        weights = np.random.dirichlet([1] * len(X), n_replications)
-    for w in weights:
-        sample_index = np.random.choice(range(len(X)), p=w, size=resample_size)
-        resample_X = X[sample_index]
-        s = statistic(resample_X)
-        samples.append(s)
+    # Weighted statistics are computed straight from the Dirichlet weights,
+    # resample_size only matters for statistics without a weighted form
+    if resample_size is not None and statistic_kind(statistic)[0] in WEIGHTED_KINDS:
+        raise ValueError('resample_size has no effect on a statistic computed from the weights')
+    # a budget of zero bytes gives chunks of one row
+    chunk_bytes = 0 if low_mem else CHUNK_BYTES
+    samples = parallel_bootstrap(X, statistic, 'bayesian', n_replications, seed, n_workers,
+                                 sample_size=resample_size, chunk_bytes=chunk_bytes)
         
-    samples_sorted = sorted(samples)
-    window_size = int(len(samples) - round(len(samples)*alpha))
-    smallest_window = (None, None)
-    smallest_window_length = float('inf')
-    for i in range(len(samples_sorted) - window_size):
-        window = samples_sorted[i+window_size-1], samples_sorted[i]
-        window_length = samples_sorted[i+window_size-1] - samples_sorted[i]
-        if window_length < smallest_window_length:
-            smallest_window_length = window_length
-            smallest_window = window
+    # The shortest window holding 1 - alpha of the posterior samples
+    lower, upper = shortest_interval(samples, 1 - alpha)
             
     posterior_statistic = np.mean(samples)         
             
-    return posterior_statistic, smallest_window[1], smallest_window[0]
-
-# apply the 'appr_bayesian_bootstrap' function to data
-tp_bayesian_bootstrap_mean = appr_bayesian_bootstrap(data['price'])
-tp_bayesian_bootstrap_std  = appr_bayesian_bootstrap(data['price'], statistic = np.std)
-up_bayesian_bootstrap_mean = appr_bayesian_bootstrap(data['price_m'])
-up_bayesian_bootstrap_std  = appr_bayesian_bootstrap(data['price_m'], statistic = np.std)
-
-# extract single balues from tuple
-tp_bayb_mean, tp_bayb_mean_lowCI, tp_bayb_mean_upperCI = tp_bayesian_bootstrap_mean
-tp_bayb_std, tp_bayb_std_lowCI, tp_mean_bayb_upperCI = tp_bayesian_bootstrap_std
-up_bayb_mean, up_bayb_mean_lowCI, up_bayb_mean_upperCI = up_bayesian_bootstrap_mean
-up_bayb_std, up_bayb_std_lowCI, up_mean_bayb_upperCI = up_bayesian_bootstrap_std
-
-
-# output the result to the user
-print(f'The mean price obtained by the bayesian bootstrap is {tp_bayb_mean:.2f} \
-with 95% confidence interval [{tp_bayb_mean_lowCI:.2f}, {tp_bayb_mean_upperCI:.2f}].')
-print(f'The standard deviation of the price obtained by the bayesian bootstrap is {tp_bayb_std:.2f} \
-with 95% confidence interval [{tp_bayb_std_lowCI:.2f}, {tp_mean_bayb_upperCI:.2f}].')
-print(f'The mean unit price obtained by the bayesian bootstrap is {up_bayb_mean:.2f} \
-with 95% confidence interval [{up_bayb_mean_lowCI:.2f}, {up_bayb_mean_upperCI:.2f}].')
-print(f'The standard deviation of the unit price obtained by the bayesian bootstrap is {up_bayb_std:.2f} \
-with 95% confidence interval [{up_bayb_std_lowCI:.2f}, {up_mean_bayb_upperCI:.2f}].')
-
+    return posterior_statistic, lower, upper
+
+
+def main():
+    # Smoothed and Bayesian examples
+
+    data = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    mean, std = smoothed_bootstrap(data)
+    print(f"Smoothed bootstrap mean: {mean[0]:.2f} ({mean[1][0]:.2f}, {mean[1][1]:.2f})")
+    print(f"Smoothed bootstrap standard deviation: {std[0]:.2f} ({std[1][0]:.2f}, {std[1][1]:.2f})")
+
+    # Generate some random data
+    data = np.random.normal(loc=0, scale=1, size=100)
+
+    # Perform Bayesian bootstrap and get mean and standard deviation of the samples
+    mean, std = bayesian_bootstrap(data)
+
+    # Print results
+    print("Mean:", np.mean(data))
+    print("95% credible interval for mean:", np.percentile(mean, [2.5, 97.5]))
+    print("Standard deviation:", np.std(data))
+    print("95% credible interval for standard deviation:", np.percentile(std, [2.5, 97.5]))
+
+    # set BOOTSTRAP_PROFILE to a file name to append the timings of this run to it
+    profile_path = os.environ.get('BOOTSTRAP_PROFILE')
+    if profile_path:
+        instrumentation.enable()
+
+    # import data: prices and districts only, cached as .npy by the shared loader
+    data = load_listing("ds.csv")
+
+    # sample standard deviation
+    appr_sam_std = sample_std(ddof=1)
+
+    # apply the percentile bootstrap to both prices and both statistics in one resampling pass
+    # as many replicates as the interval endpoints need, instead of a fixed 20000
+    percentile_table = bootstrap_summary(data, ['price', 'price_m'], [np.mean, appr_sam_std],
+                                         method='percentile', n_replications='auto', seed=1)
+    print(f"The percentile bootstrap used {percentile_table.attrs['n_replications']} replicates.")
+    percentile_table = percentile_table.set_index(['column', 'statistic'])
+
+    # extract single balues from the table
+    tp_perb_mean, tp_perb_mean_lowCI, tp_perb_mean_upperCI = percentile_table.loc[('price', 'mean')]
+    tp_perb_std, tp_perb_std_lowCI, tp_mean_perb_upperCI = percentile_table.loc[('price', 'std')]
+    up_perb_mean, up_perb_mean_lowCI, up_perb_mean_upperCI = percentile_table.loc[('price_m', 'mean')]
+    up_perb_std, up_perb_std_lowCI, up_mean_perb_upperCI = percentile_table.loc[('price_m', 'std')]
+
+    # output the result to the user
+    print(f'The mean price obtained by the percentile bootstrap is {tp_perb_mean:.2f} '
+          f'with 95% confidence interval [{tp_perb_mean_lowCI:.2f}, {tp_perb_mean_upperCI:.2f}].')
+    print(f'The standard deviation of the price obtained by the percentile bootstrap is {tp_perb_std:.2f} '
+          f'with 95% confidence interval [{tp_perb_std_lowCI:.2f}, {tp_mean_perb_upperCI:.2f}].')
+    print(f'The mean unit price obtained by the percentile bootstrap is {up_perb_mean:.2f} '
+          f'with 95% confidence interval [{up_perb_mean_lowCI:.2f}, {up_perb_mean_upperCI:.2f}].')
+    print(f'The standard deviation of the unit price obtained by the percentile bootstrap is {up_perb_std:.2f} '
+          f'with 95% confidence interval [{up_perb_std_lowCI:.2f}, {up_mean_perb_upperCI:.2f}].')
+
+
+    # apply the bayesian bootstrap to both prices and both statistics with one set of Dirichlet weights
+    bayesian_table = bootstrap_summary(data, ['price', 'price_m'], [np.mean, np.std],
+                                       method='bayesian', n_replications=2000, seed=2)
+    bayesian_table = bayesian_table.set_index(['column', 'statistic'])
+
+    # extract single balues from the table
+    tp_bayb_mean, tp_bayb_mean_lowCI, tp_bayb_mean_upperCI = bayesian_table.loc[('price', 'mean')]
+    tp_bayb_std, tp_bayb_std_lowCI, tp_mean_bayb_upperCI = bayesian_table.loc[('price', 'std')]
+    up_bayb_mean, up_bayb_mean_lowCI, up_bayb_mean_upperCI = bayesian_table.loc[('price_m', 'mean')]
+    up_bayb_std, up_bayb_std_lowCI, up_mean_bayb_upperCI = bayesian_table.loc[('price_m', 'std')]
+
+
+    # output the result to the user
+    print(f'The mean price obtained by the bayesian bootstrap is {tp_bayb_mean:.2f} '
+          f'with 95% confidence interval [{tp_bayb_mean_lowCI:.2f}, {tp_bayb_mean_upperCI:.2f}].')
+    print(f'The standard deviation of the price obtained by the bayesian bootstrap is {tp_bayb_std:.2f} '
+          f'with 95% confidence interval [{tp_bayb_std_lowCI:.2f}, {tp_mean_bayb_upperCI:.2f}].')
+    print(f'The mean unit price obtained by the bayesian bootstrap is {up_bayb_mean:.2f} '
+          f'with 95% confidence interval [{up_bayb_mean_lowCI:.2f}, {up_bayb_mean_upperCI:.2f}].')
+    print(f'The standard deviation of the unit price obtained by the bayesian bootstrap is {up_bayb_std:.2f} '
+          f'with 95% confidence interval [{up_bayb_std_lowCI:.2f}, {up_mean_bayb_upperCI:.2f}].')
+
+    # per-district intervals of the unit price: all districts resampled in one pass
+    district_table = cached(grouped_bootstrap)(data, 'price_m', 'district_name',
+                                               {'mean': np.mean, 'std': appr_sam_std},
+                                               n_replications=20000, seed=3)
+    print('Percentile bootstrap of the unit price by district:')
+    print(district_table.to_string(index=False, float_format='{:.2f}'.format))
+
+    if profile_path:
+        instrumentation.disable().write_json_lines(profile_path, script='bootstrap_manually')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Bootstrap several columns and several statistics in a single resampling pass.
+
+One set of resample indices (or Dirichlet weights) is drawn per chunk and
+shared by every column and every statistic (see ``multi_replicates``), and
+the results are returned as a tidy table with one row per column and
+statistic.
+"""
+
+import numpy as np
+import pandas as pd
+
+from adaptive import adaptive_replicates
+from intervals import bca_interval, percentile_interval, shortest_interval
+from parallel import parallel_replicates
+from resampling import CHUNK_BYTES, named_statistics
+
+
+def bootstrap_summary(data, columns, statistics=np.mean, method='percentile',
+                      n_replications=2000, alpha=0.05, interval=None,
+                      seed=None, n_workers=1, chunk_bytes=CHUNK_BYTES,
+                      bandwidth='silverman', tolerance=0.02):
+    """
+    Estimates and intervals for several columns and statistics in one pass.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The observed data.
+    columns : str or sequence of str
+        The columns to bootstrap.
+    statistics : function, sequence of functions or dict, optional
+        The statistics of interest; a dict maps names to functions.
+        Default is the mean.
+    method : str, optional
+        'percentile' (default), 'smoothed' or 'bayesian'.
+    n_replications : int or 'auto', optional
+        The number of replicates. Default is 2000. With 'auto', batches of
+        replicates are drawn until the Monte Carlo error of the endpoints
+        of the requested interval meets ``tolerance`` (see adaptive.py).
+    alpha : float, optional
+        The significance level. Default is 0.05.
+    interval : str, optional
+        'percentile', 'shortest' or 'bca'. Defaults to the shortest interval
+        for the Bayesian bootstrap and to the percentile interval otherwise.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed; the same seed gives the same table for any n_workers.
+    n_workers : int, optional
+        The number of worker processes. Default is 1.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    bandwidth : str or float, optional
+        Kernel bandwidth of the smoothed bootstrap. Default is 'silverman'.
+    tolerance : float, optional
+        With n_replications='auto', the largest Monte Carlo standard error
+        of an endpoint relative to the interval width. Default is 0.02.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per column and statistic with the columns 'column',
+        'statistic', 'estimate', 'lower' and 'upper'. The number of
+        replicates used is in ``attrs['n_replications']``.
+    """
+    if isinstance(columns, str):
+        columns = [columns]
+    named = named_statistics(statistics)
+    if interval is None:
+        interval = 'shortest' if method == 'bayesian' else 'percentile'
+    values = data[list(columns)].to_numpy(dtype=float)
+    functions = [func for _, func in named]
+    if n_replications == 'auto':
+        replicates = adaptive_replicates(values, functions, method, alpha,
+                                         tolerance, seed=seed, n_workers=n_workers,
+                                         chunk_bytes=chunk_bytes, bandwidth=bandwidth,
+                                         interval=interval).replicates
+    else:
+        replicates = parallel_replicates(values, functions, method,
+                                         n_replications, seed, n_workers,
+                                         chunk_bytes=chunk_bytes, bandwidth=bandwidth)
+    if interval == 'shortest':
+        bounds = shortest_interval(replicates, 1 - alpha)
+    elif interval == 'percentile':
+        bounds = percentile_interval(replicates, alpha)
+    elif interval == 'bca':
+        bounds = np.array([[bca_interval(replicates[j, i], values[:, j], func,
+                                         alpha, chunk_bytes)
+                            for i, (_, func) in enumerate(named)]
+                           for j in range(len(columns))])
+    else:
+        raise ValueError(f"unknown interval: {interval!r}")
+    table = pd.DataFrame({
+        'column': np.repeat(list(columns), len(named)),
+        'statistic': [name for _ in columns for name, _ in named],
+        'estimate': replicates.mean(axis=-1).ravel(),
+        'lower': bounds[..., 0].ravel(),
+        'upper': bounds[..., 1].ravel(),
+    })
+    table.attrs['n_replications'] = replicates.shape[-1]
+    return table
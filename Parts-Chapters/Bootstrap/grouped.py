@@ -0,0 +1,204 @@
+"""
+Stratified bootstrap of many groups at once, e.g. prices by district.
+
+The values are sorted by group and value once. Every row of a chunk then
+resamples all groups together: each position draws an index within its own
+group, so a group of n values is resampled to n values and the groups stay
+independent. The draws are turned into a matrix of resample counts with one
+``np.bincount``, and means, variances and quantiles of every group are
+segmented sums (``np.add.reduceat``) and cumulative counts of that matrix,
+so the cost is linear in the number of rows times replicates, whatever the
+number of groups. The Bayesian bootstrap uses Dirichlet weights normalized
+within every group in place of the counts. Other statistics are evaluated
+group by group on the same draws.
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, timer
+from intervals import percentile_interval, shortest_interval
+from parallel import TASK_SIZE, run_tasks, split_tasks
+from resampling import (CHUNK_BYTES, SEGMENTED_KINDS, chunk_rows, evaluate,
+                        named_statistics, segmented_evaluate, statistic_kind,
+                        weighted_evaluate)
+
+METHODS = ('percentile', 'bayesian')
+
+def _segments(values, codes, n_groups):
+    # values sorted by group and value, the group sizes and start offsets
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes, dtype=np.intp)
+    valid = ~np.isnan(values) & (codes >= 0)
+    values, codes = values[valid], codes[valid]
+    order = np.lexsort((values, codes))
+    sizes = np.bincount(codes, minlength=n_groups)
+    return values[order], sizes, np.cumsum(sizes) - sizes
+
+
+def grouped_replicates(values, codes, statistics=np.mean, method='percentile',
+                       n_replications=2000, random_state=None,
+                       chunk_bytes=CHUNK_BYTES, n_groups=None):
+    """
+    Bootstrap replicates of one or several statistics within every group.
+
+    Parameters
+    ----------
+    values : array-like
+        The observed data, e.g. prices.
+    codes : array-like of int
+        The group code (0 .. n_groups - 1) of every value; negative codes
+        and missing values are left out.
+    statistics : function or sequence of functions, optional
+        The statistic(s) of interest. Default is the mean. Means, variances,
+        standard deviations and quantiles (see resampling.py) are computed
+        for all groups at once, any other statistic group by group.
+    method : str, optional
+        'percentile' (ordinary bootstrap within every group) or 'bayesian'.
+    n_replications : int, optional
+        The number of replicates. Default is 2000.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used for resampling.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    n_groups : int, optional
+        The number of groups. Defaults to the largest code plus one.
+
+    Returns
+    -------
+    ndarray
+        Replicates of shape (n_groups, n_replications) for a single statistic
+        or (n_groups, len(statistics), n_replications) for a sequence of
+        statistics; NaN for empty groups.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method: {method!r}, expected one of {METHODS}")
+    single = callable(statistics)
+    statistics = [statistics] if single else list(statistics)
+    if n_groups is None:
+        n_groups = int(np.max(codes, initial=-1)) + 1
+    values, sizes, starts = _segments(values, codes, n_groups)
+    replicates = np.full((n_groups, len(statistics), n_replications), np.nan)
+    # the segmented sums only see groups that have values
+    filled = np.flatnonzero(sizes)
+    sizes, starts = sizes[filled], starts[filled]
+    n = len(values)
+    if n == 0:
+        return replicates[:, 0] if single else replicates
+    centers = np.add.reduceat(values, starts) / sizes
+    kinds = [statistic_kind(func) for func in statistics]
+    rng = np.random.default_rng(random_state)
+    # the draws or weights, the counts and a temporary of the reductions
+    rows = chunk_rows(n, chunk_bytes, arrays=4)
+    low = np.repeat(starts, sizes)
+    high = low + np.repeat(sizes, sizes)
+    for start in range(0, n_replications, rows):
+        stop = min(start + rows, n_replications)
+        with timer('draw'):
+            if method == 'bayesian':
+                indices, counts = None, None
+                # exponentials normalized within every group are Dirichlet
+                weights = rng.standard_exponential((stop - start, n))
+                weights /= np.repeat(np.add.reduceat(weights, starts, axis=1),
+                                     sizes, axis=1)
+            else:
+                indices = rng.integers(low, high, size=(stop - start, n))
+                shift = np.arange(stop - start)[:, None] * n
+                counts = np.bincount((indices + shift).ravel(),
+                                     minlength=(stop - start) * n).reshape(-1, n)
+                weights = counts / np.repeat(sizes, sizes)
+        count('chunks')
+        count('bytes', weights.nbytes if indices is None
+              else indices.nbytes + counts.nbytes + weights.nbytes)
+        for i, (func, (kind, _)) in enumerate(zip(statistics, kinds)):
+            if kind in SEGMENTED_KINDS:
+                replicates[filled, i, start:stop] = segmented_evaluate(
+                    func, values, weights, sizes, starts, counts, centers).T
+                continue
+            for group, first, size in zip(filled, starts, sizes):
+                part = slice(first, first + size)
+                if indices is None:
+                    result = weighted_evaluate(func, values[part], weights[:, part],
+                                               random_state=rng)
+                else:
+                    result = evaluate(func, values[indices[:, part]])
+                replicates[group, i, start:stop] = result
+        count('replicates', stop - start)
+    return replicates[:, 0] if single else replicates
+
+
+def _replicates(values, codes, statistics, method, size, seed, chunk_bytes,
+                n_groups):
+    return grouped_replicates(values, codes, statistics, method, size,
+                              np.random.default_rng(seed), chunk_bytes, n_groups)
+
+
+def grouped_bootstrap(data, column, by, statistics=np.mean, method='percentile',
+                      n_replications=2000, alpha=0.05, interval=None, seed=None,
+                      n_workers=1, task_size=TASK_SIZE, chunk_bytes=CHUNK_BYTES):
+    """
+    Estimates and intervals of every group in one table.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The observed data.
+    column : str
+        The column to bootstrap, e.g. 'price_m'.
+    by : str
+        The grouping column, preferably categorical, e.g. 'district_name'.
+    statistics : function, sequence of functions or dict, optional
+        The statistics of interest; a dict maps names to functions.
+        Default is the mean.
+    method : str, optional
+        'percentile' (default) or 'bayesian'.
+    n_replications : int, optional
+        The number of replicates. Default is 2000.
+    alpha : float, optional
+        The significance level. Default is 0.05.
+    interval : str, optional
+        'percentile' or 'shortest'. Defaults to the shortest interval for the
+        Bayesian bootstrap and to the percentile interval otherwise.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed; the same seed gives the same table for any n_workers.
+    n_workers : int, optional
+        The number of worker processes. Default is 1.
+    task_size : int, optional
+        The number of replicates per task.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk within a task.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per group and statistic with the columns 'group',
+        'statistic', 'n', 'estimate', 'lower' and 'upper'.
+    """
+    named = named_statistics(statistics)
+    if interval is None:
+        interval = 'shortest' if method == 'bayesian' else 'percentile'
+    if interval not in ('percentile', 'shortest'):
+        raise ValueError(f"unknown interval: {interval!r}")
+    groups = data[by]
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        codes, labels = groups.cat.codes.to_numpy(), groups.cat.categories
+    else:
+        codes, labels = pd.factorize(groups, sort=True)
+    values = data[column].to_numpy(dtype=float)
+    tasks = [(values, codes, [func for _, func in named], method, size, child,
+              chunk_bytes, len(labels))
+             for size, child in split_tasks(n_replications, task_size, seed)]
+    replicates = np.concatenate(run_tasks(_replicates, tasks, n_workers), axis=-1)
+    if interval == 'shortest':
+        bounds = shortest_interval(replicates, 1 - alpha)
+    else:
+        bounds = percentile_interval(replicates, alpha)
+    n = np.bincount(codes[(codes >= 0) & ~np.isnan(values)], minlength=len(labels))
+    return pd.DataFrame({
+        'group': np.repeat(labels, len(named)),
+        'statistic': [name for _ in labels for name, _ in named],
+        'n': np.repeat(n, len(named)),
+        'estimate': replicates.mean(axis=-1).ravel(),
+        'lower': bounds[..., 0].ravel(),
+        'upper': bounds[..., 1].ravel(),
+    })
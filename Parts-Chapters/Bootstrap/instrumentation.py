@@ -0,0 +1,227 @@
+"""
+Opt-in timers and counters for the resampling engine.
+
+The engine reports its phases here: drawing indices, weights and kernel
+noise ('draw'), evaluating statistics with a closed or vectorized form
+('evaluate'), time spent inside user callables ('statistic') and interval
+extraction ('interval'), plus the number of replicates, chunks and bytes
+drawn. Nothing is recorded unless a recorder is enabled, and a disabled hook
+is a single check of a module global per chunk, so the engine runs at full
+speed by default.
+
+Usage::
+
+    with profile() as recorder:
+        bootstrap_summary(data, ['price_m'], np.mean)
+    print(recorder.report())
+"""
+
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+
+# the recorder in use, None when instrumentation is disabled
+_recorder = None
+
+
+class Recorder:
+    """Accumulated phase timers and counters."""
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.stopped = None
+
+    @contextmanager
+    def timer(self, name):
+        """Add the time spent in the block to the timer of the given name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds, calls = self.timers.get(name, (0.0, 0))
+            self.timers[name] = (seconds + time.perf_counter() - start, calls + 1)
+
+    def count(self, name, value=1):
+        """Increase the counter of the given name."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, report):
+        """Add the timers and counters of a report, e.g. from a worker."""
+        for name, timer in report['timers'].items():
+            seconds, calls = self.timers.get(name, (0.0, 0))
+            self.timers[name] = (seconds + timer['seconds'], calls + timer['calls'])
+        for name, value in report['counters'].items():
+            self.count(name, value)
+
+    def report(self):
+        """
+        The timers, counters and derived rates as a dictionary.
+
+        Returns
+        -------
+        dict
+            'elapsed' seconds, 'timers' (seconds and calls by phase),
+            'counters', 'replicates_per_second' and 'bytes_per_chunk'.
+        """
+        stopped = self.stopped if self.stopped is not None else time.perf_counter()
+        elapsed = stopped - self.started
+        replicates = self.counters.get('replicates', 0)
+        chunks = self.counters.get('chunks', 0)
+        return {
+            'elapsed': elapsed,
+            'timers': {name: {'seconds': seconds, 'calls': calls}
+                       for name, (seconds, calls) in self.timers.items()},
+            'counters': dict(self.counters),
+            'replicates_per_second': replicates / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_chunk': (self.counters.get('bytes', 0) / chunks
+                                if chunks else 0.0),
+        }
+
+    def write_json_lines(self, path, **labels):
+        """
+        Append the report to a file as JSON lines, one per timer and counter.
+
+        Parameters
+        ----------
+        path : str
+            The output file.
+        **labels
+            Added to every line, e.g. a batch name.
+        """
+        report = self.report()
+        lines = [{'type': 'summary', 'elapsed': report['elapsed'],
+                  'replicates_per_second': report['replicates_per_second'],
+                  'bytes_per_chunk': report['bytes_per_chunk']}]
+        lines += [{'type': 'timer', 'name': name, **timer}
+                  for name, timer in report['timers'].items()]
+        lines += [{'type': 'counter', 'name': name, 'value': value}
+                  for name, value in report['counters'].items()]
+        with open(path, 'a', encoding='utf-8') as file:
+            for line in lines:
+                file.write(json.dumps({**labels, **line}) + '\n')
+
+
+def enabled():
+    """Whether a recorder is collecting."""
+    return _recorder is not None
+
+
+def enable():
+    """Start collecting into a new recorder and return it."""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable():
+    """Stop collecting and return the recorder that was in use (or None)."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.stopped = time.perf_counter()
+    return recorder
+
+
+@contextmanager
+def profile():
+    """
+    Collect into a new recorder within the block.
+
+    A profile nested in another one adds its results to the outer recorder
+    when it ends.
+    """
+    global _recorder
+    previous = _recorder
+    recorder = enable()
+    try:
+        yield recorder
+    finally:
+        recorder.stopped = time.perf_counter()
+        _recorder = previous
+        if previous is not None:
+            previous.merge(recorder.report())
+
+
+def timer(name):
+    """Timer context of the given phase, a no-op when disabled."""
+    return _recorder.timer(name) if _recorder is not None else _NULL
+
+
+def count(name, value=1):
+    """Increase a counter, a no-op when disabled."""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def merge(report):
+    """
+    Add a report, e.g. from a worker process, to the recorder in use.
+
+    A report of None (a task that was not profiled) is ignored.
+    """
+    if _recorder is not None and report is not None:
+        _recorder.merge(report)
+
+
+def run_recorded(func, *args, profiled=False):
+    """
+    Call a function in a worker process and return its records with it.
+
+    Parameters
+    ----------
+    func : function
+        The task function.
+    *args
+        Its arguments.
+    profiled : bool, optional
+        Record the call on a recorder of its own, e.g. because the parent
+        process is profiling. Default is False.
+
+    Returns
+    -------
+    tuple
+        The result and the report of the call (None unless profiled), to
+        be passed to ``merge`` in the parent process.
+    """
+    if not profiled:
+        return func(*args), None
+    with profile() as recorder:
+        result = func(*args)
+    return result, recorder.report()
+
+
+def run_task(task):
+    """
+    Run a task of a process pool, ``executor.map(run_task, tasks)``.
+
+    Parameters
+    ----------
+    task : tuple
+        The task function, its arguments and whether to record the call
+        (see ``run_recorded``); the function has to be picklable.
+
+    Returns
+    -------
+    tuple
+        The result and the report of the call (None unless profiled).
+    """
+    func, *args, profiled = task
+    return run_recorded(func, *args, profiled=profiled)
+
+
+def timed(name):
+    """Decorator timing every call of a function as the given phase."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _recorder.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,289 @@
+"""
+Confidence and credible intervals computed from bootstrap replicates.
+
+The percentile and shortest intervals work on NumPy arrays along an axis, so
+the replicates of many statistics can be processed in one call. All routines
+accept several levels at once.
+"""
+
+import warnings
+
+import numpy as np
+from scipy.stats import norm
+
+from instrumentation import timed
+from jackknife import acceleration, jackknife_se, leave_one_out
+from resampling import CHUNK_BYTES, evaluate, iter_indices, statistic_kind
+
+
+# largest number of replicates times the squared sample size for which the
+# studentized interval falls back to a jackknife within every resample
+NESTED_JACKKNIFE_MAX = 2e8
+
+# statistics whose standard error has a closed form (see standard_errors)
+CLOSED_FORM_SE = ('mean', 'var', 'std')
+
+
+def _levels(level):
+    # scalar levels give a single interval, sequences give one per level
+    levels = np.atleast_1d(np.asarray(level, dtype=float))
+    return levels, np.ndim(level) == 0
+
+
+@timed('interval')
+def percentile_interval(replicates, alpha=0.05, axis=-1):
+    """
+    Equal-tailed percentile interval of bootstrap replicates.
+
+    Parameters
+    ----------
+    replicates : array-like
+        Bootstrap replicates of one or several statistics.
+    alpha : float or sequence of floats, optional
+        Significance level(s). Default is 0.05.
+    axis : int, optional
+        The axis holding the replicates. Default is the last one.
+
+    Returns
+    -------
+    ndarray
+        Lower and upper bounds in the last dimension. Several levels add a
+        leading dimension.
+    """
+    alphas, scalar = _levels(alpha)
+    replicates = np.moveaxis(np.asarray(replicates, dtype=float), axis, -1)
+    probabilities = np.stack([alphas / 2, 1 - alphas / 2], axis=-1)
+    bounds = np.quantile(replicates, probabilities, axis=-1)
+    # quantile puts the probabilities first: (levels, 2, ...) -> (levels, ..., 2)
+    bounds = np.moveaxis(bounds, 1, -1)
+    return bounds[0] if scalar else bounds
+
+
+@timed('interval')
+def shortest_interval(replicates, credibility=0.95, axis=-1):
+    """
+    Shortest interval (highest density interval) of bootstrap replicates.
+
+    The replicates are sorted once and the widths of all windows holding the
+    required share of them are obtained by a single vectorized difference of
+    the sorted array, so the cost is O(B log B).
+
+    Parameters
+    ----------
+    replicates : array-like
+        Bootstrap replicates of one or several statistics.
+    credibility : float or sequence of floats, optional
+        Credibility level(s), between 0 and 1. Default is 0.95.
+    axis : int, optional
+        The axis holding the replicates. Default is the last one.
+
+    Returns
+    -------
+    ndarray
+        Lower and upper bounds in the last dimension. Several levels add a
+        leading dimension.
+    """
+    levels, scalar = _levels(credibility)
+    replicates = np.sort(np.moveaxis(np.asarray(replicates, dtype=float),
+                                     axis, -1), axis=-1)
+    n = replicates.shape[-1]
+    bounds = []
+    for level in levels:
+        # number of replicates inside the interval
+        window = min(max(int(n - round(n * (1 - level))), 1), n)
+        widths = replicates[..., window - 1:] - replicates[..., :n - window + 1]
+        start = np.argmin(widths, axis=-1)[..., np.newaxis]
+        lower = np.take_along_axis(replicates, start, axis=-1)
+        upper = np.take_along_axis(replicates, start + window - 1, axis=-1)
+        bounds.append(np.concatenate([lower, upper], axis=-1))
+    bounds = np.stack(bounds)
+    return bounds[0] if scalar else bounds
+
+
+@timed('interval')
+def bca_interval(replicates, data, statistic, alpha=0.05,
+                 chunk_bytes=CHUNK_BYTES):
+    """
+    Bias-corrected and accelerated (BCa) interval of bootstrap replicates.
+
+    The acceleration constant comes from the leave-one-out values of the
+    statistic, which are O(n) for mean and variance-type statistics and are
+    computed in memory-bounded chunks otherwise.
+
+    Parameters
+    ----------
+    replicates : array-like
+        Bootstrap replicates of the statistic.
+    data : array-like
+        The original data.
+    statistic : function
+        The statistic the replicates were computed for.
+    alpha : float or sequence of floats, optional
+        Significance level(s). Default is 0.05.
+    chunk_bytes : int, optional
+        Memory budget for a chunk of leave-one-out samples.
+
+    Returns
+    -------
+    ndarray
+        Lower and upper bounds in the last dimension. Several levels add a
+        leading dimension.
+    """
+    replicates = np.asarray(replicates, dtype=float)
+    data = np.asarray(data, dtype=float)
+    a = acceleration(leave_one_out(data, statistic, chunk_bytes))
+    return np.quantile(replicates, bca_probabilities(replicates, statistic(data),
+                                                     a, alpha))
+
+
+def bca_probabilities(replicates, estimate, a, alpha=0.05):
+    """
+    Probabilities of the quantiles of replicates that bound the BCa interval.
+
+    Parameters
+    ----------
+    replicates : array-like
+        Bootstrap replicates of the statistic.
+    estimate : float
+        The statistic of the original data.
+    a : float
+        The acceleration constant (see ``jackknife.acceleration``).
+    alpha : float or sequence of floats, optional
+        Significance level(s). Default is 0.05.
+
+    Returns
+    -------
+    ndarray
+        Lower and upper probabilities in the last dimension. Several levels
+        add a leading dimension.
+    """
+    alphas, scalar = _levels(alpha)
+    replicates = np.asarray(replicates, dtype=float)
+    # bias correction from the share of replicates below the estimate, kept
+    # off 0 and 1 (all replicates on one side), where it would be infinite
+    share = np.mean(replicates < estimate) + 0.5 * np.mean(replicates == estimate)
+    b = replicates.size
+    z0 = norm.ppf(np.clip(share, 1 / (b + 1), b / (b + 1)))
+    z = norm.ppf(np.stack([alphas / 2, 1 - alphas / 2], axis=-1))
+    probabilities = norm.cdf(z0 + (z0 + z) / (1 - a * (z0 + z)))
+    return probabilities[0] if scalar else probabilities
+
+
+def standard_errors(samples, statistic, chunk_bytes=CHUNK_BYTES):
+    """
+    Standard error of a statistic on every row of a 2-D array of samples.
+
+    Means use s / sqrt(n) and variances and standard deviations the
+    fourth-moment (delta method) formula; other statistics fall back to the
+    jackknife standard error of every row.
+
+    Parameters
+    ----------
+    samples : ndarray
+        Samples, one per row.
+    statistic : function
+        The statistic of interest.
+    chunk_bytes : int, optional
+        Memory budget for a chunk of leave-one-out samples.
+
+    Returns
+    -------
+    ndarray
+        One standard error per row.
+    """
+    kind, params = statistic_kind(statistic)
+    m = samples.shape[1]
+    if kind == 'mean':
+        return np.std(samples, axis=1, ddof=1) / np.sqrt(m)
+    if kind in ('var', 'std'):
+        factor = m / (m - params.get('ddof', 0))
+        centered = samples - samples.mean(axis=1, keepdims=True)
+        m2 = np.mean(centered ** 2, axis=1)
+        m4 = np.mean(centered ** 4, axis=1)
+        se_var = factor * np.sqrt(np.maximum(m4 - m2 ** 2, 0) / m)
+        if kind == 'var':
+            return se_var
+        return se_var / (2 * np.sqrt(factor * m2))
+    return np.array([jackknife_se(leave_one_out(row, statistic, chunk_bytes))
+                     for row in samples])
+
+
+def studentized_interval(data, statistic, alpha=0.05, n_bootstraps=1000,
+                         random_state=None, chunk_bytes=CHUNK_BYTES, se_func=None):
+    """
+    Studentized (bootstrap-t) interval of a statistic.
+
+    Every resample is standardized by its own standard error (see
+    ``standard_errors``), and the quantiles of the resulting t statistics
+    are mapped back around the estimate. Statistics without a closed-form
+    standard error need a jackknife within every resample, O(B n^2); above
+    NESTED_JACKKNIFE_MAX a ``se_func`` has to be given instead.
+
+    Parameters
+    ----------
+    data : array-like
+        The original data.
+    statistic : function
+        The statistic of interest.
+    alpha : float or sequence of floats, optional
+        Significance level(s). Default is 0.05.
+    n_bootstraps : int, optional
+        The number of bootstrap samples to generate. Default is 1000.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the resamples.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    se_func : function, optional
+        Standard error of the statistic on every row of a 2-D array of
+        samples. Defaults to ``standard_errors``.
+
+    Returns
+    -------
+    ndarray
+        Lower and upper bounds in the last dimension. Several levels add a
+        leading dimension. Both bounds are the estimate if its standard
+        error is zero; resamples with a zero standard error are left out
+        with a RuntimeWarning, and ValueError is raised if none is left.
+    """
+    alphas, scalar = _levels(alpha)
+    data = np.asarray(data, dtype=float)
+    if se_func is None:
+        kind, _ = statistic_kind(statistic)
+        if (kind not in CLOSED_FORM_SE
+                and n_bootstraps * len(data) ** 2 > NESTED_JACKKNIFE_MAX):
+            raise ValueError(
+                f"{getattr(statistic, '__name__', statistic)!s} has no closed-form "
+                f"standard error and a jackknife in each of {n_bootstraps} "
+                f"resamples of {len(data)} values is too slow; pass se_func")
+
+        def se_func(samples):
+            return standard_errors(samples, statistic, chunk_bytes)
+    estimate = statistic(data)
+    se = se_func(data[np.newaxis])[0]
+    if se == 0:
+        # constant data: every resample gives the estimate
+        bounds = np.full((len(alphas), 2), estimate, dtype=float)
+        return bounds[0] if scalar else bounds
+    rng = np.random.default_rng(random_state)
+    t = np.empty(n_bootstraps)
+    start = 0
+    # resamples plus the centered values and their powers
+    for indices in iter_indices(len(data), n_bootstraps, None, rng,
+                                chunk_bytes, arrays=4):
+        samples = data[indices]
+        stop = start + len(samples)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t[start:stop] = (evaluate(statistic, samples) - estimate) / se_func(samples)
+        start = stop
+    # degenerate resamples with a zero standard error carry no information
+    finite = np.isfinite(t)
+    if not finite.any():
+        raise ValueError(f"all {n_bootstraps} resamples have a zero standard error")
+    if not finite.all():
+        warnings.warn(f"{n_bootstraps - finite.sum()} of {n_bootstraps} resamples "
+                      "with a zero standard error were left out", RuntimeWarning,
+                      stacklevel=2)
+    t = t[finite]
+    quantiles = np.quantile(t, np.stack([1 - alphas / 2, alphas / 2], axis=-1))
+    bounds = estimate - quantiles * se
+    return bounds[0] if scalar else bounds
@@ -0,0 +1,199 @@
+"""
+Jackknife estimates without an n x (n-1) matrix of leave-one-out samples.
+
+Means, variances, skewness and kurtosis are obtained in O(n) from running
+sums of powers, quantiles (including the median, minimum and maximum) from
+the sorted data in O(n log n); any other statistic is evaluated on
+leave-one-out samples built in memory-bounded chunks. This replaces
+``astropy.stats.jackknife_resampling``, which does not fit in memory for
+the full St Petersburg dataset.
+"""
+
+import numpy as np
+from scipy.special import erfinv
+
+from resampling import CHUNK_BYTES, chunk_rows, evaluate, statistic_kind
+
+
+def _loo_moments(data, order):
+    # central moments 2..order of every leave-one-out sample from the power
+    # sums of the data centered at its full mean (centered for accuracy)
+    centered = data - np.mean(data)
+    m = len(data) - 1
+    powers = [None] + [(np.sum(centered ** k) - centered ** k) / m
+                       for k in range(1, order + 1)]
+    mu = powers[1]
+    moments = {2: powers[2] - mu ** 2}
+    if order >= 3:
+        moments[3] = powers[3] - 3 * mu * powers[2] + 2 * mu ** 3
+    if order >= 4:
+        moments[4] = (powers[4] - 4 * mu * powers[3] + 6 * mu ** 2 * powers[2]
+                      - 3 * mu ** 4)
+    # a leave-one-out sample is constant if all data are equal, or if all but
+    # the dropped observation are; its variance is exactly zero, the others
+    # only lose negative rounding errors
+    low, high = np.min(data), np.max(data)
+    constant = np.full(len(data), low == high)
+    if low != high:
+        constant |= (data == high) & (np.sum(data == low) == m)
+        constant |= (data == low) & (np.sum(data == high) == m)
+    moments[2] = np.where(constant, 0.0, np.maximum(moments[2], 0))
+    return mu + np.mean(data), moments
+
+
+def _loo_quantile(data, q):
+    # the leave-one-out samples of sorted data differ from it only around the
+    # position of the dropped observation, so a quantile with linear
+    # interpolation needs at most three neighbouring order statistics
+    n = len(data)
+    order = np.argsort(data, kind='stable')
+    sorted_data = np.append(data[order], data[order][-1])
+    ranks = np.empty(n, dtype=int)
+    ranks[order] = np.arange(n)
+    position = q * (n - 2)
+    k = int(np.floor(position))
+    fraction = position - k
+    low = np.where(k < ranks, sorted_data[k], sorted_data[k + 1])
+    high = np.where(k + 1 < ranks, sorted_data[min(k + 1, n)],
+                    sorted_data[min(k + 2, n)])
+    return low + fraction * (high - low)
+
+
+def leave_one_out(data, statistic, chunk_bytes=CHUNK_BYTES):
+    """
+    Values of a statistic on every leave-one-out sample.
+
+    Parameters
+    ----------
+    data : array-like
+        The observed data.
+    statistic : function
+        The statistic of interest.
+    chunk_bytes : int, optional
+        Memory budget for a chunk of leave-one-out samples (only used for
+        statistics without a closed form).
+
+    Returns
+    -------
+    ndarray
+        The i-th element is the statistic computed without observation i.
+    """
+    data = np.asarray(data, dtype=float)
+    n = len(data)
+    m = n - 1
+    kind, params = statistic_kind(statistic)
+    if kind == 'mean':
+        return (data.sum() - data) / m
+    # degenerate samples give NaN (0 / 0) or inf like NumPy and SciPy
+    if kind in ('var', 'std'):
+        _, moments = _loo_moments(data, 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = moments[2] * m / (m - params.get('ddof', 0))
+        return np.sqrt(var) if kind == 'std' else var
+    if kind == 'skew':
+        _, moments = _loo_moments(data, 3)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g1 = np.where(moments[2] > 0, moments[3] / moments[2] ** 1.5, np.nan)
+        # SciPy corrects the bias only from three observations on
+        if params.get('bias', True) or m <= 2:
+            return g1
+        return g1 * np.sqrt(m * (m - 1)) / (m - 2)
+    if kind == 'kurtosis':
+        _, moments = _loo_moments(data, 4)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g2 = np.where(moments[2] > 0, moments[4] / moments[2] ** 2 - 3, np.nan)
+        # and from four observations on for the kurtosis
+        if not params.get('bias', True) and m > 3:
+            g2 = ((m + 1) * g2 + 6) * (m - 1) / ((m - 2) * (m - 3))
+        return g2 if params.get('fisher', True) else g2 + 3
+    if kind == 'quantile':
+        return _loo_quantile(data, params['q'])
+    # generic statistics: chunks of (rows, n - 1) leave-one-out samples
+    values = np.empty(n)
+    positions = np.arange(m)
+    rows = chunk_rows(m, chunk_bytes)
+    for start in range(0, n, rows):
+        left_out = np.arange(start, min(start + rows, n))
+        indices = positions + (positions >= left_out[:, np.newaxis])
+        values[start:start + len(left_out)] = evaluate(statistic, data[indices])
+    return values
+
+
+def jackknife_se(values):
+    """
+    Jackknife standard error from leave-one-out values of a statistic.
+
+    Parameters
+    ----------
+    values : array-like
+        Leave-one-out values, e.g. from ``leave_one_out``.
+
+    Returns
+    -------
+    float
+        The jackknife estimate of the standard error.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    return np.sqrt((n - 1) / n * np.sum((values - values.mean()) ** 2))
+
+
+def acceleration(values):
+    """
+    Acceleration constant of the BCa interval from leave-one-out values.
+
+    Parameters
+    ----------
+    values : array-like
+        Leave-one-out values, e.g. from ``leave_one_out``.
+
+    Returns
+    -------
+    float
+        The acceleration constant.
+    """
+    values = np.asarray(values, dtype=float)
+    d = values.mean() - values
+    denominator = 6 * np.sum(d ** 2) ** 1.5
+    return np.sum(d ** 3) / denominator if denominator > 0 else 0.0
+
+
+def jackknife_stats(data, statistic, confidence_level=0.95,
+                    chunk_bytes=CHUNK_BYTES):
+    """
+    Jackknife estimate of a statistic, its bias, standard error and interval.
+
+    Follows ``astropy.stats.jackknife_stats`` (same arguments and results),
+    but works from ``leave_one_out`` instead of a full resample matrix.
+
+    Parameters
+    ----------
+    data : array-like
+        The observed data.
+    statistic : function
+        The statistic of interest.
+    confidence_level : float, optional
+        Confidence level of the normal interval. Default is 0.95.
+    chunk_bytes : int, optional
+        Memory budget for a chunk of leave-one-out samples.
+
+    Returns
+    -------
+    tuple
+        The bias-corrected estimate, the bias, the standard error and the
+        confidence interval as an array of two bounds.
+    """
+    if not 0 < confidence_level < 1:
+        raise ValueError("confidence level must be in (0, 1).")
+    data = np.asarray(data, dtype=float)
+    n = len(data)
+    if n <= 1:
+        raise ValueError("data must contain at least two values.")
+    values = leave_one_out(data, statistic, chunk_bytes)
+    estimate = statistic(data)
+    bias = (n - 1) * (np.mean(values) - estimate)
+    std_err = jackknife_se(values)
+    estimate = estimate - bias
+    z_score = np.sqrt(2) * erfinv(confidence_level)
+    conf_interval = estimate + z_score * np.array((-std_err, std_err))
+    return estimate, bias, std_err, conf_interval
@@ -0,0 +1,165 @@
+"""
+Reproducible bootstrap execution across processes.
+
+The replicates are split into tasks of a fixed size and every task gets its
+own child stream spawned from one ``numpy.random.SeedSequence``. The split
+does not depend on the number of workers and the task results are merged in
+task order, so the same seed gives identical replicates (and intervals) on 1
+core or on 32.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import instrumentation
+from resampling import CHUNK_BYTES, multi_replicates
+
+# number of replicates computed by a single task
+TASK_SIZE = 1000
+
+
+def split_tasks(n_replications, task_size=TASK_SIZE, seed=None):
+    """
+    Sizes and child seeds of the tasks of a run.
+
+    Parameters
+    ----------
+    n_replications : int
+        The total number of replicates.
+    task_size : int, optional
+        The number of replicates per task; the last task takes the rest.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed; task i gets its i-th child.
+
+    Returns
+    -------
+    list of tuple
+        The size and seed sequence of every task, in task order.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    sizes = [min(task_size, n_replications - start)
+             for start in range(0, n_replications, task_size)]
+    return list(zip(sizes, seed.spawn(len(sizes))))
+
+
+def run_tasks(func, tasks, n_workers=1):
+    """
+    Call a function on the arguments of every task, in worker processes.
+
+    Parameters
+    ----------
+    func : function
+        The task function; it has to be picklable when n_workers > 1.
+    tasks : sequence of tuples
+        The arguments of every call.
+    n_workers : int, optional
+        The number of worker processes. Default is 1 (run in this process).
+
+    Returns
+    -------
+    list
+        The results in task order. The timers and counters of the workers
+        are merged into the recorder in use (see instrumentation.py).
+    """
+    parallel = n_workers > 1 and len(tasks) > 1
+    profiled = parallel and instrumentation.enabled()
+    tasks = [(func, *args, profiled) for args in tasks]
+    if parallel:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(instrumentation.run_task, tasks))
+    else:
+        results = [instrumentation.run_task(task) for task in tasks]
+    for _, report in results:
+        instrumentation.merge(report)
+    return [result for result, _ in results]
+
+
+def _replicates(values, statistics, method, size, seed, chunk_bytes, bandwidth,
+                sample_size):
+    return multi_replicates(values, statistics, method, size,
+                            np.random.default_rng(seed), chunk_bytes, bandwidth,
+                            sample_size)
+
+
+def parallel_replicates(values, statistics, method='percentile',
+                        n_replications=2000, seed=None, n_workers=1,
+                        task_size=TASK_SIZE, chunk_bytes=CHUNK_BYTES,
+                        bandwidth='silverman', sample_size=None):
+    """
+    Replicates of several statistics on several columns, seeded and parallel.
+
+    Parameters
+    ----------
+    values : ndarray
+        Data of shape (n, columns).
+    statistics : sequence of functions
+        The statistics of interest. They have to be picklable when
+        n_workers > 1 (NumPy functions and the factories in resampling.py are).
+    method : str, optional
+        'percentile' (ordinary bootstrap), 'smoothed' or 'bayesian'.
+    n_replications : int, optional
+        The number of replicates. Default is 2000.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed of the child streams.
+    n_workers : int, optional
+        The number of worker processes. Default is 1 (run in this process).
+    task_size : int, optional
+        The number of replicates per task.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk within a task.
+    bandwidth : str or float, optional
+        Kernel bandwidth of the smoothed bootstrap. Default is 'silverman'.
+    sample_size : int, optional
+        The size of each resample. Defaults to the size of the data.
+
+    Returns
+    -------
+    ndarray
+        Replicates of shape (columns, len(statistics), n_replications).
+    """
+    values = np.asarray(values, dtype=float)
+    tasks = [(values, list(statistics), method, size, child, chunk_bytes,
+              bandwidth, sample_size)
+             for size, child in split_tasks(n_replications, task_size, seed)]
+    results = run_tasks(_replicates, tasks, n_workers)
+    if not results:
+        return np.empty((values.shape[1], len(statistics), 0))
+    return np.concatenate(results, axis=-1)
+
+
+def parallel_bootstrap(data, statistic=np.mean, method='percentile',
+                       n_replications=2000, seed=None, n_workers=1, **kwargs):
+    """
+    Seeded, parallel replicates of one or several statistics on one sample.
+
+    Parameters
+    ----------
+    data : array-like
+        The original data.
+    statistic : function or sequence of functions, optional
+        The statistic(s) of interest. Default is the mean.
+    method : str, optional
+        'percentile' (ordinary bootstrap), 'smoothed' or 'bayesian'.
+    n_replications : int, optional
+        The number of replicates. Default is 2000.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed of the child streams.
+    n_workers : int, optional
+        The number of worker processes. Default is 1.
+    **kwargs
+        Passed on to ``parallel_replicates``.
+
+    Returns
+    -------
+    ndarray
+        Replicates of shape (n_replications,) for a single statistic or
+        (len(statistic), n_replications) for a sequence of statistics.
+    """
+    single = callable(statistic)
+    statistics = [statistic] if single else list(statistic)
+    values = np.asarray(data, dtype=float).reshape(-1, 1)
+    replicates = parallel_replicates(values, statistics, method,
+                                     n_replications, seed, n_workers, **kwargs)[0]
+    return replicates[0] if single else replicates
@@ -0,0 +1,789 @@
+"""
+Vectorized resampling engine for the bootstrap functions.
+
+Bootstrap replicates are produced from matrices of resample indices that are
+drawn in chunks, so memory stays bounded whatever the number of replicates.
+Statistics that can work along an axis are evaluated on a whole chunk at once;
+any other callable is applied to each resample in turn.
+"""
+
+import inspect
+
+import numpy as np
+from scipy.stats import kurtosis, skew, trim_mean
+
+from instrumentation import count, timer
+
+# memory budget for a single chunk of resamples, in bytes
+CHUNK_BYTES = 64 * 2 ** 20
+
+
+# Statistics
+
+class _Statistic:
+    # a statistic that remembers what it computes so that the engine can
+    # vectorize it; unlike closures (and partials, whose attributes
+    # multiprocessing drops) it pickles to worker processes intact
+
+    def __init__(self, func, kind, name, **params):
+        self.func = func
+        self.kind = kind
+        self.__name__ = name
+        self.params = params
+
+    def __call__(self, a, axis=None):
+        return self.func(a, axis=axis, **self.params)
+
+    def __repr__(self):
+        return self.__name__
+
+
+def _std(a, axis=None, ddof=1):
+    return np.std(a, axis=axis, ddof=ddof)
+
+
+def _var(a, axis=None, ddof=1):
+    return np.var(a, axis=axis, ddof=ddof)
+
+
+def _quantile(a, axis=None, q=0.5):
+    return np.quantile(a, q, axis=axis)
+
+
+def _trimmed_mean(a, axis=None, proportiontocut=0.1):
+    return trim_mean(a, proportiontocut, axis=axis)
+
+
+def _skewness(a, axis=None, bias=True):
+    return skew(a, axis=axis, bias=bias)
+
+
+def _kurtosis(a, axis=None, fisher=True, bias=True):
+    return kurtosis(a, axis=axis, fisher=fisher, bias=bias)
+
+
+def sample_std(ddof=1):
+    """
+    Standard deviation with the given delta degrees of freedom.
+
+    Parameters
+    ----------
+    ddof : int, optional
+        Delta degrees of freedom. Default is 1 (sample standard deviation).
+
+    Returns
+    -------
+    function
+        A statistic ``f(a, axis=None)``.
+    """
+    return _Statistic(_std, 'std', 'std', ddof=ddof)
+
+
+def sample_var(ddof=1):
+    """
+    Variance with the given delta degrees of freedom.
+
+    Parameters
+    ----------
+    ddof : int, optional
+        Delta degrees of freedom. Default is 1 (sample variance).
+
+    Returns
+    -------
+    function
+        A statistic ``f(a, axis=None)``.
+    """
+    return _Statistic(_var, 'var', 'var', ddof=ddof)
+
+
+def quantile(q):
+    """
+    Quantile of order q.
+
+    Parameters
+    ----------
+    q : float
+        Order of the quantile, between 0 and 1.
+
+    Returns
+    -------
+    function
+        A statistic ``f(a, axis=None)``.
+    """
+    return _Statistic(_quantile, 'quantile', f'quantile_{q:g}', q=q)
+
+
+def trimmed_mean(proportiontocut=0.1):
+    """
+    Mean after cutting the given share of observations from both tails.
+
+    Parameters
+    ----------
+    proportiontocut : float, optional
+        Share of observations cut from each tail. Default is 0.1.
+
+    Returns
+    -------
+    function
+        A statistic ``f(a, axis=None)``.
+    """
+    return _Statistic(_trimmed_mean, 'trimmed_mean',
+                      f'trimmed_mean_{proportiontocut:g}',
+                      proportiontocut=proportiontocut)
+
+
+def skewness(bias=True):
+    """
+    Sample skewness, as ``scipy.stats.skew``.
+
+    Parameters
+    ----------
+    bias : bool, optional
+        If False, the statistical bias is corrected. Default is True.
+
+    Returns
+    -------
+    function
+        A statistic ``f(a, axis=None)``.
+    """
+    return _Statistic(_skewness, 'skew', 'skew', bias=bias)
+
+
+def excess_kurtosis(fisher=True, bias=True):
+    """
+    Sample kurtosis, as ``scipy.stats.kurtosis``.
+
+    Parameters
+    ----------
+    fisher : bool, optional
+        If True (default), 3 is subtracted (excess kurtosis).
+    bias : bool, optional
+        If False, the statistical bias is corrected. Default is True.
+
+    Returns
+    -------
+    function
+        A statistic ``f(a, axis=None)``.
+    """
+    return _Statistic(_kurtosis, 'kurtosis', 'kurtosis', fisher=fisher, bias=bias)
+
+
+# NumPy and SciPy functions the engine knows how to evaluate along an axis
+_NUMPY_KINDS = {
+    np.mean: ('mean', {}),
+    np.std: ('std', {'ddof': 0}),
+    np.var: ('var', {'ddof': 0}),
+    np.median: ('quantile', {'q': 0.5}),
+    np.min: ('quantile', {'q': 0.0}),
+    np.max: ('quantile', {'q': 1.0}),
+    skew: ('skew', {'bias': True}),
+    kurtosis: ('kurtosis', {'fisher': True, 'bias': True}),
+}
+
+
+def statistic_kind(statistic):
+    """
+    Identify a statistic the engine can handle without calling it per resample.
+
+    Parameters
+    ----------
+    statistic : function
+        A statistic, e.g. ``np.mean`` or one built by ``sample_std``.
+
+    Returns
+    -------
+    tuple
+        The kind ('mean', 'std', 'var', 'quantile', 'trimmed_mean', 'skew',
+        'kurtosis') and its parameters, or ``(None, {})`` for an opaque
+        callable.
+    """
+    kind = getattr(statistic, 'kind', None)
+    if kind is not None:
+        return kind, dict(statistic.params)
+    try:
+        kind, params = _NUMPY_KINDS[statistic]
+    except (KeyError, TypeError):
+        return None, {}
+    return kind, dict(params)
+
+
+def is_vectorized(statistic):
+    """Check whether a statistic can be evaluated along an axis."""
+    if statistic_kind(statistic)[0] is not None:
+        return True
+    try:
+        parameters = inspect.signature(statistic).parameters
+    except (TypeError, ValueError):
+        return False
+    return 'axis' in parameters
+
+
+def named_statistics(statistics):
+    """
+    Names and functions of one or several statistics.
+
+    Parameters
+    ----------
+    statistics : function, sequence of functions or dict
+        The statistics; a dict maps names to functions.
+
+    Returns
+    -------
+    list of tuple
+        (name, function) pairs, named by ``__name__`` unless given a dict.
+    """
+    if callable(statistics):
+        statistics = [statistics]
+    if isinstance(statistics, dict):
+        return list(statistics.items())
+    return [(getattr(func, '__name__', repr(func)), func) for func in statistics]
+
+
+def evaluate(statistic, samples):
+    """
+    Evaluate a statistic on every row of a 2-D array of resamples.
+
+    Parameters
+    ----------
+    statistic : function
+        The statistic of interest.
+    samples : ndarray
+        Resamples, one per row.
+
+    Returns
+    -------
+    ndarray
+        One value of the statistic per row.
+    """
+    # built-in statistics count as evaluation, anything else as user code
+    known = statistic_kind(statistic)[0] is not None
+    with timer('evaluate' if known else 'statistic'):
+        if known or is_vectorized(statistic):
+            return np.asarray(statistic(samples, axis=1), dtype=float)
+        # fallback path for callables that only take a single sample
+        return np.array([statistic(row) for row in samples], dtype=float)
+
+
+# Resampling
+
+def select_bandwidth(data, rule='silverman'):
+    """
+    Bandwidth of the Gaussian kernel used by the smoothed bootstrap.
+
+    Parameters
+    ----------
+    data : array-like
+        The original data.
+    rule : str or float, optional
+        'silverman' (default), 'scott' or an explicit bandwidth.
+
+    Returns
+    -------
+    float
+        The kernel bandwidth.
+    """
+    if not isinstance(rule, str):
+        return float(rule)
+    data = np.asarray(data, dtype=float)
+    n = len(data)
+    std = np.std(data, ddof=1)
+    if rule == 'silverman':
+        iqr = np.subtract(*np.percentile(data, [75, 25]))
+        spread = min(std, iqr / 1.34) if iqr > 0 else std
+        return 0.9 * spread * n ** (-1 / 5)
+    if rule == 'scott':
+        return 1.06 * std * n ** (-1 / 5)
+    raise ValueError(f"unknown bandwidth rule: {rule!r}")
+
+
+def chunk_rows(sample_size, chunk_bytes=CHUNK_BYTES, arrays=2):
+    """Number of resamples of the given size that fit into a chunk."""
+    # the index matrix, the gathered values and the kernel noise (if any)
+    # take 8 bytes per element each
+    return max(1, int(chunk_bytes // (8 * arrays * max(sample_size, 1))))
+
+
+def iter_indices(n, n_bootstraps, sample_size=None, random_state=None,
+                 chunk_bytes=CHUNK_BYTES, arrays=2):
+    """
+    Generate matrices of bootstrap resample indices in memory-bounded chunks.
+
+    Parameters
+    ----------
+    n : int
+        The number of observations.
+    n_bootstraps : int
+        The total number of resamples to generate.
+    sample_size : int, optional
+        The size of each resample. Defaults to n.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the indices.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    arrays : int, optional
+        Number of (rows, sample_size) arrays the caller keeps per chunk.
+
+    Yields
+    ------
+    ndarray
+        Indices of shape (rows, sample_size), one resample per row.
+    """
+    if sample_size is None:
+        sample_size = n
+    rng = np.random.default_rng(random_state)
+    rows = chunk_rows(sample_size, chunk_bytes, arrays)
+    for start in range(0, n_bootstraps, rows):
+        size = min(rows, n_bootstraps - start)
+        with timer('draw'):
+            indices = rng.integers(0, n, size=(size, sample_size))
+        count('chunks')
+        count('bytes', indices.nbytes)
+        yield indices
+
+
+def kernel(data, bandwidth, shrink=False):
+    """
+    Parameters of the kernel noise added by the smoothed bootstrap.
+
+    Parameters
+    ----------
+    data : ndarray
+        The original data.
+    bandwidth : str or float
+        Bandwidth rule or value (see ``select_bandwidth``).
+    shrink : bool, optional
+        Rescale the jittered values so that they keep the variance of the data.
+
+    Returns
+    -------
+    tuple
+        Bandwidth, center and scale to pass to ``jitter``.
+    """
+    h = select_bandwidth(data, bandwidth)
+    if not shrink:
+        return h, 0.0, 1.0
+    return h, np.mean(data), 1 / np.sqrt(1 + h ** 2 / np.var(data))
+
+
+def jitter(samples, h, center=0.0, scale=1.0, random_state=None):
+    """Add Gaussian kernel noise to resamples in place and rescale them."""
+    rng = np.random.default_rng(random_state)
+    with timer('draw'):
+        samples += h * rng.standard_normal(samples.shape)
+        if scale != 1.0:
+            samples -= center
+            samples *= scale
+            samples += center
+    return samples
+
+
+def iter_resamples(data, n_bootstraps, sample_size=None, random_state=None,
+                   chunk_bytes=CHUNK_BYTES, bandwidth=None, shrink=False):
+    """
+    Generate bootstrap resamples in memory-bounded chunks.
+
+    Parameters
+    ----------
+    data : array-like
+        The original data to be bootstrapped.
+    n_bootstraps : int
+        The total number of resamples to generate.
+    sample_size : int, optional
+        The size of each resample. Defaults to the size of the data.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the resample indices.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    bandwidth : None, str or float, optional
+        If given, every resampled observation is jittered with Gaussian
+        kernel noise of this bandwidth (see ``select_bandwidth``), which
+        gives the smoothed bootstrap.
+    shrink : bool, optional
+        Rescale the jittered resamples around the mean of the data so that
+        they keep its variance. Only used together with bandwidth.
+
+    Yields
+    ------
+    ndarray
+        Resamples of shape (rows, sample_size), one per row.
+    """
+    data = np.asarray(data, dtype=float)
+    rng = np.random.default_rng(random_state)
+    smoothed = bandwidth is not None
+    if smoothed:
+        params = kernel(data, bandwidth, shrink)
+    for indices in iter_indices(len(data), n_bootstraps, sample_size, rng,
+                                chunk_bytes, arrays=3 if smoothed else 2):
+        with timer('draw'):
+            samples = data[indices]
+        if smoothed:
+            jitter(samples, *params, random_state=rng)
+        yield samples
+
+
+def bootstrap_replicates(data, statistic=np.mean, n_bootstraps=1000,
+                         sample_size=None, random_state=None,
+                         chunk_bytes=CHUNK_BYTES, bandwidth=None, shrink=False):
+    """
+    Compute bootstrap replicates of one or several statistics.
+
+    Parameters
+    ----------
+    data : array-like
+        The original data to be bootstrapped.
+    statistic : function or sequence of functions, optional
+        The statistic(s) of interest. Default is the mean. Several statistics
+        are evaluated on the same resamples.
+    n_bootstraps : int, optional
+        The number of bootstrap samples to generate. Default is 1000.
+    sample_size : int, optional
+        The size of each resample. Defaults to the size of the data.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the resample indices.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    bandwidth : None, str or float, optional
+        Kernel bandwidth for the smoothed bootstrap (see ``iter_resamples``).
+    shrink : bool, optional
+        Keep the variance of the data in the smoothed resamples.
+
+    Returns
+    -------
+    ndarray
+        Replicates of shape (n_bootstraps,) for a single statistic or
+        (len(statistic), n_bootstraps) for a sequence of statistics.
+    """
+    single = callable(statistic)
+    statistics = [statistic] if single else list(statistic)
+    replicates = np.empty((len(statistics), n_bootstraps))
+    start = 0
+    for samples in iter_resamples(data, n_bootstraps, sample_size,
+                                  random_state, chunk_bytes, bandwidth, shrink):
+        stop = start + len(samples)
+        for row, func in zip(replicates, statistics):
+            row[start:stop] = evaluate(func, samples)
+        count('replicates', stop - start)
+        start = stop
+    return replicates[0] if single else replicates
+
+
+# Bayesian bootstrap
+
+def iter_dirichlet_weights(n, n_replications, random_state=None,
+                           chunk_bytes=CHUNK_BYTES):
+    """
+    Generate flat Dirichlet weights for the Bayesian bootstrap in chunks.
+
+    Parameters
+    ----------
+    n : int
+        The number of observations.
+    n_replications : int
+        The total number of weight vectors to generate.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the weights.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+
+    Yields
+    ------
+    ndarray
+        Weights of shape (rows, n), every row sums to one.
+    """
+    rng = np.random.default_rng(random_state)
+    # the weights plus the sorted weights and their cumulative sums
+    rows = chunk_rows(n, chunk_bytes, arrays=3)
+    for start in range(0, n_replications, rows):
+        size = min(rows, n_replications - start)
+        # normalized standard exponentials are Dirichlet(1, ..., 1)
+        with timer('draw'):
+            weights = rng.standard_exponential((size, n))
+            weights /= weights.sum(axis=1, keepdims=True)
+        count('chunks')
+        count('bytes', weights.nbytes)
+        yield weights
+
+
+# statistics computed from the weights directly, without a resample
+WEIGHTED_KINDS = ('mean', 'var', 'std', 'quantile', 'trimmed_mean')
+
+
+def weighted_evaluate(statistic, data, weights, resample_size=None,
+                      random_state=None):
+    """
+    Evaluate a statistic on the data under every row of a weight matrix.
+
+    Means and variances are matrix-vector products, quantiles and trimmed
+    means are read off the cumulative weights of the sorted data. Statistics
+    without a weighted form are evaluated on a resample drawn with the
+    weights as probabilities.
+
+    Parameters
+    ----------
+    statistic : function
+        The statistic of interest.
+    data : ndarray
+        The observed data.
+    weights : ndarray
+        Weights of shape (rows, len(data)), every row sums to one.
+    resample_size : int, optional
+        The size of the resamples for statistics without a weighted form
+        (not used for the WEIGHTED_KINDS). Defaults to the size of the data.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw those resamples.
+
+    Returns
+    -------
+    ndarray
+        One value of the statistic per row of weights.
+    """
+    kind, params = statistic_kind(statistic)
+    with timer('evaluate' if kind is not None else 'statistic'):
+        if kind == 'mean':
+            return weights @ data
+        if kind in ('var', 'std'):
+            # center first to keep the difference of the moments accurate
+            centered = data - np.mean(data)
+            mean = weights @ centered
+            var = weights @ centered ** 2 - mean ** 2
+            ddof = params.get('ddof', 0)
+            if ddof:
+                var /= 1 - ddof * np.einsum('ij,ij->i', weights, weights)
+            return np.sqrt(var) if kind == 'std' else var
+        if kind in ('quantile', 'trimmed_mean'):
+            order = np.argsort(data, kind='stable')
+            sorted_data = data[order]
+            cumulative = np.cumsum(weights[:, order], axis=1)
+            if kind == 'quantile':
+                positions = (cumulative < params['q']).sum(axis=1)
+                return sorted_data[np.minimum(positions, len(data) - 1)]
+            # mass of every observation that falls between the cut points
+            cut = params['proportiontocut']
+            mass = (np.clip(cumulative, cut, 1 - cut)
+                    - np.clip(cumulative - weights[:, order], cut, 1 - cut))
+            return mass @ sorted_data / (1 - 2 * cut)
+        rng = np.random.default_rng(random_state)
+        if resample_size is None:
+            resample_size = len(data)
+        values = np.empty(len(weights))
+        for i, w in enumerate(weights):
+            indices = np.searchsorted(np.cumsum(w), rng.random(resample_size))
+            values[i] = statistic(data[np.minimum(indices, len(data) - 1)])
+        return values
+
+
+# statistics read off the counts or weights of all segments at once
+SEGMENTED_KINDS = ('mean', 'var', 'std', 'quantile')
+
+
+def _quantile_counts(values, counts, sizes, starts, q):
+    # linear interpolation between the order statistics of every resampled
+    # segment, as np.quantile: the value at sorted position k of a resample
+    # is the first index whose cumulative count exceeds k
+    rows, n = counts.shape
+    shift = np.arange(rows)[:, None] * n
+    cumulative = (np.cumsum(counts, axis=1) + shift).ravel()
+    position = (sizes - 1) * q
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below + 1, sizes - 1)
+
+    def order_statistic(k):
+        found = np.searchsorted(cumulative, (starts + k) + shift, side='right')
+        return values[found - shift]
+
+    low = order_statistic(below)
+    return low + (position - below) * (order_statistic(above) - low)
+
+
+def _quantile_weights(values, weights, starts, ends, q):
+    # the rule of weighted_evaluate within every segment: the first value
+    # whose cumulative weight in its segment reaches q
+    cumulative = np.cumsum(weights, axis=1)
+    before = np.concatenate((np.zeros((len(weights), 1)), cumulative), axis=1)
+    cumulative -= np.repeat(before[:, starts], ends - starts, axis=1)
+    positions = np.add.reduceat(cumulative < q, starts, axis=1, dtype=np.intp)
+    return values[np.minimum(starts + positions, ends - 1)]
+
+
+def segmented_evaluate(statistic, values, weights, sizes, starts=None,
+                       counts=None, centers=None):
+    """
+    Evaluate a statistic on consecutive segments of the data at once.
+
+    The data are split into segments (e.g. groups) of the given sizes, each
+    sorted by value and weighted within itself. Means, variances and
+    standard deviations are segmented sums (``np.add.reduceat``) of the
+    weights; quantiles are read off the cumulative counts or weights.
+
+    Parameters
+    ----------
+    statistic : function
+        The statistic of interest, of a kind in SEGMENTED_KINDS.
+    values : ndarray
+        The data, sorted by segment and by value within every segment.
+    weights : ndarray
+        Weights of shape (rows, len(values)); every row sums to one within
+        every segment.
+    sizes : array-like of int
+        The (positive) sizes of the segments.
+    starts : array-like of int, optional
+        The offsets of the segments. Defaults to the cumulative sizes.
+    counts : ndarray, optional
+        Resample counts of the ordinary bootstrap that gave the weights
+        (counts / size); quantiles then interpolate like np.quantile and
+        ddof uses the segment size. Default is None (Dirichlet weights).
+    centers : array-like, optional
+        A central value of every segment, subtracted before the moments are
+        taken. Defaults to the segment means.
+
+    Returns
+    -------
+    ndarray
+        Values of shape (rows, len(sizes)).
+    """
+    kind, params = statistic_kind(statistic)
+    if kind not in SEGMENTED_KINDS:
+        raise ValueError(f"no segmented form of {kind or statistic!r}, "
+                         f"expected one of {SEGMENTED_KINDS}")
+    sizes = np.asarray(sizes, dtype=np.intp)
+    if starts is None:
+        starts = np.cumsum(sizes) - sizes
+    ends = starts + sizes
+    with timer('evaluate'):
+        if kind == 'quantile':
+            if counts is not None:
+                return _quantile_counts(values, counts, sizes, starts, params['q'])
+            return _quantile_weights(values, weights, starts, ends, params['q'])
+        if centers is None:
+            centers = np.add.reduceat(values, starts) / sizes
+        # center every segment first to keep the difference of the moments
+        # accurate
+        centered = values - np.repeat(centers, sizes)
+        mean = np.add.reduceat(weights * centered, starts, axis=1)
+        if kind == 'mean':
+            return mean + centers
+        var = np.add.reduceat(weights * centered ** 2, starts, axis=1) - mean ** 2
+        ddof = params.get('ddof', 0)
+        if ddof:
+            if counts is not None:
+                var *= sizes / (sizes - ddof)
+            else:
+                var /= 1 - ddof * np.add.reduceat(weights ** 2, starts, axis=1)
+        return np.sqrt(var) if kind == 'std' else var
+
+
+def bayesian_replicates(data, statistic=np.mean, n_replications=2000,
+                        resample_size=None, random_state=None,
+                        chunk_bytes=CHUNK_BYTES):
+    """
+    Draw the Bayesian bootstrap posterior of one or several statistics.
+
+    Parameters
+    ----------
+    data : array-like
+        The observed data.
+    statistic : function or sequence of functions, optional
+        The statistic(s) of interest. Default is the mean. Several statistics
+        are evaluated under the same weights.
+    n_replications : int, optional
+        The number of posterior draws. Default is 2000.
+    resample_size : int, optional
+        The size of the resamples for statistics without a weighted form.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the weights.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk of weights.
+
+    Returns
+    -------
+    ndarray
+        Draws of shape (n_replications,) for a single statistic or
+        (len(statistic), n_replications) for a sequence of statistics.
+    """
+    data = np.asarray(data, dtype=float)
+    rng = np.random.default_rng(random_state)
+    single = callable(statistic)
+    statistics = [statistic] if single else list(statistic)
+    replicates = np.empty((len(statistics), n_replications))
+    start = 0
+    for weights in iter_dirichlet_weights(len(data), n_replications, rng,
+                                          chunk_bytes):
+        stop = start + len(weights)
+        for row, func in zip(replicates, statistics):
+            row[start:stop] = weighted_evaluate(func, data, weights,
+                                                resample_size, rng)
+        count('replicates', stop - start)
+        start = stop
+    return replicates[0] if single else replicates
+
+
+# Several columns and statistics
+
+METHODS = ('percentile', 'smoothed', 'bayesian')
+
+
+def multi_replicates(values, statistics, method='percentile',
+                     n_replications=2000, random_state=None,
+                     chunk_bytes=CHUNK_BYTES, bandwidth='silverman',
+                     sample_size=None):
+    """
+    Replicates of several statistics on several columns from shared resamples.
+
+    Parameters
+    ----------
+    values : ndarray
+        Data of shape (n, columns).
+    statistics : sequence of functions
+        The statistics of interest.
+    method : str, optional
+        'percentile' (ordinary bootstrap), 'smoothed' or 'bayesian'.
+    n_replications : int, optional
+        The number of replicates. Default is 2000.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used for resampling.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk.
+    bandwidth : str or float, optional
+        Kernel bandwidth of the smoothed bootstrap. Default is 'silverman'.
+    sample_size : int, optional
+        The size of each resample (for the Bayesian bootstrap, only of the
+        resamples of statistics without a weighted form). Defaults to n.
+
+    Returns
+    -------
+    ndarray
+        Replicates of shape (columns, len(statistics), n_replications).
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method: {method!r}, expected one of {METHODS}")
+    values = np.asarray(values, dtype=float)
+    n, k = values.shape
+    rng = np.random.default_rng(random_state)
+    replicates = np.empty((k, len(statistics), n_replications))
+    start = 0
+    if method == 'bayesian':
+        for weights in iter_dirichlet_weights(n, n_replications, rng, chunk_bytes):
+            stop = start + len(weights)
+            for j in range(k):
+                for i, func in enumerate(statistics):
+                    replicates[j, i, start:stop] = weighted_evaluate(
+                        func, values[:, j], weights, sample_size, rng)
+            count('replicates', stop - start)
+            start = stop
+        return replicates
+    smoothed = method == 'smoothed'
+    if smoothed:
+        kernels = [kernel(values[:, j], bandwidth, shrink=True) for j in range(k)]
+    for indices in iter_indices(n, n_replications, sample_size, rng, chunk_bytes,
+                                arrays=3 if smoothed else 2):
+        stop = start + len(indices)
+        for j in range(k):
+            with timer('draw'):
+                samples = values[indices, j]
+            if smoothed:
+                jitter(samples, *kernels[j], random_state=rng)
+            for i, func in enumerate(statistics):
+                replicates[j, i, start:stop] = evaluate(func, samples)
+        count('replicates', stop - start)
+        start = stop
+    return replicates
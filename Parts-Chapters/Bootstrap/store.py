@@ -0,0 +1,291 @@
+"""
+Persistent bootstrap replicates that new statistics can be evaluated on.
+
+A replicate of the ordinary bootstrap is fully described by how often it
+draws every observation, so a store keeps these multinomial counts, one row
+per replicate, in a memory-mapped ``.npy`` file of the smallest unsigned
+type that holds n (uint8 up to 255 observations, uint16 up to 65535: an
+eighth or a quarter of the size of the float resamples). Every store also records the seed and the
+chunk size of its draws, which is all a Bayesian bootstrap store keeps: its
+Dirichlet weights are regenerated from the seed when needed. A later session
+opens the store and evaluates any statistic on exactly the same replicates,
+so intervals of a re-run report do not move and no resampling is repeated::
+
+    store = ReplicateStore.create('ds-replicates', len(data), seed=42)
+    ...
+    store = ReplicateStore('ds-replicates')
+    replicates = store.replicates(data[['price', 'price_m']], [np.mean, np.median])
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from instrumentation import count, timer
+from resampling import (CHUNK_BYTES, SEGMENTED_KINDS, chunk_rows, evaluate,
+                        iter_dirichlet_weights, segmented_evaluate, statistic_kind,
+                        weighted_evaluate)
+
+METHODS = ('percentile', 'bayesian')
+
+# file names within a store directory
+META_FILE = 'store.json'
+COUNTS_FILE = 'counts.npy'
+
+
+def _seed_state(seed):
+    # what it takes to recreate a seed sequence, in JSON
+    return {'entropy': str(seed.entropy), 'spawn_key': list(seed.spawn_key)}
+
+
+def _seed(state):
+    return np.random.SeedSequence(int(state['entropy']),
+                                  spawn_key=tuple(state['spawn_key']))
+
+
+class ReplicateStore:
+    """
+    Bootstrap replicates saved as resample counts or as a seed.
+
+    A count never exceeds the number of observations n, so the counts are
+    stored in the smallest unsigned type holding n unless ``create`` is given
+    a narrower dtype, which fails once an observation is drawn more often
+    than the type can hold.
+
+    Parameters
+    ----------
+    path : str
+        The directory of a store written by ``ReplicateStore.create``.
+    key : str, optional
+        If given, it has to match the key the store was created with, e.g.
+        the hash of the data file (see ``listings.file_hash``).
+    """
+
+    def __init__(self, path, key=None):
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as file:
+            meta = json.load(file)
+        if key is not None and meta['key'] != key:
+            raise ValueError(f"the store {path!r} was created for other data")
+        self.path = path
+        self.method = meta['method']
+        self.n = meta['n']
+        self.n_replications = meta['n_replications']
+        self.chunk_bytes = meta['chunk_bytes']
+        self.key = meta['key']
+        self.seed = _seed(meta['seed'])
+        counts_path = os.path.join(path, COUNTS_FILE)
+        self.counts = (np.load(counts_path, mmap_mode='r')
+                       if os.path.exists(counts_path) else None)
+
+    @classmethod
+    def create(cls, path, n, n_replications=2000, method='percentile', seed=None,
+               counts=True, dtype=None, key=None, chunk_bytes=CHUNK_BYTES):
+        """
+        Draw replicates and save them.
+
+        Parameters
+        ----------
+        path : str
+            The directory of the store; it must not exist yet.
+        n : int
+            The number of observations of the data.
+        n_replications : int, optional
+            The number of replicates. Default is 2000.
+        method : str, optional
+            'percentile' (ordinary bootstrap) or 'bayesian'.
+        seed : None, int or numpy.random.SeedSequence, optional
+            Root seed of the draws.
+        counts : bool, optional
+            Save the resample counts of the ordinary bootstrap. Without them
+            the draws are repeated from the seed on every evaluation. Default
+            is True; ignored for the Bayesian bootstrap.
+        dtype : numpy dtype, optional
+            The unsigned integer type of the counts. Defaults to the
+            smallest one holding n; a narrower type raises ValueError if a
+            count exceeds its range.
+        key : str, optional
+            Identifies the data, checked when the store is opened.
+        chunk_bytes : int, optional
+            Memory budget for a single chunk.
+
+        Returns
+        -------
+        ReplicateStore
+        """
+        if method not in METHODS:
+            raise ValueError(f"unknown method: {method!r}, expected one of {METHODS}")
+        if os.path.exists(path):
+            raise FileExistsError(f"the store {path!r} already exists")
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        meta = {'method': method, 'n': n, 'n_replications': n_replications,
+                'chunk_bytes': chunk_bytes, 'key': key, 'seed': _seed_state(seed)}
+        # write into a temporary directory and rename it, as the listing cache
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent)
+        try:
+            with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as file:
+                json.dump(meta, file, indent=1)
+            store = cls(staging)
+            if counts and method == 'percentile':
+                if dtype is None:
+                    dtype = np.min_scalar_type(n)
+                limit = np.iinfo(dtype).max
+                out = np.lib.format.open_memmap(os.path.join(staging, COUNTS_FILE),
+                                                mode='w+', dtype=dtype,
+                                                shape=(n_replications, n))
+                start = 0
+                for chunk in store._draw_counts():
+                    if chunk.max(initial=0) > limit:
+                        raise ValueError(f"a count exceeds the range of {np.dtype(dtype)}")
+                    out[start:start + len(chunk)] = chunk
+                    start += len(chunk)
+                out.flush()
+                del out
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return cls(path)
+
+    def _stream(self, i):
+        # generator of the i-th child of the stored seed, the same on every
+        # call (SeedSequence.spawn would move on to new children)
+        return np.random.default_rng(np.random.SeedSequence(
+            self.seed.entropy, spawn_key=self.seed.spawn_key + (i,)))
+
+    def _rows(self):
+        # replicates per chunk; fixed by the stored budget so that the draws
+        # can be repeated exactly
+        return chunk_rows(self.n, self.chunk_bytes, arrays=4)
+
+    def _draw_counts(self):
+        # resample counts of the ordinary bootstrap, chunk by chunk
+        rng = self._stream(0)
+        rows = self._rows()
+        for start in range(0, self.n_replications, rows):
+            size = min(rows, self.n_replications - start)
+            with timer('draw'):
+                indices = rng.integers(0, self.n, size=(size, self.n))
+                shift = np.arange(size)[:, None] * self.n
+                counts = np.bincount((indices + shift).ravel(),
+                                     minlength=size * self.n).reshape(size, self.n)
+            count('chunks')
+            count('bytes', indices.nbytes + counts.nbytes)
+            yield counts
+
+    def iter_counts(self):
+        """
+        Resample counts of the ordinary bootstrap in chunks.
+
+        Yields
+        ------
+        ndarray
+            Counts of shape (rows, n), every row sums to n; read from the
+            store, or drawn again from its seed.
+        """
+        if self.method != 'percentile':
+            raise ValueError('a Bayesian bootstrap store has no counts')
+        if self.counts is None:
+            yield from self._draw_counts()
+            return
+        rows = self._rows()
+        for start in range(0, self.n_replications, rows):
+            with timer('draw'):
+                counts = np.asarray(self.counts[start:start + rows], dtype=np.intp)
+            count('chunks')
+            count('bytes', counts.nbytes)
+            yield counts
+
+    def iter_weights(self):
+        """
+        Dirichlet weights of the Bayesian bootstrap in chunks.
+
+        Yields
+        ------
+        ndarray
+            Weights of shape (rows, n), every row sums to one.
+        """
+        if self.method != 'bayesian':
+            raise ValueError('an ordinary bootstrap store has no Dirichlet weights')
+        yield from iter_dirichlet_weights(self.n, self.n_replications,
+                                          self._stream(0), self.chunk_bytes)
+
+    def replicates(self, values, statistics=np.mean):
+        """
+        Evaluate statistics on the stored replicates.
+
+        Means, variances, standard deviations and quantiles come from the
+        counts or weights directly; other statistics of the ordinary
+        bootstrap are evaluated on the resamples rebuilt from the counts,
+        those of the Bayesian bootstrap on resamples drawn with the weights
+        (from a stream of the stored seed, so they are repeatable too).
+
+        Parameters
+        ----------
+        values : array-like
+            The data, of shape (n,) or (n, columns), in the row order the
+            store was created for.
+        statistics : function or sequence of functions, optional
+            The statistic(s) of interest. Default is the mean.
+
+        Returns
+        -------
+        ndarray
+            Replicates of shape ([columns,] [len(statistics),] n_replications),
+            the optional dimensions present for 2-D values and for a sequence
+            of statistics.
+        """
+        values = np.asarray(values, dtype=float)
+        flat = values.ndim == 1
+        values = values.reshape(len(values), -1)
+        if len(values) != self.n:
+            raise ValueError(f"the store has {self.n} observations, "
+                             f"the data {len(values)}")
+        single = callable(statistics)
+        statistics = [statistics] if single else list(statistics)
+        kinds = [statistic_kind(func) for func in statistics]
+        columns = values.shape[1]
+        replicates = np.empty((columns, len(statistics), self.n_replications))
+        # sorted columns, a single segment each
+        orders = [np.argsort(values[:, j], kind='stable') for j in range(columns)]
+        start = 0
+        if self.method == 'percentile':
+            for counts in self.iter_counts():
+                stop = start + len(counts)
+                for j, order in enumerate(orders):
+                    data = values[order, j]
+                    sorted_counts = counts[:, order]
+                    weights = sorted_counts / self.n
+                    samples = None
+                    for i, (func, (kind, _)) in enumerate(zip(statistics, kinds)):
+                        if kind in SEGMENTED_KINDS:
+                            result = segmented_evaluate(func, data, weights, [self.n],
+                                                        counts=sorted_counts)[:, 0]
+                        else:
+                            if samples is None:
+                                # every resample, sorted, rebuilt from its counts
+                                samples = np.repeat(np.tile(data, len(counts)),
+                                                    sorted_counts.ravel())
+                                samples = samples.reshape(len(counts), self.n)
+                            result = evaluate(func, samples)
+                        replicates[j, i, start:stop] = result
+                count('replicates', stop - start)
+                start = stop
+        else:
+            rng = self._stream(1)
+            for weights in self.iter_weights():
+                stop = start + len(weights)
+                for j in range(columns):
+                    for i, func in enumerate(statistics):
+                        replicates[j, i, start:stop] = weighted_evaluate(
+                            func, values[:, j], weights, random_state=rng)
+                count('replicates', stop - start)
+                start = stop
+        if single:
+            replicates = replicates[:, 0]
+        return replicates[0] if flat else replicates
@@ -0,0 +1,125 @@
+"""
+Streaming (online) bootstrap for price columns that do not fit in memory.
+
+Instead of resampling n observations with replacement, every observation
+enters every replicate with an independent Poisson(1) weight, which
+approximates the multinomial bootstrap counts without knowing n in advance.
+The data is read in chunks and only B running sums per statistic are kept,
+so memory does not depend on the number of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, timer
+from intervals import percentile_interval
+from resampling import CHUNK_BYTES
+
+
+class OnlineBootstrap:
+    """
+    Accumulators of the Poisson bootstrap replicates of the mean and variance.
+
+    Parameters
+    ----------
+    n_replications : int, optional
+        The number of bootstrap replicates. Default is 1000.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the Poisson weights.
+    chunk_bytes : int, optional
+        Memory budget for a block of weights.
+    """
+
+    def __init__(self, n_replications=1000, random_state=None,
+                 chunk_bytes=CHUNK_BYTES):
+        self.n_replications = n_replications
+        self.rng = np.random.default_rng(random_state)
+        self.chunk_bytes = chunk_bytes
+        self.shift = None
+        self.counts = np.zeros(n_replications)
+        self.sums = np.zeros(n_replications)
+        self.squares = np.zeros(n_replications)
+
+    def update(self, values):
+        """Add a chunk of observations (missing values are skipped)."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        if self.shift is None:
+            # sums of values shifted by a typical value keep the variance accurate
+            self.shift = np.mean(values)
+        values = values - self.shift
+        # the weights and their float copy take 8 bytes per element each
+        block = max(1, int(self.chunk_bytes // (16 * self.n_replications)))
+        for start in range(0, len(values), block):
+            x = values[start:start + block]
+            with timer('draw'):
+                weights = self.rng.poisson(1.0, size=(self.n_replications, len(x)))
+                weights = weights.astype(float)
+            count('chunks')
+            count('bytes', weights.nbytes)
+            with timer('evaluate'):
+                self.counts += weights.sum(axis=1)
+                self.sums += weights @ x
+                self.squares += weights @ x ** 2
+        return self
+
+    def means(self):
+        """Replicates of the mean."""
+        return self.shift + self.sums / self.counts
+
+    def variances(self, ddof=1):
+        """Replicates of the variance with the given delta degrees of freedom."""
+        centered = self.squares - self.sums ** 2 / self.counts
+        return np.maximum(centered, 0) / (self.counts - ddof)
+
+
+def _chunks(source, column, chunksize):
+    # a CSV path is read in chunks, anything else is an iterable of arrays
+    if isinstance(source, str):
+        reader = pd.read_csv(source, usecols=[column], chunksize=chunksize)
+        for chunk in reader:
+            yield chunk[column].to_numpy(dtype=float)
+    else:
+        yield from source
+
+
+def streaming_bootstrap(source, column='price_m', n_replications=1000,
+                        alpha=0.05, chunksize=100_000, ddof=1,
+                        random_state=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Bootstrap mean and standard deviation of a column in a single pass.
+
+    Parameters
+    ----------
+    source : str or iterable of array-like
+        Path of a CSV file or an iterable of chunks of values.
+    column : str, optional
+        The column to read from the CSV file. Default is 'price_m'.
+    n_replications : int, optional
+        The number of bootstrap replicates. Default is 1000.
+    alpha : float, optional
+        The significance level. Default is 0.05.
+    chunksize : int, optional
+        The number of rows read from the CSV file at a time.
+    ddof : int, optional
+        Delta degrees of freedom of the standard deviation. Default is 1.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the Poisson weights.
+    chunk_bytes : int, optional
+        Memory budget for a block of weights.
+
+    Returns
+    -------
+    A tuple containing:
+        - The bootstrap mean and its confidence interval.
+        - The bootstrap standard deviation and its confidence interval.
+    """
+    bootstrap = OnlineBootstrap(n_replications, random_state, chunk_bytes)
+    for values in _chunks(source, column, chunksize):
+        bootstrap.update(values)
+    means = bootstrap.means()
+    stds = np.sqrt(bootstrap.variances(ddof))
+    mean_ci, std_ci = percentile_interval([means, stds], alpha)
+    return (np.mean(means), mean_ci), (np.mean(stds), std_ci)
@@ -7,9 +7,18 @@ Created on Thu Jun  9 20:30:30 2022
 """
 
 # Import Libraries
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy import stats
+from roc import interactive_roc, roc_auc, roc_curve
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from groups import GroupIndex
+from listings import load_listing
+
+# region of a county by its prefix
+REGIONS = {'s': 'SPb', 'l': 'LO'}
 
 # Plot
 f0 = stats.norm(0, 1)
@@ -26,3 +35,19 @@ ax.fill_between(xi, f0.pdf(xi), where=xi > 1, alpha=.3, color='b')
 
 # save to .pdf
 plt.savefig('Plot-ROC-step-1.pdf', bbox_inches='tight')
+
+# Empirical ROC: S-Pb. vs LO prices from one sort of both samples
+
+df = load_listing('spba-flats-210928.csv')
+# prices by region from the categories of the counties; spb and lo are views
+regions = GroupIndex.from_frame(df, 'price_m', 'county',
+                                key=lambda county: REGIONS[county[0]])
+spb = regions['SPb']
+lo = regions['LO']
+thresholds, fpr, tpr = roc_curve(spb, lo)
+print('AUC=%.3f' % roc_auc(fpr, tpr))
+
+# histograms, ROC curve and a threshold slider
+fig, slider = interactive_roc(spb, lo, labels=('S-Pb.', 'LO'))
+plt.savefig('Plot-ROC-empirical.pdf', bbox_inches='tight')
+plt.show()
@@ -2,193 +2,119 @@
 # Spyder Editor
 
 # import libraries
-import numpy as np
-import pandas as pd
-import math
-import matplotlib.pyplot as plt
-from scipy.stats import norm
-from scipy.stats import normaltest
-from scipy.stats import shapiro
-from scipy.stats import anderson
-from scipy.stats import mannwhitneyu
-
-# set significance level
-alpha = 0.05
-
-# import dataset
-df = pd.read_csv('spba-flats-210928.csv')
-print(df)
-type(df["price_m"])
-
-# get only prices and counties, release RAM
-df1 = df[["price_m", "county"]]
-del [[df]]
-
-# calculate the number of observations on data frame
-spbaLenR = round(math.sqrt(len(df1.index)))
-
-# fit a normal distribution to the data: mean and standard deviation
-mu, std = norm.fit(df1["price_m"])
-
-# plot the histogram
-plt.hist(df1["price_m"], bins=spbaLenR, density=True)
-
-# plot the PDF
-xmin, xmax = plt.xlim()
-x = np.linspace(xmin, xmax, 100)
-p = norm.pdf(x, mu, std)
-
-plt.plot(x, p, 'k', linewidth=2)
-title = "Fit Values: {:.2f} and {:.2f}".format(mu, std)
-plt.title(title)
-
-# save to .pdf
-plt.savefig('spba-price-histogram-py.pdf')
-
-# create separate dataframes for city and suburbs
-dfs = df1[df1["county"].str.startswith('s')]
-dfl = df1[df1["county"].str.startswith('l')]
-
-# Saint-Petersburg
-
-# calculate the number of observations on data frame
-spbLenR = round(math.sqrt(len(dfs.index)))
-
-# fit a normal distribution to the data: mean and standard deviation
-muS, stdS = norm.fit(dfs["price_m"])
-
-# plot the histogram
-plt.hist(dfs["price_m"], bins=spbLenR, density=True)
-
-# plot the PDF
-xmin, xmax = plt.xlim()
-x = np.linspace(xmin, xmax, 100)
-ps = norm.pdf(x, muS, stdS)
-
-plt.plot(x, ps, 'k', linewidth=2)
-title = "S-Pb. Fit Values: {:.2f} and {:.2f}".format(muS, stdS)
-plt.title(title)
-
-# save to .pdf
-plt.savefig('spb-price-histogram-py.pdf')
-
-# LO
-
-# calculate the number of observations on data frame
-loLenR = round(math.sqrt(len(dfl.index)))
-
-# fit a normal distribution to the data: mean and standard deviation
-muL, stdL = norm.fit(dfl["price_m"])
-
-# plot the histogram
-plt.hist(dfl["price_m"], bins=loLenR, density=True)
-
-# plot the PDF
-xmin, xmax = plt.xlim()
-x = np.linspace(xmin, xmax, 100)
-pl = norm.pdf(x, muL, stdL)
-
-plt.plot(x, pl, 'k', linewidth=2)
-title = "LO. Fit Values: {:.2f} and {:.2f}".format(muL, stdL)
-plt.title(title)
-
-# save to .pdf
-plt.savefig('lo-price-histogram-py.pdf')
-
-# add labels to data
-dfs["region"] = "SPb"
-dfl["region"] = "LO"
-
-# plot boxplot
-prices = [dfs, dfl]
-allPrices = pd.concat(prices)
-plt.figure()
-allPrices.boxplot(by="region")
-
-# save to .pdf
-plt.savefig('spb-lo-boxplot-py.pdf')
-
-# normality tests
-
-# Shapiro-Wilk
-
-# SPB
-stat, p = shapiro(dfs['price_m'])
-print('Statistics=%.3f, p=%.3f' % (stat, p))
-# interpret
-if p <= alpha:
-    print('Sample does not look Gaussian (reject H0)')
-else:
-    print('Sample looks Gaussian (fail to reject H0)')
-
-# LO
-stat, p = shapiro(dfl['price_m'])
-print('Statistics=%.3f, p=%.3f' % (stat, p))
-# interpret
-if p <= alpha:
-    print('Sample does not look Gaussian (reject H0)')
-else:
-    print('Sample looks Gaussian (fail to reject H0)')
-
-# D'Agostino K^2
-
-# SPB
-stat, p = normaltest(dfs['price_m'])
-print('Statistics=%.3f, p=%.3f' % (stat, p))
-# interpret
-if p <= alpha:
-    print('Sample does not look Gaussian (reject H0)')
-else:
-    print('Sample looks Gaussian (fail to reject H0)')
-
-# LO
-stat, p = normaltest(dfl['price_m'])
-print('Statistics=%.3f, p=%.3f' % (stat, p))
-# interpret
-if p <= alpha:
-    print('Sample does not look Gaussian (reject H0)')
-else:
-    print('Sample looks Gaussian (fail to reject H0)')
-
-# Anderson-Darling
-
-# SPB
-result = anderson(dfs['price_m'])
-print('Statistic: %.3f' % result.statistic)
-p = 0
-for i in range(len(result.critical_values)):
-    sl, cv = result.significance_level[i], result.critical_values[i]
-    if result.statistic < result.critical_values[i]:
-        print('%.3f: %.3f, data looks normal (fail to reject H0)' % (sl, cv))
-    else:
-        print('%.3f: %.3f, data does not look normal (reject H0)' % (sl, cv))
-
-# LO
-result = anderson(dfl['price_m'])
-print('Statistic: %.3f' % result.statistic)
-p = 0
-for i in range(len(result.critical_values)):
-    sl, cv = result.significance_level[i], result.critical_values[i]
-    if result.statistic < result.critical_values[i]:
-        print('%.3f: %.3f, data looks normal (fail to reject H0)' % (sl, cv))
+import os
+import sys
+# the shared loaders and the instrumentation of the Bootstrap chapter
+CHAPTERS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(CHAPTERS, 'Bootstrap'))
+sys.path.insert(0, CHAPTERS)
+from figures import boxplot_spec, histogram_spec, render_figures
+from mann_whitney import (bootstrap_auc, delong_interval, mann_whitney,
+                          pairwise_mann_whitney)
+from normality import normality_report
+from permutation import permutation_test
+from groups import GroupIndex
+from listings import load_listing
+from result_cache import cached
+
+# results of unchanged data and parameters come from .result-cache (the
+# wrappers do nothing until called; the cache is opened on first use)
+(normality_report, mann_whitney, bootstrap_auc, delong_interval,
+ pairwise_mann_whitney, permutation_test) = map(cached, (
+    normality_report, mann_whitney, bootstrap_auc, delong_interval,
+    pairwise_mann_whitney, permutation_test))
+
+# region of a county by its prefix
+REGIONS = {'s': 'SPb', 'l': 'LO'}
+
+
+def main():
+    # set significance level
+    alpha = 0.05
+
+    # import only prices and counties (int32 and categorical), cached as .npy
+    df1 = load_listing('spba-flats-210928.csv')
+    print(df1)
+
+    # index prices by region once, from the categories of the counties, sorted
+    # prices within each region; spb and lo are views, not copies
+    regions = GroupIndex.from_frame(df1, 'price_m', 'county',
+                                    key=lambda county: REGIONS[county[0]],
+                                    presorted=True)
+    spb = regions['SPb']
+    lo = regions['LO']
+
+    # histograms (sqrt(n) bins) with fitted normal PDFs and the boxplot, saved
+    # to .pdf on explicit Agg figures; unchanged figures are not redrawn
+    figures = [histogram_spec(df1['price_m'], 'spba-price-histogram-py.pdf'),
+               histogram_spec(spb, 'spb-price-histogram-py.pdf', 'S-Pb. Fit Values'),
+               histogram_spec(lo, 'lo-price-histogram-py.pdf', 'LO. Fit Values'),
+               boxplot_spec({'SPb': spb, 'LO': lo}, 'spb-lo-boxplot-py.pdf')]
+    print('rendered:', render_figures(figures, n_workers=len(figures)))
+
+    # normality tests: Shapiro-Wilk (on subsamples above 5000 rows),
+    # D'Agostino K^2, Jarque-Bera and Anderson-Darling for both regions
+    report = normality_report(regions, alpha=alpha, seed=1)
+    print(report.T)
+    for region, row in report.iterrows():
+        if row[['shapiro_reject', 'normaltest_reject', 'anderson_reject']].any():
+            print('%s: sample does not look Gaussian (reject H0)' % region)
+        else:
+            print('%s: sample looks Gaussian (fail to reject H0)' % region)
+
+    # Mann-Whitney test, AUC&RBC from one ranking of both samples
+    result = mann_whitney(spb, lo, presorted=True)
+    stat, p = result.statistic, result.pvalue
+    print('stat=%.3f, p=%.3f' % (stat, p))
+    if p < 0.05:
+        print('Probably different distributions')
     else:
-        print('%.3f: %.3f, data does not look normal (reject H0)' % (sl, cv))
-
-# shapiroWSpb, shapiroPvalueSpb = stats.shapiro(dfs['price_m'])
-# shapiroWLO, shapiroPvalueLO = stats.shapiro(dfl['price_m'])
-
-# Mann-Whitney test
-stat, p = mannwhitneyu(dfs['price_m'], dfl['price_m'])
-print('stat=%.3f, p=%.3f' % (stat, p))
-if p < 0.05:
-    print('Probably different distributions')
-else:
-    print('Probably the same distribution')
-
-# calculate AUC&RBC
-n1n2 = len(dfs.index) * len(dfl.index)
-auc = stat/n1n2
-rbc = auc-(1-auc)
-
-# U = stats.mannwhitneyu(x=dfs['price_m'], y=dfl['price_m'],
-#                       alternative='two-sided')
+        print('Probably the same distribution')
+
+    # AUC&RBC
+    auc = result.auc
+    rbc = result.rbc
+    print('AUC=%.3f, RBC=%.3f' % (auc, rbc))
+
+    # stratified bootstrap (within each region) and DeLong intervals
+    boot = bootstrap_auc(spb, lo, random_state=1)
+    print('bootstrap AUC CI=[%.3f, %.3f], RBC CI=[%.3f, %.3f]'
+          % (*boot.auc_ci, *boot.rbc_ci))
+    delong = delong_interval(spb, lo)
+    print('DeLong AUC CI=[%.3f, %.3f], RBC CI=[%.3f, %.3f]'
+          % (*delong.auc_ci, *delong.rbc_ci))
+
+    # U = stats.mannwhitneyu(x=dfs['price_m'], y=dfl['price_m'],
+    #                       alternative='two-sided')
+
+    # all pairs of counties from one shared sort, Holm-adjusted p-values
+    pairs = pairwise_mann_whitney(df1['price_m'], df1['county'])
+    print(pairs.auc.round(3))
+    print(pairs.rbc.round(3))
+    different = (pairs.pvalue_adjusted.values < alpha).sum() // 2
+    print('county pairs different at alpha: %d' % different)
+
+    # all pairs of Almaty districts
+    dfa = load_listing('almaty-apts-2019-1.csv')
+    pairsA = pairwise_mann_whitney(dfa['price.m'], dfa['district.name'])
+    print(pairsA.auc.round(3))
+    print(pairsA.pvalue_adjusted.round(3))
+
+    # small districts: tie-aware exact and permutation p-values
+    sizesA = pairsA.sizes[pairsA.sizes >= 5].sort_values()
+    smallA, smallB = sizesA.index[:2]
+    x = dfa.loc[dfa['district.name'] == smallA, 'price.m']
+    y = dfa.loc[dfa['district.name'] == smallB, 'price.m']
+    print('%s vs %s: asymptotic p=%.4f' % (smallA, smallB,
+                                           pairsA.pvalue.loc[smallA, smallB]))
+    exact = permutation_test(x, y, method='exact')
+    print('exact p=%.4f' % exact.pvalue)
+    perm = permutation_test(x, y, method='permutation', seed=1)
+    print('permutation p=%.4f (%d permutations)' % (perm.pvalue,
+                                                    perm.n_permutations))
+
+
+# worker processes re-import this script where there is no fork (spawn,
+# forkserver), so nothing runs at import time
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Headless, cached rendering of the price histograms and boxplots.
+
+Every figure is first reduced to a small specification: histogram counts
+from ``np.histogram`` with sqrt(n) bins and the fitted normal parameters, or
+the boxplot statistics. A figure is rendered again only when the hash of its
+specification differs from the one recorded at its last rendering, and the
+figures that are stale are drawn in worker processes on explicit Agg
+figures, so no pyplot state is shared between plots.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# file next to the figures that records the hash of every rendered figure
+HASHES_FILE = '.figure-hashes.json'
+
+# changes whenever the drawing code changes, so old figures are redrawn
+RENDERER_VERSION = 1
+
+
+def histogram_spec(values, path, title='Fit Values'):
+    """
+    Specification of a density histogram with the fitted normal PDF.
+
+    Parameters
+    ----------
+    values : array-like
+        The data, e.g. prices.
+    path : str
+        Output file of the figure.
+    title : str, optional
+        Title prefix, followed by the fitted mean and standard deviation.
+
+    Returns
+    -------
+    dict
+    """
+    values = np.asarray(values, dtype=float)
+    bins = round(np.sqrt(len(values)))
+    density, edges = np.histogram(values, bins=bins, density=True)
+    # maximum likelihood fit, as scipy.stats.norm.fit
+    return {'kind': 'histogram', 'path': path, 'title': title,
+            'density': density, 'edges': edges,
+            'mu': float(np.mean(values)), 'std': float(np.std(values))}
+
+
+def boxplot_spec(groups, path):
+    """
+    Specification of boxplots of several groups.
+
+    Parameters
+    ----------
+    groups : dict
+        Group labels mapped to their values.
+    path : str
+        Output file of the figure.
+
+    Returns
+    -------
+    dict
+    """
+    from matplotlib.cbook import boxplot_stats
+
+    stats = []
+    for label, values in groups.items():
+        stat, = boxplot_stats(np.asarray(values, dtype=float), labels=[label])
+        stats.append(stat)
+    return {'kind': 'boxplot', 'path': path, 'stats': stats}
+
+
+def spec_hash(spec):
+    """
+    Hash of a figure specification, arrays included.
+
+    Parameters
+    ----------
+    spec : dict
+        A figure specification.
+
+    Returns
+    -------
+    str
+        The hexadecimal SHA-1 digest.
+    """
+    digest = hashlib.sha1(str(RENDERER_VERSION).encode())
+
+    def update(value):
+        if isinstance(value, dict):
+            for key in sorted(value):
+                digest.update(str(key).encode())
+                update(value[key])
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                update(item)
+        elif isinstance(value, np.ndarray):
+            digest.update(np.ascontiguousarray(value, dtype=float).tobytes())
+        else:
+            digest.update(repr(value).encode())
+
+    update(spec)
+    return digest.hexdigest()
+
+
+def _render(spec):
+    # explicit figure on the Agg canvas: no pyplot, no shared state
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if spec['kind'] == 'histogram':
+        edges = spec['edges']
+        ax.stairs(spec['density'], edges, fill=True)
+        x = np.linspace(edges[0], edges[-1], 100)
+        pdf = (np.exp(-((x - spec['mu']) / spec['std']) ** 2 / 2)
+               / (spec['std'] * np.sqrt(2 * np.pi)))
+        ax.plot(x, pdf, 'k', linewidth=2)
+        ax.set_title('{}: {:.2f} and {:.2f}'.format(spec['title'], spec['mu'],
+                                                    spec['std']))
+    else:
+        ax.bxp(spec['stats'])
+    fig.savefig(spec['path'])
+    return spec['path']
+
+
+def _record(path):
+    # the hashes file in the directory of a figure
+    return os.path.join(os.path.dirname(os.path.abspath(path)), HASHES_FILE)
+
+
+def _load_hashes(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_figures(specs, n_workers=1, force=False):
+    """
+    Render the figures whose specification changed since the last run.
+
+    Parameters
+    ----------
+    specs : sequence of dict
+        Figure specifications, e.g. from ``histogram_spec``.
+    n_workers : int, optional
+        The number of worker processes. Default is 1 (render in this
+        process).
+    force : bool, optional
+        Render all figures regardless of their hashes.
+
+    Returns
+    -------
+    list
+        The paths of the figures that were rendered.
+    """
+    hashes = {spec['path']: spec_hash(spec) for spec in specs}
+    records = {}
+    stale = []
+    for spec in specs:
+        path = spec['path']
+        record = _record(path)
+        if record not in records:
+            records[record] = _load_hashes(record)
+        key = os.path.basename(path)
+        if (force or records[record].get(key) != hashes[path]
+                or not os.path.exists(path)):
+            stale.append(spec)
+    if n_workers > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            rendered = list(executor.map(_render, stale))
+    else:
+        rendered = [_render(spec) for spec in stale]
+    changed = set()
+    for path in rendered:
+        record = _record(path)
+        records[record][os.path.basename(path)] = hashes[path]
+        changed.add(record)
+    for record in changed:
+        with open(record, 'w', encoding='utf-8') as file:
+            json.dump(records[record], file, indent=1, sort_keys=True)
+    return rendered
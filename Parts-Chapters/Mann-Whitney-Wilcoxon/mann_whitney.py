@@ -0,0 +1,426 @@
+"""
+Rank-based Mann-Whitney U test with AUC and rank-biserial correlation.
+
+U, AUC, the rank-biserial correlation, the tie-corrected variance of U and
+the normal-approximation p-value all come from a single ranking of the
+concatenated samples. The ranking can be computed once and reused for
+repeated comparisons on the same split, and samples that are already sorted
+skip the argsort altogether.
+
+Confidence intervals of the AUC come from a stratified bootstrap, in which
+every replicate's U is counted from per-value counts of the resampled
+groups on top of one sort of the pooled data, or from DeLong's closed-form
+variance.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+# memory budget for a single chunk of resamples, 64 MiB
+CHUNK_BYTES = 64 * 2 ** 20
+
+MannWhitneyResult = namedtuple(
+    'MannWhitneyResult',
+    ['statistic', 'auc', 'rbc', 'variance', 'zscore', 'pvalue'])
+
+PairwiseResult = namedtuple(
+    'PairwiseResult',
+    ['sizes', 'statistic', 'auc', 'rbc', 'zscore', 'pvalue', 'pvalue_adjusted'])
+
+AUCInterval = namedtuple('AUCInterval', ['auc', 'auc_ci', 'rbc', 'rbc_ci'])
+
+ALTERNATIVES = ('two-sided', 'less', 'greater')
+
+ADJUSTMENTS = ('holm', 'bonferroni', 'fdr_bh', None)
+
+
+def _tie_term(sorted_values):
+    # sum of t^3 - t over the groups of tied values of a sorted array
+    boundaries = np.flatnonzero(np.diff(sorted_values)) + 1
+    counts = np.diff(np.concatenate(([0], boundaries, [len(sorted_values)])))
+    return float(np.sum(counts.astype(float) ** 3 - counts))
+
+
+def rank_data(values):
+    """
+    Average ranks (1-based, ties get the mean rank) in one argsort.
+
+    Parameters
+    ----------
+    values : array-like
+        The observations.
+
+    Returns
+    -------
+    tuple
+        The ranks and the tie correction term (sum of t^3 - t over groups
+        of t tied values).
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    # first and one-past-last position of the tie group of every element
+    new_group = np.concatenate(([True], sorted_values[1:] != sorted_values[:-1]))
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], n)
+    group = np.cumsum(new_group) - 1
+    ranks = np.empty(n)
+    ranks[order] = (starts[group] + ends[group] + 1) / 2
+    counts = (ends - starts).astype(float)
+    return ranks, float(np.sum(counts ** 3 - counts))
+
+
+def u_test(u1, n1, n2, tie_term=0.0, alternative='two-sided',
+           use_continuity=True):
+    """
+    Mann-Whitney test from the U statistic of the first sample.
+
+    Works elementwise on arrays of U statistics, sizes and tie terms.
+
+    Parameters
+    ----------
+    u1 : float or ndarray
+        The U statistic of the first sample (the number of pairs in which
+        it is greater, ties counting one half).
+    n1, n2 : int or ndarray
+        The sizes of the samples.
+    tie_term : float or ndarray, optional
+        The tie correction term of the pooled sample.
+    alternative : str, optional
+        'two-sided' (default), 'less' or 'greater'.
+    use_continuity : bool, optional
+        Apply the continuity correction. Default is True.
+
+    Returns
+    -------
+    MannWhitneyResult
+        U of the first sample, AUC, rank-biserial correlation, variance of
+        U, z-score and p-value.
+    """
+    if alternative not in ALTERNATIVES:
+        raise ValueError(f"unknown alternative: {alternative!r}")
+    n1n2 = n1 * n2
+    n = n1 + n2
+    mean = n1n2 / 2
+    variance = n1n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    # same conventions as scipy.stats.mannwhitneyu
+    if alternative == 'two-sided':
+        u = np.maximum(u1, n1n2 - u1)
+    elif alternative == 'greater':
+        u = u1
+    else:
+        u = n1n2 - u1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = (u - mean - 0.5 * use_continuity) / np.sqrt(variance)
+    pvalue = norm.sf(zscore)
+    if alternative == 'two-sided':
+        pvalue = np.minimum(2 * pvalue, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        auc = u1 / n1n2
+    return MannWhitneyResult(u1, auc, 2 * auc - 1, variance, zscore, pvalue)
+
+
+def mann_whitney_ranked(ranks, mask, tie_term, alternative='two-sided',
+                        use_continuity=True):
+    """
+    Mann-Whitney test from ranks of the pooled sample computed beforehand.
+
+    Parameters
+    ----------
+    ranks : ndarray
+        Ranks of the pooled sample, e.g. from ``rank_data``.
+    mask : ndarray of bool
+        True for the observations of the first sample, False for the second.
+    tie_term : float
+        The tie correction term returned by ``rank_data``.
+    alternative : str, optional
+        'two-sided' (default), 'less' or 'greater'.
+    use_continuity : bool, optional
+        Apply the continuity correction. Default is True.
+
+    Returns
+    -------
+    MannWhitneyResult
+    """
+    mask = np.asarray(mask, dtype=bool)
+    n1 = int(mask.sum())
+    n2 = len(mask) - n1
+    u1 = ranks[mask].sum() - n1 * (n1 + 1) / 2
+    return u_test(u1, n1, n2, tie_term, alternative, use_continuity)
+
+
+def mann_whitney(x, y, alternative='two-sided', use_continuity=True,
+                 presorted=False):
+    """
+    Mann-Whitney U test, AUC and rank-biserial correlation of two samples.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The two samples.
+    alternative : str, optional
+        'two-sided' (default), 'less' or 'greater'.
+    use_continuity : bool, optional
+        Apply the continuity correction. Default is True.
+    presorted : bool, optional
+        Both samples are sorted in ascending order; U is then counted by
+        binary search and the ties by merging, without an argsort.
+
+    Returns
+    -------
+    MannWhitneyResult
+        U of x, AUC (probability that x is greater than y, ties counting
+        one half), rank-biserial correlation, variance of U, z-score and
+        p-value.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n1, n2 = len(x), len(y)
+    if presorted:
+        below = np.searchsorted(y, x, side='left')
+        not_above = np.searchsorted(y, x, side='right')
+        u1 = float(np.sum(below + not_above)) / 2
+        # both runs are sorted, so the stable sort is a linear merge
+        tie_term = _tie_term(np.sort(np.concatenate((x, y)), kind='stable'))
+        return u_test(u1, n1, n2, tie_term, alternative, use_continuity)
+    ranks, tie_term = rank_data(np.concatenate((x, y)))
+    u1 = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    return u_test(u1, n1, n2, tie_term, alternative, use_continuity)
+
+
+def adjust_pvalues(pvalues, method='holm'):
+    """
+    Adjust p-values for multiple testing.
+
+    Parameters
+    ----------
+    pvalues : array-like
+        The raw p-values (NaN values are ignored).
+    method : str or None, optional
+        'holm' (default), 'bonferroni', 'fdr_bh' (Benjamini-Hochberg) or
+        None for no adjustment.
+
+    Returns
+    -------
+    ndarray
+        The adjusted p-values, in the original order.
+    """
+    if method not in ADJUSTMENTS:
+        raise ValueError(f"unknown adjustment: {method!r}")
+    pvalues = np.asarray(pvalues, dtype=float)
+    adjusted = np.full_like(pvalues, np.nan)
+    valid = ~np.isnan(pvalues)
+    p = pvalues[valid]
+    m = len(p)
+    if method is None or m == 0:
+        adjusted[valid] = p
+        return adjusted
+    if method == 'bonferroni':
+        adjusted[valid] = np.minimum(p * m, 1)
+        return adjusted
+    order = np.argsort(p)
+    ranked = p[order]
+    if method == 'holm':
+        steps = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        steps = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    result = np.empty(m)
+    result[order] = np.minimum(steps, 1)
+    adjusted[valid] = result
+    return adjusted
+
+
+def pairwise_mann_whitney(values, groups, alternative='two-sided',
+                          use_continuity=True, adjust='holm'):
+    """
+    Mann-Whitney tests for every pair of groups from one shared sort.
+
+    The values are sorted once and counted per group and distinct value.
+    With the counts K (groups x values) and the counts strictly below every
+    value B, all pairwise U statistics are the matrix product
+    K (B + K / 2)^T, and the tie terms of all pooled pairs follow from
+    products of K and K^2 as well.
+
+    Parameters
+    ----------
+    values : array-like
+        The observations, e.g. prices.
+    groups : array-like
+        The group label of every observation, e.g. county codes; missing
+        labels (None or NaN) leave the observation out.
+    alternative : str, optional
+        'two-sided' (default), 'less' or 'greater'; the row group is the
+        first sample.
+    use_continuity : bool, optional
+        Apply the continuity correction. Default is True.
+    adjust : str or None, optional
+        Multiple-testing adjustment of the p-values of the distinct pairs:
+        'holm' (default), 'bonferroni', 'fdr_bh' or None.
+
+    Returns
+    -------
+    PairwiseResult
+        Group sizes (Series) and (groups x groups) DataFrames of U, AUC,
+        rank-biserial correlation, z-score, p-value and adjusted p-value.
+        The row group is compared against the column group; the diagonal
+        is NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    codes, labels = pd.factorize(np.asarray(groups), sort=True)
+    # observations without a group are left out, as in groups.py
+    values, codes = values[codes >= 0], codes[codes >= 0]
+    distinct, value_codes = np.unique(values, return_inverse=True)
+    counts = np.zeros((len(labels), len(distinct)))
+    np.add.at(counts, (codes, value_codes), 1)
+    below = np.cumsum(counts, axis=1) - counts
+    u = counts @ (below + counts / 2).T
+    sizes = counts.sum(axis=1)
+    n1, n2 = np.meshgrid(sizes, sizes, indexing='ij')
+    # sum over values of (c_i + c_j)^3 - (c_i + c_j) for every pair
+    cubes = np.sum(counts ** 3, axis=1)
+    squares = counts ** 2
+    cross = 3 * (squares @ counts.T + counts @ squares.T)
+    tie_term = cubes[:, np.newaxis] + cubes[np.newaxis, :] + cross - n1 - n2
+    result = u_test(u, n1, n2, tie_term, alternative, use_continuity)
+    off_diagonal = ~np.eye(len(labels), dtype=bool)
+    pvalue = np.where(off_diagonal, result.pvalue, np.nan)
+    # every unordered pair is tested once, the lower triangle mirrors it
+    upper = np.triu_indices(len(labels), k=1)
+    adjusted = np.full_like(pvalue, np.nan)
+    adjusted[upper] = adjust_pvalues(pvalue[upper], adjust)
+    if alternative == 'two-sided':
+        adjusted.T[upper] = adjusted[upper]
+    else:
+        lower = (upper[1], upper[0])
+        adjusted[lower] = adjust_pvalues(pvalue[lower], adjust)
+
+    def frame(matrix):
+        return pd.DataFrame(np.where(off_diagonal, matrix, np.nan),
+                            index=labels, columns=labels)
+
+    return PairwiseResult(pd.Series(sizes.astype(int), index=labels),
+                          frame(u), frame(result.auc), frame(result.rbc),
+                          frame(result.zscore), frame(pvalue), frame(adjusted))
+
+
+def bootstrap_u(x, y, n_bootstraps=2000, random_state=None,
+                chunk_bytes=CHUNK_BYTES):
+    """
+    U statistics of x against y on stratified bootstrap resamples.
+
+    Both samples are resampled within themselves, so every replicate keeps
+    the group sizes. The pooled data is sorted once; a replicate is then
+    the per-value counts of its resampled x and y, and its U is the sum
+    over values of the x counts times the y counts below plus half the
+    tied ones, which is O(n) per replicate.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The two samples.
+    n_bootstraps : int, optional
+        The number of bootstrap replicates. Default is 2000.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the resamples.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk of replicates.
+
+    Returns
+    -------
+    ndarray
+        One U statistic of x per replicate.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n1, n2 = len(x), len(y)
+    distinct, codes = np.unique(np.concatenate((x, y)), return_inverse=True)
+    x_codes, y_codes = codes[:n1], codes[n1:]
+    u = len(distinct)
+    rng = np.random.default_rng(random_state)
+    # indices of both resamples plus three count arrays per replicate
+    rows = max(1, int(chunk_bytes // (8 * (n1 + n2 + 3 * u))))
+    replicates = np.empty(n_bootstraps)
+    for start in range(0, n_bootstraps, rows):
+        size = min(rows, n_bootstraps - start)
+        offsets = np.arange(size)[:, np.newaxis] * u
+        x_counts = np.bincount(
+            (x_codes[rng.integers(0, n1, (size, n1))] + offsets).ravel(),
+            minlength=size * u).reshape(size, u)
+        y_counts = np.bincount(
+            (y_codes[rng.integers(0, n2, (size, n2))] + offsets).ravel(),
+            minlength=size * u).reshape(size, u)
+        below = np.cumsum(y_counts, axis=1) - y_counts
+        replicates[start:start + size] = np.sum(
+            x_counts * (below + y_counts / 2), axis=1)
+    return replicates
+
+
+def bootstrap_auc(x, y, n_bootstraps=2000, alpha=0.05, random_state=None,
+                  chunk_bytes=CHUNK_BYTES):
+    """
+    Stratified bootstrap percentile intervals of the AUC and the RBC.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The two samples.
+    n_bootstraps : int, optional
+        The number of bootstrap replicates. Default is 2000.
+    alpha : float, optional
+        The significance level. Default is 0.05.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the resamples.
+    chunk_bytes : int, optional
+        Memory budget for a single chunk of replicates.
+
+    Returns
+    -------
+    AUCInterval
+        AUC of x against y, its interval, the rank-biserial correlation and
+        its interval.
+    """
+    n1n2 = len(x) * len(y)
+    auc = mann_whitney(x, y).auc
+    replicates = bootstrap_u(x, y, n_bootstraps, random_state,
+                             chunk_bytes) / n1n2
+    auc_ci = np.quantile(replicates, [alpha / 2, 1 - alpha / 2])
+    return AUCInterval(auc, auc_ci, 2 * auc - 1, 2 * auc_ci - 1)
+
+
+def delong_interval(x, y, alpha=0.05):
+    """
+    Normal interval of the AUC and the RBC with DeLong's variance.
+
+    The structural components (the share of the other sample below every
+    observation, ties counting one half) come from binary searches in the
+    sorted samples.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The two samples.
+    alpha : float, optional
+        The significance level. Default is 0.05.
+
+    Returns
+    -------
+    AUCInterval
+        AUC of x against y, its interval (clipped to [0, 1]), the
+        rank-biserial correlation and its interval.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    sorted_x, sorted_y = np.sort(x), np.sort(y)
+    v10 = (np.searchsorted(sorted_y, x, side='left')
+           + np.searchsorted(sorted_y, x, side='right')) / (2 * len(y))
+    v01 = 1 - (np.searchsorted(sorted_x, y, side='left')
+               + np.searchsorted(sorted_x, y, side='right')) / (2 * len(x))
+    auc = v10.mean()
+    se = np.sqrt(np.var(v10, ddof=1) / len(x) + np.var(v01, ddof=1) / len(y))
+    z = norm.ppf(1 - alpha / 2)
+    auc_ci = np.clip(auc + z * np.array([-se, se]), 0, 1)
+    return AUCInterval(auc, auc_ci, 2 * auc - 1, 2 * auc_ci - 1)
@@ -0,0 +1,274 @@
+"""
+Normality tests of many groups at once, e.g. prices by region or county.
+
+The count, mean, variance, skewness and kurtosis of all groups come from
+groupby passes over power sums of the values centred on their group means.
+D'Agostino's K^2 and the Jarque-Bera test are closed-form functions of these
+moments, and the Anderson-Darling statistic of every group comes from one
+sort of the whole column by group and value, so only the Shapiro-Wilk test
+runs group by group (optionally in worker processes). Shapiro-Wilk p-values
+are only accurate up to 5000 observations; larger groups are tested on
+random subsamples of that size. The Shapiro-Wilk tests are timed and
+counted by Bootstrap/instrumentation.py, worker processes included, so that
+directory has to be on the path.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, norm, shapiro
+
+import instrumentation
+from instrumentation import count, timer
+
+# largest sample for which the Shapiro-Wilk p-value is accurate
+SHAPIRO_MAX = 5000
+
+# smallest samples for D'Agostino's K^2 and Shapiro-Wilk
+NORMALTEST_MIN = 8
+SHAPIRO_MIN = 3
+
+
+def group_moments(df, value, by):
+    """
+    Count, mean, variance (ddof=1), skewness and kurtosis of every group.
+
+    Skewness and (Pearson) kurtosis are the biased moment ratios used by
+    ``scipy.stats.skew`` and ``scipy.stats.kurtosis(fisher=False)``.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The data.
+    value : str
+        The column to test, e.g. 'price_m'.
+    by : str
+        The grouping column, e.g. 'county'.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per group with columns n, mean, var, skew and kurtosis.
+    """
+    x = df[value].astype(float)
+    # power sums of values shifted by their group mean keep the moments
+    # accurate however far the group means lie apart
+    center = x.groupby(df[by], observed=True).transform('mean')
+    centered = x - center
+    powers = pd.DataFrame({k: centered ** k for k in range(5)})
+    sums = powers.groupby(df[by], observed=True).sum()
+    center = center.groupby(df[by], observed=True).first()
+    n = sums[0]
+    mu = sums[1] / n
+    m2 = sums[2] / n - mu ** 2
+    m3 = sums[3] / n - 3 * mu * sums[2] / n + 2 * mu ** 3
+    m4 = (sums[4] / n - 4 * mu * sums[3] / n + 6 * mu ** 2 * sums[2] / n
+          - 3 * mu ** 4)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({'n': n.astype(int),
+                             'mean': mu + center,
+                             'var': m2 * n / (n - 1),
+                             'skew': m3 / m2 ** 1.5,
+                             'kurtosis': m4 / m2 ** 2})
+
+
+def dagostino_k2(n, skew, kurtosis):
+    """
+    D'Agostino-Pearson K^2 statistics and p-values from moments.
+
+    Same as ``scipy.stats.normaltest``, vectorized over groups.
+
+    Parameters
+    ----------
+    n, skew, kurtosis : array-like
+        Sizes, skewness and Pearson kurtosis of the groups.
+
+    Returns
+    -------
+    tuple
+        The K^2 statistics and their p-values (NaN for n < 8).
+    """
+    n = np.asarray(n, dtype=float)
+    skew = np.asarray(skew, dtype=float)
+    kurtosis = np.asarray(kurtosis, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # skewness test
+        y = skew * np.sqrt((n + 1) * (n + 3) / (6 * (n - 2)))
+        beta2 = (3 * (n ** 2 + 27 * n - 70) * (n + 1) * (n + 3)
+                 / ((n - 2) * (n + 5) * (n + 7) * (n + 9)))
+        w2 = -1 + np.sqrt(2 * (beta2 - 1))
+        delta = 1 / np.sqrt(0.5 * np.log(w2))
+        a = np.sqrt(2 / (w2 - 1))
+        y = np.where(y == 0, 1, y)
+        z_skew = delta * np.log(y / a + np.sqrt((y / a) ** 2 + 1))
+        # kurtosis test
+        expected = 3 * (n - 1) / (n + 1)
+        variance = (24 * n * (n - 2) * (n - 3)
+                    / ((n + 1) ** 2 * (n + 3) * (n + 5)))
+        x = (kurtosis - expected) / np.sqrt(variance)
+        root_beta1 = (6 * (n ** 2 - 5 * n + 2) / ((n + 7) * (n + 9))
+                      * np.sqrt(6 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3))))
+        big_a = 6 + 8 / root_beta1 * (2 / root_beta1
+                                      + np.sqrt(1 + 4 / root_beta1 ** 2))
+        term1 = 1 - 2 / (9 * big_a)
+        denominator = 1 + x * np.sqrt(2 / (big_a - 4))
+        term2 = np.sign(denominator) * np.where(
+            denominator == 0, np.nan,
+            ((1 - 2 / big_a) / np.abs(denominator)) ** (1 / 3))
+        z_kurtosis = (term1 - term2) / np.sqrt(2 / (9 * big_a))
+    k2 = np.where(n >= NORMALTEST_MIN, z_skew ** 2 + z_kurtosis ** 2, np.nan)
+    return k2, chi2.sf(k2, 2)
+
+
+def jarque_bera(n, skew, kurtosis):
+    """
+    Jarque-Bera statistics and p-values from moments.
+
+    Parameters
+    ----------
+    n, skew, kurtosis : array-like
+        Sizes, skewness and Pearson kurtosis of the groups.
+
+    Returns
+    -------
+    tuple
+        The statistics and their (asymptotic) p-values.
+    """
+    n = np.asarray(n, dtype=float)
+    statistic = n / 6 * (np.asarray(skew) ** 2
+                         + (np.asarray(kurtosis) - 3) ** 2 / 4)
+    return statistic, chi2.sf(statistic, 2)
+
+
+def anderson_darling(values, codes, means, stds):
+    """
+    Anderson-Darling statistics of normality of all groups from one sort.
+
+    Parameters
+    ----------
+    values : ndarray
+        The data.
+    codes : ndarray of int
+        The group code (0 .. k-1) of every value.
+    means, stds : ndarray
+        Mean and standard deviation (ddof=1) of every group.
+
+    Returns
+    -------
+    tuple
+        The A^2 statistics (as ``scipy.stats.anderson``) and p-values of the
+        modified statistic (D'Agostino and Stephens, 1986).
+    """
+    order = np.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    n = np.bincount(codes, minlength=len(means))
+    starts = np.concatenate(([0], np.cumsum(n)[:-1]))
+    # 1-based position within the group and the mirrored element
+    i = np.arange(len(values)) - starts[codes] + 1
+    mirrored = starts[codes] + n[codes] - i
+    z = (values - means[codes]) / stds[codes]
+    terms = (2 * i - 1) * (norm.logcdf(z) + norm.logsf(z[mirrored]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = -n - np.bincount(codes, terms, len(means)) / n
+        a = statistic * (1 + 0.75 / n + 2.25 / n ** 2)
+    # the quadratic of the upper branch turns up far in the tail
+    pvalue = np.select(
+        [a >= 10, a >= 0.6, a >= 0.34, a >= 0.2],
+        [0.0, np.exp(1.2937 - 5.709 * a + 0.0186 * a ** 2),
+         np.exp(0.9177 - 4.279 * a - 1.38 * a ** 2),
+         1 - np.exp(-8.318 + 42.796 * a - 59.938 * a ** 2)],
+        1 - np.exp(-13.436 + 101.14 * a - 223.73 * a ** 2))
+    return statistic, np.clip(pvalue, 0, 1)
+
+
+def _shapiro(values, n_subsamples, seed):
+    # Shapiro-Wilk, on random subsamples above SHAPIRO_MAX observations
+    if len(values) < SHAPIRO_MIN:
+        return np.nan, np.nan, 'too small'
+    with timer('statistic'):
+        if len(values) <= SHAPIRO_MAX:
+            statistic, pvalue = shapiro(values)
+            count('shapiro_tests')
+            return statistic, pvalue, 'full'
+        rng = np.random.default_rng(seed)
+        results = np.array([shapiro(rng.choice(values, SHAPIRO_MAX, replace=False))
+                            for _ in range(n_subsamples)])
+    count('shapiro_tests', n_subsamples)
+    statistic, pvalue = np.median(results, axis=0)
+    return statistic, pvalue, f'median of {n_subsamples} subsamples'
+
+
+def normality_report(df, value=None, by=None, alpha=0.05, n_subsamples=20,
+                     seed=None, n_workers=1):
+    """
+    Normality tests of a column in every group, in one table.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame or GroupIndex
+        The data, or a group index of the values (see groups.py).
+    value : str, optional
+        The column to test, e.g. 'price_m' (not used with a group index).
+    by : str, optional
+        The grouping column, e.g. 'region' (not used with a group index).
+    alpha : float, optional
+        The significance level of the reject columns. Default is 0.05.
+    n_subsamples : int, optional
+        The number of subsamples of size 5000 tested by Shapiro-Wilk in
+        larger groups. Default is 20.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed of the subsamples.
+    n_workers : int, optional
+        The number of worker processes for the Shapiro-Wilk tests.
+        Default is 1 (run in this process).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per group: the moments (see ``group_moments``), statistics
+        and p-values of Shapiro-Wilk, D'Agostino's K^2, Jarque-Bera and
+        Anderson-Darling, whether each rejects normality at alpha, and how
+        Shapiro-Wilk was computed.
+    """
+    if not isinstance(df, pd.DataFrame):
+        # values ordered by group with their codes, the labels as categories
+        value, by = 'value', 'group'
+        df = pd.DataFrame({value: df.values,
+                           by: pd.Categorical.from_codes(df.codes, df.labels)})
+    df = df[[value, by]].dropna()
+    report = group_moments(df, value, by)
+    k2, k2_p = dagostino_k2(report['n'], report['skew'], report['kurtosis'])
+    jb, jb_p = jarque_bera(report['n'], report['skew'], report['kurtosis'])
+    codes = pd.Categorical(df[by], categories=report.index).codes
+    values = df[value].to_numpy(dtype=float)
+    ad, ad_p = anderson_darling(values, codes, report['mean'].to_numpy(),
+                                np.sqrt(report['var'].to_numpy()))
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(values[order], np.cumsum(report['n'].to_numpy())[:-1])
+    parallel = n_workers > 1 and len(groups) > 1
+    profiled = parallel and instrumentation.enabled()
+    tasks = [(_shapiro, group, n_subsamples, child, profiled)
+             for group, child in zip(groups, seed.spawn(len(groups)))]
+    if parallel:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(instrumentation.run_task, tasks))
+    else:
+        results = [instrumentation.run_task(task) for task in tasks]
+    for _, records in results:
+        instrumentation.merge(records)
+    sw, sw_p, sw_method = zip(*[result for result, _ in results])
+    report['shapiro'] = sw
+    report['shapiro_p'] = sw_p
+    report['normaltest'] = k2
+    report['normaltest_p'] = k2_p
+    report['jarque_bera'] = jb
+    report['jarque_bera_p'] = jb_p
+    report['anderson'] = ad
+    report['anderson_p'] = ad_p
+    for test in ('shapiro', 'normaltest', 'jarque_bera', 'anderson'):
+        report[test + '_reject'] = report[test + '_p'] <= alpha
+    report['shapiro_method'] = sw_method
+    return report
@@ -0,0 +1,245 @@
+"""
+Permutation and exact p-values of the Mann-Whitney U test with ties.
+
+The pooled sample is ranked once. A permutation test then only draws random
+group labels: every batch of permutations is a boolean mask matrix (one row
+per permutation) and all U statistics of the batch are a single matrix
+product of the masks with the ranks. Batches are tasks with their own child
+streams of one ``numpy.random.SeedSequence``, so the result does not depend
+on the number of worker processes, and the test stops early once the p-value
+is clearly above or below alpha. The draws and U statistics are timed and
+counted by Bootstrap/instrumentation.py like the bootstrap, worker processes
+included, so that directory has to be on the path.
+
+For small samples the exact null distribution of U given the observed ties
+is obtained by dynamic programming over the tie groups, which is what
+``scipy.stats.mannwhitneyu(method='exact')`` does not support.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.special import comb
+from scipy.stats import beta
+
+import instrumentation
+from instrumentation import count, timer
+from mann_whitney import ALTERNATIVES, CHUNK_BYTES, rank_data
+
+PermutationResult = namedtuple('PermutationResult',
+                               ['statistic', 'pvalue', 'n_permutations', 'method'])
+
+METHODS = ('auto', 'exact', 'permutation')
+
+# largest n1 * n2 for which method='auto' uses the exact distribution
+EXACT_MAX = 5000
+
+# number of permutations computed by a single task
+TASK_SIZE = 2000
+
+# tolerance when comparing U statistics, which are multiples of one half
+_TOLERANCE = 1e-7
+
+
+def _extreme(u, u_observed, mean, alternative):
+    # permutations at least as extreme as the observed U
+    if alternative == 'two-sided':
+        return np.abs(u - mean) >= abs(u_observed - mean) - _TOLERANCE
+    if alternative == 'greater':
+        return u >= u_observed - _TOLERANCE
+    return u <= u_observed + _TOLERANCE
+
+
+def exact_distribution(ranks, n1):
+    """
+    Exact null distribution of U given the ranks of the pooled sample.
+
+    Counts the ways to pick the first sample from every group of tied
+    observations; the doubled mid-ranks are integers, so the rank sums index
+    a table of (sample size, doubled rank sum).
+
+    Parameters
+    ----------
+    ranks : array-like
+        Ranks of the pooled sample, e.g. from ``rank_data``.
+    n1 : int
+        The size of the first sample.
+
+    Returns
+    -------
+    tuple
+        The attainable values of U of the first sample and their
+        probabilities.
+    """
+    doubled = np.rint(2 * np.asarray(ranks, dtype=float)).astype(np.int64)
+    values, counts = np.unique(doubled, return_counts=True)
+    top = int(np.sort(doubled)[len(doubled) - n1:].sum())
+    ways = np.zeros((n1 + 1, top + 1))
+    ways[0, 0] = 1
+    for value, t in zip(values, counts):
+        updated = ways.copy()
+        for c in range(1, min(t, n1) + 1):
+            shift = c * value
+            if shift > top:
+                break
+            updated[c:, shift:] += comb(t, c) * ways[:n1 + 1 - c, :top + 1 - shift]
+        ways = updated
+    sums = np.flatnonzero(ways[n1])
+    probabilities = ways[n1, sums] / comb(len(doubled), n1)
+    return (sums - n1 * (n1 + 1)) / 2, probabilities
+
+
+def permutation_u(ranks, n1, n_permutations, random_state=None,
+                  chunk_bytes=CHUNK_BYTES):
+    """
+    U statistics of the first sample under random relabelings.
+
+    Parameters
+    ----------
+    ranks : array-like
+        Ranks of the pooled sample, e.g. from ``rank_data``.
+    n1 : int
+        The size of the first sample.
+    n_permutations : int
+        The number of permutations.
+    random_state : None, int or numpy.random.Generator, optional
+        Seed or generator used to draw the permutations.
+    chunk_bytes : int, optional
+        Memory budget for a batch of permutations.
+
+    Returns
+    -------
+    ndarray
+        One U statistic per permutation.
+    """
+    ranks = np.asarray(ranks, dtype=float)
+    n = len(ranks)
+    rng = np.random.default_rng(random_state)
+    # random keys and the float mask take 8 bytes per element each
+    rows = max(1, int(chunk_bytes // (16 * n)))
+    u = np.empty(n_permutations)
+    for start in range(0, n_permutations, rows):
+        size = min(rows, n_permutations - start)
+        with timer('draw'):
+            keys = rng.random((size, n))
+            # the n1 smallest keys of a row mark a random first sample
+            threshold = np.partition(keys, n1 - 1, axis=1)[:, n1 - 1:n1]
+            masks = (keys <= threshold).astype(float)
+        with timer('evaluate'):
+            u[start:start + size] = masks @ ranks - n1 * (n1 + 1) / 2
+        count('chunks')
+        count('bytes', keys.nbytes + masks.nbytes)
+        count('permutations', size)
+    return u
+
+
+def _extreme_count(ranks, n1, size, seed, u_observed, alternative, chunk_bytes):
+    u = permutation_u(ranks, n1, size, np.random.default_rng(seed), chunk_bytes)
+    mean = n1 * (len(ranks) - n1) / 2
+    return int(np.sum(_extreme(u, u_observed, mean, alternative)))
+
+
+def _decided(extreme, done, alpha, stop_level):
+    # the Clopper-Pearson interval of the p-value excludes alpha
+    lower = beta.ppf(stop_level / 2, extreme, done - extreme + 1) if extreme else 0.0
+    upper = (beta.ppf(1 - stop_level / 2, extreme + 1, done - extreme)
+             if extreme < done else 1.0)
+    return upper < alpha or lower > alpha
+
+
+def permutation_test(x, y, alternative='two-sided', method='auto',
+                     n_permutations=10000, alpha=0.05, early_stop=True,
+                     stop_level=0.001, seed=None, n_workers=1,
+                     task_size=TASK_SIZE, chunk_bytes=CHUNK_BYTES):
+    """
+    Mann-Whitney U test with an exact or a permutation p-value.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The two samples.
+    alternative : str, optional
+        'two-sided' (default), 'less' or 'greater'.
+    method : str, optional
+        'exact' (tie-aware exact distribution), 'permutation' or 'auto'
+        (default), which is exact for n1 * n2 <= EXACT_MAX.
+    n_permutations : int, optional
+        The maximal number of permutations. Default is 10000.
+    alpha : float, optional
+        The significance level used by the stopping rule. Default is 0.05.
+    early_stop : bool, optional
+        Stop after a task once the p-value is clearly above or below alpha.
+        Default is True.
+    stop_level : float, optional
+        Error level of the interval of the p-value used to stop.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Root seed of the child streams of the tasks.
+    n_workers : int, optional
+        The number of worker processes. Default is 1 (run in this process).
+    task_size : int, optional
+        The number of permutations per task.
+    chunk_bytes : int, optional
+        Memory budget for a batch of permutations within a task.
+
+    Returns
+    -------
+    PermutationResult
+        U of x, p-value, the number of permutations used (0 for the exact
+        distribution) and the method used.
+    """
+    if alternative not in ALTERNATIVES:
+        raise ValueError(f"unknown alternative: {alternative!r}")
+    if method not in METHODS:
+        raise ValueError(f"unknown method: {method!r}")
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n1, n2 = len(x), len(y)
+    ranks, _ = rank_data(np.concatenate((x, y)))
+    u_observed = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    if method == 'auto':
+        method = 'exact' if n1 * n2 <= EXACT_MAX else 'permutation'
+    if method == 'exact':
+        # the table is smaller for the smaller sample, U of y is n1 * n2 - U
+        if n1 <= n2:
+            u, probabilities = exact_distribution(ranks, n1)
+        else:
+            u, probabilities = exact_distribution(ranks, n2)
+            u = n1 * n2 - u
+        extreme = _extreme(u, u_observed, mean, alternative)
+        pvalue = min(float(np.sum(probabilities[extreme])), 1.0)
+        return PermutationResult(u_observed, pvalue, 0, method)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    sizes = [min(task_size, n_permutations - start)
+             for start in range(0, n_permutations, task_size)]
+    executor = ProcessPoolExecutor(n_workers) if n_workers > 1 else None
+    profiled = executor is not None and instrumentation.enabled()
+    tasks = [(_extreme_count, ranks, n1, size, child, u_observed, alternative,
+              chunk_bytes, profiled)
+             for size, child in zip(sizes, seed.spawn(len(sizes)))]
+    extreme = done = 0
+    try:
+        # a wave of tasks per worker; the stopping rule is checked in task
+        # order, so the result is the same for any number of workers
+        wave = max(n_workers, 1)
+        for start in range(0, len(tasks), wave):
+            batch = tasks[start:start + wave]
+            counts = (executor.map(instrumentation.run_task, batch) if executor
+                      else map(instrumentation.run_task, batch))
+            stopped = False
+            for size, (found, report) in zip(sizes[start:start + wave], counts):
+                instrumentation.merge(report)
+                extreme += found
+                done += size
+                if early_stop and _decided(extreme, done, alpha, stop_level):
+                    stopped = True
+                    break
+            if stopped:
+                break
+    finally:
+        if executor:
+            executor.shutdown()
+    pvalue = (extreme + 1) / (done + 1)
+    return PermutationResult(u_observed, pvalue, done, method)
@@ -0,0 +1,176 @@
+"""
+Empirical ROC curves of two samples, e.g. prices of two regions.
+
+The curve is built from one sort of the pooled sample: walking down the
+distinct values, the true and false positive rates are cumulative sums of
+the two groups' counts. Points are downsampled by arc length for plotting,
+and the rates at any threshold (for an interactive slider) come from binary
+searches in the sorted samples instead of thresholding the data again.
+"""
+
+import numpy as np
+
+
+def roc_curve(positive, negative):
+    """
+    Empirical ROC curve, a value counting as positive if >= the threshold.
+
+    Parameters
+    ----------
+    positive, negative : array-like
+        The samples of the positive and the negative class.
+
+    Returns
+    -------
+    tuple
+        Thresholds (decreasing distinct values, starting with +inf), false
+        positive rates and true positive rates, from (0, 0) to (1, 1).
+    """
+    positive = np.asarray(positive, dtype=float)
+    negative = np.asarray(negative, dtype=float)
+    pooled = np.concatenate((positive, negative))
+    is_positive = np.concatenate((np.ones(len(positive)), np.zeros(len(negative))))
+    order = np.argsort(-pooled, kind='stable')
+    pooled, is_positive = pooled[order], is_positive[order]
+    # the last element of every group of tied values closes a step
+    last = np.append(pooled[1:] != pooled[:-1], True)
+    true_positives = np.cumsum(is_positive)[last]
+    false_positives = np.cumsum(1 - is_positive)[last]
+    thresholds = np.concatenate(([np.inf], pooled[last]))
+    fpr = np.concatenate(([0.0], false_positives / len(negative)))
+    tpr = np.concatenate(([0.0], true_positives / len(positive)))
+    return thresholds, fpr, tpr
+
+
+def roc_auc(fpr, tpr):
+    """
+    Area under a ROC curve by the trapezoidal rule.
+
+    Parameters
+    ----------
+    fpr, tpr : array-like
+        False and true positive rates, e.g. from ``roc_curve``.
+
+    Returns
+    -------
+    float
+        The area under the curve; for the empirical curve it equals U / (n1 n2).
+    """
+    fpr = np.asarray(fpr, dtype=float)
+    tpr = np.asarray(tpr, dtype=float)
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def downsample(fpr, tpr, n_points=200):
+    """
+    At most about n_points points of a ROC curve, evenly spaced along it.
+
+    Parameters
+    ----------
+    fpr, tpr : array-like
+        False and true positive rates, e.g. from ``roc_curve``.
+    n_points : int, optional
+        The number of points to keep. Default is 200.
+
+    Returns
+    -------
+    ndarray
+        Indices of the kept points, including both ends.
+    """
+    fpr = np.asarray(fpr, dtype=float)
+    tpr = np.asarray(tpr, dtype=float)
+    if len(fpr) <= n_points:
+        return np.arange(len(fpr))
+    length = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(fpr),
+                                                        np.diff(tpr)))))
+    targets = np.linspace(0, length[-1], n_points)
+    indices = np.searchsorted(length, targets, side='left')
+    return np.unique(np.concatenate(([0], np.minimum(indices, len(fpr) - 1),
+                                     [len(fpr) - 1])))
+
+
+def rates_at(threshold, sorted_positive, sorted_negative):
+    """
+    False and true positive rates at one or several thresholds.
+
+    Parameters
+    ----------
+    threshold : float or array-like
+        The threshold(s); values >= the threshold count as positive.
+    sorted_positive, sorted_negative : ndarray
+        The samples of both classes sorted in ascending order.
+
+    Returns
+    -------
+    tuple
+        The false positive rate(s) and the true positive rate(s).
+    """
+    above_positive = len(sorted_positive) - np.searchsorted(
+        sorted_positive, threshold, side='left')
+    above_negative = len(sorted_negative) - np.searchsorted(
+        sorted_negative, threshold, side='left')
+    return (above_negative / len(sorted_negative),
+            above_positive / len(sorted_positive))
+
+
+def interactive_roc(positive, negative, n_points=200, labels=('C1', 'C0'),
+                    bins='sqrt'):
+    """
+    ROC curve and class histograms with a threshold slider.
+
+    Parameters
+    ----------
+    positive, negative : array-like
+        The samples of the positive and the negative class.
+    n_points : int, optional
+        The number of plotted points of the curve. Default is 200.
+    labels : tuple of str, optional
+        Legend labels of the positive and the negative class.
+    bins : int or str, optional
+        Histogram bins. Default is 'sqrt'.
+
+    Returns
+    -------
+    tuple
+        The figure and the slider (keep a reference to it so it stays
+        responsive).
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Slider
+
+    sorted_positive = np.sort(np.asarray(positive, dtype=float))
+    sorted_negative = np.sort(np.asarray(negative, dtype=float))
+    _, fpr, tpr = roc_curve(sorted_positive, sorted_negative)
+    kept = downsample(fpr, tpr, n_points)
+    low = min(sorted_positive[0], sorted_negative[0])
+    high = max(sorted_positive[-1], sorted_negative[-1])
+    start = np.median(np.concatenate((sorted_positive, sorted_negative)))
+
+    fig, (ax_hist, ax_roc) = plt.subplots(1, 2, figsize=(11, 4.5))
+    fig.subplots_adjust(bottom=0.22)
+    ax_hist.hist(sorted_positive, bins=bins, density=True, alpha=.5,
+                 color='g', label=labels[0])
+    ax_hist.hist(sorted_negative, bins=bins, density=True, alpha=.5,
+                 color='b', label=labels[1])
+    ax_hist.legend()
+    line = ax_hist.axvline(start, linestyle='--', lw=2, color='k')
+    ax_roc.plot(fpr[kept], tpr[kept], lw=2,
+                label='AUC = %.3f' % roc_auc(fpr, tpr))
+    ax_roc.plot([0, 1], [0, 1], 'k:', lw=1)
+    ax_roc.set_xlabel('FPR')
+    ax_roc.set_ylabel('TPR')
+    ax_roc.legend(loc='lower right')
+    point, = ax_roc.plot(*rates_at(start, sorted_positive, sorted_negative),
+                         'ro', ms=8)
+
+    slider_ax = fig.add_axes([0.15, 0.06, 0.7, 0.04])
+    slider = Slider(slider_ax, 'threshold', low, high, valinit=start)
+
+    def update(threshold):
+        x, y = rates_at(threshold, sorted_positive, sorted_negative)
+        point.set_data([x], [y])
+        line.set_xdata([threshold, threshold])
+        fig.canvas.draw_idle()
+
+    slider.on_changed(update)
+    return fig, slider
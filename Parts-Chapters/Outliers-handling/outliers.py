@@ -0,0 +1,462 @@
+"""
+Outlier bounds of every group at once, e.g. unit prices by district.
+
+The chapter screens a whole city with three rules: the z-score bounds
+(mean +- 3 standard deviations), Tukey's fences (Q1 - 1.5 IQR, Q3 + 1.5 IQR)
+and percentile bounds (the 0.01 and 0.99 quantiles). Here a fourth, robust
+rule is added, the median +- 3 scaled MADs, and all four are computed for
+every group from one sort of the column by group and value: means and
+variances come from ``np.bincount``, quantiles are read off the sorted
+segments by index arithmetic. Masks and winsorized values are returned as
+arrays over the rows, so the frame itself is never copied or modified.
+
+Data that does not fit in memory is read in chunks into a
+``StreamingScreen``, which keeps exact moments and an approximate quantile
+sketch of every group; its bounds have the same layout, so the masks of
+every chunk are computed in a second pass::
+
+    screen = StreamingScreen()
+    for chunk in pd.read_csv(path, usecols=['price_m', 'district_name'],
+                             chunksize=100_000):
+        screen.update(chunk, 'price_m', 'district_name')
+    bounds = screen.bounds()
+"""
+
+import numpy as np
+import pandas as pd
+
+METHODS = ('zscore', 'iqr', 'mad', 'percentile')
+
+# scales the MAD to a consistent estimate of the normal standard deviation
+MAD_SCALE = 1.4826
+
+# number of items kept in the top level of a quantile sketch
+SKETCH_SIZE = 1000
+
+
+def _group_codes(df, by):
+    # group code of every row (-1 for a missing group) and the group labels
+    if by is None:
+        return np.zeros(len(df), dtype=np.intp), pd.Index(['all'])
+    groups = df[by]
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        return groups.cat.codes.to_numpy(dtype=np.intp), groups.cat.categories
+    codes, labels = pd.factorize(groups, sort=True)
+    return codes.astype(np.intp), labels
+
+
+def _rows(df, value, by):
+    # values, group codes and labels in the order of the rows of the data
+    if isinstance(df, pd.DataFrame):
+        codes, labels = _group_codes(df, by)
+        return df[value].to_numpy(dtype=float), codes, labels
+    # a group index (see groups.py): scatter its values back to the rows;
+    # rows without a group stay missing
+    values = np.full(df.n_rows, np.nan)
+    codes = np.full(df.n_rows, -1, dtype=np.intp)
+    values[df.order] = df.values
+    codes[df.order] = df.codes
+    return values, codes, df.labels
+
+
+def _sort_segments(values, codes):
+    # values sorted by segment and value in one pass over all segments: the
+    # order of np.lexsort((values, codes)), but sorted by value first and
+    # then by code with a stable sort, a radix sort of small integers
+    order = np.argsort(values)
+    codes = codes[order].astype(np.min_scalar_type(max(codes.max(initial=0), 0)))
+    return values[order[np.argsort(codes, kind='stable')]]
+
+
+def _grouped(values, codes, n_groups):
+    # values sorted by group and value without missing values, and group sizes
+    valid = ~np.isnan(values) & (codes >= 0)
+    values, codes = values[valid], codes[valid]
+    sizes = np.bincount(codes, minlength=n_groups)
+    return _sort_segments(values, codes), sizes
+
+
+def segment_quantiles(values, sizes, q):
+    """
+    Quantiles of consecutive sorted segments of an array.
+
+    The quantiles are interpolated linearly, as by ``pandas.Series.quantile``.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The segments one after the other, each sorted.
+    sizes : numpy.ndarray of int
+        The length of every segment.
+    q : float or array-like of float
+        The probabilities.
+
+    Returns
+    -------
+    numpy.ndarray
+        One row per segment and one column per probability, NaN for empty
+        segments.
+    """
+    q = np.atleast_1d(np.asarray(q, dtype=float))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))[:, None]
+    last = np.maximum(len(values) - 1, 0)
+    position = (sizes[:, None] - 1) * q
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below + 1, sizes[:, None] - 1)
+    values = values if len(values) else np.full(1, np.nan)
+    low = values[np.clip(starts + below, 0, last)]
+    high = values[np.clip(starts + above, 0, last)]
+    quantiles = low + (position - below) * (high - low)
+    quantiles[sizes == 0] = np.nan
+    return quantiles
+
+
+def _bounds(n, mean, std, quantiles, mad, methods, z, fence, mad_z):
+    # bounds table from the group statistics; quantiles are the 0.25, 0.5,
+    # 0.75, threshold and 1 - threshold quantiles of every group
+    q1, median, q3, low, high = quantiles.T
+    bounds = {'zscore': (mean - z * std, mean + z * std),
+              'iqr': (q1 - fence * (q3 - q1), q3 + fence * (q3 - q1)),
+              'mad': (median - mad_z * MAD_SCALE * mad,
+                      median + mad_z * MAD_SCALE * mad),
+              'percentile': (low, high)}
+    table = {'n': n}
+    for method in methods:
+        table[method + '_lower'], table[method + '_upper'] = bounds[method]
+    return table
+
+
+def _check(methods):
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError(f'unknown methods {sorted(unknown)}, expected some of {METHODS}')
+
+
+def group_bounds(df, value=None, by=None, methods=METHODS, z=3.0, fence=1.5,
+                 mad_z=3.0, threshold=0.01):
+    """
+    Outlier bounds of a column in every group, in one table.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame or GroupIndex
+        The data, or a group index of the values (see groups.py).
+    value : str, optional
+        The column to screen, e.g. 'price_m' (not used with a group index).
+    by : str, optional
+        The grouping column, e.g. 'district_name'. Default is None (the
+        whole column is one group, labelled 'all'). Not used with a group
+        index.
+    methods : sequence of str, optional
+        Some of 'zscore' (mean +- z standard deviations), 'iqr' (Tukey's
+        fences), 'mad' (median +- mad_z scaled MADs) and 'percentile'
+        (the threshold and 1 - threshold quantiles). Default is all.
+    z : float, optional
+        The number of standard deviations of the z-score bounds. Default
+        is 3.
+    fence : float, optional
+        The multiplier of the IQR of Tukey's fences. Default is 1.5.
+    mad_z : float, optional
+        The number of scaled MADs (MAD * 1.4826, a consistent estimate of
+        the normal standard deviation) of the MAD bounds. Default is 3.
+    threshold : float, optional
+        The share of each tail cut by the percentile bounds. Default is 0.01.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per group: the number of values n and the columns
+        '<method>_lower' and '<method>_upper' of every method. Empty groups
+        have NaN bounds.
+    """
+    _check(methods)
+    values, codes, labels = _rows(df, value, by)
+    values, sizes = _grouped(values, codes, len(labels))
+    group = np.repeat(np.arange(len(labels)), sizes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(group, values, len(labels)) / sizes
+        squares = np.bincount(group, (values - mean[group]) ** 2, len(labels))
+        std = np.sqrt(squares / (sizes - 1))
+    quantiles = segment_quantiles(values, sizes,
+                                  [0.25, 0.5, 0.75, threshold, 1 - threshold])
+    mad = np.full(len(labels), np.nan)
+    if 'mad' in methods:
+        deviations = _sort_segments(np.abs(values - quantiles[group, 1]), group)
+        mad = segment_quantiles(deviations, sizes, 0.5)[:, 0]
+    return pd.DataFrame(_bounds(sizes, mean, std, quantiles, mad, methods, z,
+                                fence, mad_z), index=labels)
+
+
+def _row_bounds(df, value, by, bounds, method):
+    # values of the rows with the lower and upper bound of the group of each
+    if method + '_lower' not in bounds:
+        raise ValueError(f'no {method} bounds, available: '
+                         f'{[c[:-6] for c in bounds if c.endswith("_lower")]}')
+    values, codes, labels = _rows(df, value, by)
+    limits = bounds.reindex(labels)
+    # code -1 (no group) picks the appended NaN
+    lower = np.append(limits[method + '_lower'].to_numpy(dtype=float), np.nan)
+    upper = np.append(limits[method + '_upper'].to_numpy(dtype=float), np.nan)
+    return values, lower[codes], upper[codes]
+
+
+def outlier_mask(df, value=None, by=None, bounds=None, method='iqr'):
+    """
+    Which rows lie outside the bounds of their group.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame or GroupIndex
+        The data, or a group index of the values.
+    value : str, optional
+        The screened column (not used with a group index).
+    by : str, optional
+        The grouping column (not used with a group index).
+    bounds : pandas.DataFrame, optional
+        Bounds from ``group_bounds`` or ``StreamingScreen.bounds``, e.g. of
+        the whole dataset when ``df`` is one chunk of it. Default is the
+        bounds of ``df``.
+    method : str, optional
+        The method whose bounds are used. Default is 'iqr'.
+
+    Returns
+    -------
+    numpy.ndarray of bool
+        True for the outliers, in the order of the rows of the DataFrame
+        (of the frame the group index was built from). Missing values and
+        groups without bounds are never outliers.
+    """
+    if bounds is None:
+        bounds = group_bounds(df, value, by, methods=[method])
+    values, lower, upper = _row_bounds(df, value, by, bounds, method)
+    return (values < lower) | (values > upper)
+
+
+def winsorize(df, value=None, by=None, bounds=None, method='iqr', out=None):
+    """
+    Values with the outliers replaced by the bound of their group.
+
+    Parameters
+    ----------
+    df, value, by, bounds, method
+        As for ``outlier_mask``.
+    out : numpy.ndarray, optional
+        A float array of the length of the data to write the values to.
+
+    Returns
+    -------
+    numpy.ndarray
+        The winsorized values, in the order of the rows.
+    """
+    if bounds is None:
+        bounds = group_bounds(df, value, by, methods=[method])
+    values, lower, upper = _row_bounds(df, value, by, bounds, method)
+    if out is None:
+        out = values.copy()
+    else:
+        out[...] = values
+    np.copyto(out, lower, where=values < lower)
+    np.copyto(out, upper, where=values > upper)
+    return out
+
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantiles of a stream (a KLL sketch).
+
+    Items are kept in levels; an item of level h stands for 2**h values.
+    When a level grows beyond its capacity it is sorted and every other item,
+    starting at a random offset, is promoted to the next level, until every
+    level is within its capacity; the sketch thus retains fewer than
+    3 * size items plus two per level. The rank error is of the order of
+    1 / size of the number of values, and the quantiles are exact until the
+    first compaction.
+
+    Parameters
+    ----------
+    size : int, optional
+        The capacity of the top level. Default is SKETCH_SIZE.
+    rng : numpy.random.Generator, optional
+        The source of the compaction offsets.
+    """
+
+    def __init__(self, size=SKETCH_SIZE, rng=None):
+        self.size = size
+        self.rng = np.random.default_rng(rng)
+        self.levels = [np.empty(0)]
+        self.n = 0
+
+    def _capacity(self, level):
+        # lower levels hold geometrically fewer items
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.size * (2 / 3) ** depth)))
+
+    def _compress(self):
+        # a new top level lowers the capacity of every level below it, so
+        # compact the lowest full level until all of them fit
+        while True:
+            full = [level for level, items in enumerate(self.levels)
+                    if len(items) > self._capacity(level)]
+            if not full:
+                return
+            level = full[0]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            even = len(items) - len(items) % 2
+            promoted = items[self.rng.integers(2):even:2]
+            self.levels[level] = items[even:]
+            self.levels[level + 1] = np.concatenate((self.levels[level + 1],
+                                                     promoted))
+
+    def update(self, values):
+        """Add an array of values."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other):
+        """Add the values summarized by another sketch."""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.n += other.n
+        self._compress()
+
+    def weighted(self):
+        """The items and the number of values each stands for."""
+        items = np.concatenate(self.levels)
+        weights = np.repeat(2.0 ** np.arange(len(self.levels)),
+                            [len(level) for level in self.levels])
+        return items, weights
+
+    def quantile(self, q):
+        """
+        Approximate quantiles.
+
+        Parameters
+        ----------
+        q : float or array-like of float
+            The probabilities.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if self.n == 0:
+            return np.full(len(q), np.nan)
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q)
+        return _weighted_quantile(*self.weighted(), q)
+
+
+def _weighted_quantile(items, weights, q):
+    # the first item whose cumulative weight reaches q of the total
+    order = np.argsort(items)
+    cumulative = np.cumsum(weights[order])
+    ranks = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+    return items[order][np.minimum(ranks, len(items) - 1)]
+
+
+class StreamingScreen:
+    """
+    Outlier bounds of every group from data read in chunks.
+
+    Every group keeps its count, mean and sum of squared deviations, merged
+    exactly chunk by chunk, and a ``QuantileSketch`` for the quantile-based
+    bounds; the MAD is the weighted median of the absolute deviations of the
+    sketch items from the sketch median.
+
+    Parameters
+    ----------
+    size : int, optional
+        The size of the quantile sketches. Default is SKETCH_SIZE.
+    seed : None, int or numpy.random.SeedSequence, optional
+        Seed of the sketch compactions.
+    """
+
+    def __init__(self, size=SKETCH_SIZE, seed=None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.groups = {}
+
+    def _group(self, label):
+        if label not in self.groups:
+            self.groups[label] = [0, 0.0, 0.0, QuantileSketch(self.size, self.rng)]
+        return self.groups[label]
+
+    def _add(self, label, n, mean, squares):
+        # combine the moments of two samples (Chan et al.)
+        state = self._group(label)
+        total = state[0] + n
+        delta = mean - state[1]
+        state[1] += delta * n / total
+        state[2] += squares + delta ** 2 * state[0] * n / total
+        state[0] = total
+
+    def update(self, df, value=None, by=None):
+        """
+        Add a chunk of the data.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame or GroupIndex
+            The chunk, or a group index of its values.
+        value : str, optional
+            The screened column (not used with a group index).
+        by : str, optional
+            The grouping column (not used with a group index).
+        """
+        values, codes, labels = _rows(df, value, by)
+        values, sizes = _grouped(values, codes, len(labels))
+        for label, group in zip(labels, np.split(values, np.cumsum(sizes)[:-1])):
+            if len(group):
+                mean = group.mean()
+                self._add(label, len(group), mean, np.sum((group - mean) ** 2))
+                self.groups[label][3].update(group)
+
+    def merge(self, other):
+        """Add the groups of another screen, e.g. of another worker."""
+        for label, (n, mean, squares, sketch) in other.groups.items():
+            self._add(label, n, mean, squares)
+            self.groups[label][3].merge(sketch)
+
+    def bounds(self, methods=METHODS, z=3.0, fence=1.5, mad_z=3.0, threshold=0.01):
+        """
+        Outlier bounds of every group seen so far.
+
+        Parameters
+        ----------
+        methods, z, fence, mad_z, threshold
+            As for ``group_bounds``.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The layout of ``group_bounds``, the groups sorted by label.
+        """
+        _check(methods)
+        labels = sorted(self.groups)
+        states = [self.groups[label] for label in labels]
+        n = np.array([state[0] for state in states], dtype=np.intp)
+        mean = np.array([state[1] for state in states])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.array([state[2] for state in states]) / (n - 1))
+        probabilities = [0.25, 0.5, 0.75, threshold, 1 - threshold]
+        quantiles = np.array([state[3].quantile(probabilities)
+                              for state in states]).reshape(-1, 5)
+        mad = np.full(len(labels), np.nan)
+        if 'mad' in methods:
+            for i, (_, _, _, sketch) in enumerate(states):
+                items, weights = sketch.weighted()
+                deviations = np.abs(items - quantiles[i, 1])
+                if len(sketch.levels) == 1:
+                    mad[i] = np.median(deviations) if len(items) else np.nan
+                else:
+                    mad[i] = _weighted_quantile(deviations, weights, 0.5)
+        return pd.DataFrame(_bounds(n, mean, std, quantiles, mad, methods, z,
+                                    fence, mad_z), index=pd.Index(labels))
@@ -0,0 +1,552 @@
+"""
+Benchmarks of the bootstrap, jackknife and Mann-Whitney routines.
+
+Every case runs on ds.csv (2.3k rows), spba-flats-210928.csv (34.8k rows)
+and a synthetic column of 1M prices, for B in {1k, 10k, 100k} replicates,
+each in a fresh worker process. Wall time (best of --repeat runs), the peak
+RSS growth of the worker and the peak of traced allocations (tracemalloc,
+in a separate run) are reported. With --baseline the results are compared
+to an earlier --save and the run fails when a case got slower or larger by
+more than --threshold. Cases whose data size times B exceeds --max-work are
+skipped unless --max-work is raised (1M rows x 100k replicates is 1e11
+draws).
+
+--check runs statistical equivalence checks instead, one function per module
+(``--check jackknife`` runs only those of jackknife.py): faster variants must
+give the same intervals as the straightforward ones within Monte Carlo
+tolerance, and the exact shortcuts the same values.
+
+Run from this directory::
+
+    python bench.py --save baseline.json
+    python bench.py --baseline baseline.json --threshold 0.25
+    python bench.py --check
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import (jarque_bera, kurtosis, mannwhitneyu, norm, normaltest,
+                         skew)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHAPTERS = os.path.dirname(HERE)
+for directory in (CHAPTERS, os.path.join(CHAPTERS, 'Bootstrap'),
+                  os.path.join(CHAPTERS, 'Mann-Whitney-Wilcoxon'),
+                  os.path.join(CHAPTERS, 'Outliers-handling')):
+    sys.path.insert(0, directory)
+
+import bootstrap_manually  # noqa: E402
+import instrumentation  # noqa: E402
+from adaptive import adaptive_replicates  # noqa: E402
+from groups import GroupIndex  # noqa: E402
+from grouped import grouped_bootstrap  # noqa: E402
+from intervals import (percentile_interval, shortest_interval,  # noqa: E402
+                       studentized_interval)
+from jackknife import leave_one_out  # noqa: E402
+from listings import load_listing  # noqa: E402
+from mann_whitney import (bootstrap_auc, delong_interval, mann_whitney,  # noqa: E402
+                          pairwise_mann_whitney)
+from normality import normality_report  # noqa: E402
+from outliers import MAD_SCALE, QuantileSketch, group_bounds  # noqa: E402
+from parallel import parallel_bootstrap  # noqa: E402
+from permutation import permutation_test  # noqa: E402
+from resampling import (excess_kurtosis, sample_std, sample_var,  # noqa: E402
+                        skewness)
+from result_cache import ResultCache  # noqa: E402
+from streaming import streaming_bootstrap  # noqa: E402
+
+DATASETS = ('ds', 'spba', 'synthetic')
+
+REPLICATES = (1000, 10000, 100000)
+
+# size of the synthetic price column
+SYNTHETIC_ROWS = 1_000_000
+
+# default limit of rows x replicates of a case
+MAX_WORK = 2e9
+
+# absolute slack of the regression check: timer noise and small allocations
+SLACK = {'time': 0.01, 'peak_allocated': 2 ** 20}
+
+
+def load_dataset(name):
+    """
+    Prices and their group labels of a benchmark dataset.
+
+    Parameters
+    ----------
+    name : str
+        'ds', 'spba' or 'synthetic'.
+
+    Returns
+    -------
+    tuple
+        The prices (float) and a GroupIndex of them by district, county or
+        synthetic group.
+    """
+    if name == 'ds':
+        df = load_listing(os.path.join(CHAPTERS, 'Bootstrap', 'ds.csv'))
+        by = 'district_name'
+    elif name == 'spba':
+        df = load_listing(os.path.join(CHAPTERS, 'Mann-Whitney-Wilcoxon',
+                                       'spba-flats-210928.csv'))
+        by = 'county'
+    elif name == 'synthetic':
+        rng = np.random.default_rng(2021)
+        codes = rng.integers(0, 50, SYNTHETIC_ROWS)
+        prices = rng.lognormal(np.log(150_000) + codes / 500, 0.4)
+        df = pd.DataFrame({'price_m': np.rint(prices).astype(np.int32),
+                           'group': pd.Categorical.from_codes(
+                               codes, [f'g{i:02d}' for i in range(50)])})
+        by = 'group'
+    else:
+        raise ValueError(f"unknown dataset: {name!r}")
+    return (df['price_m'].to_numpy(dtype=float),
+            GroupIndex.from_frame(df, 'price_m', by))
+
+
+def _two_largest(groups):
+    first, second = np.argsort(groups.sizes)[::-1][:2]
+    return groups[groups.labels[first]], groups[groups.labels[second]]
+
+
+# the seeded wrappers of the script are cached; the benchmark times the work
+appr_percentile_bootstrap = bootstrap_manually.appr_percentile_bootstrap.__wrapped__
+appr_bayesian_bootstrap = bootstrap_manually.appr_bayesian_bootstrap.__wrapped__
+
+# benchmark cases: (function of prices, groups and B, whether B matters)
+CASES = {
+    'percentile_bootstrap': (lambda x, g, b: bootstrap_manually.percentile_bootstrap(
+        x, np.mean, n_bootstraps=b, seed=0), True),
+    'appr_percentile_bootstrap': (lambda x, g, b: appr_percentile_bootstrap(
+        x, np.mean, b, seed=0), True),
+    'smoothed_bootstrap': (lambda x, g, b: bootstrap_manually.smoothed_bootstrap(
+        x, b, seed=0), True),
+    'bayesian_bootstrap': (lambda x, g, b: bootstrap_manually.bayesian_bootstrap(
+        x, b, seed=0), True),
+    'appr_bayesian_bootstrap': (lambda x, g, b: appr_bayesian_bootstrap(
+        x, np.mean, b, seed=0), True),
+    'streaming_bootstrap': (lambda x, g, b: streaming_bootstrap(
+        [x], n_replications=b, random_state=0), True),
+    'jackknife_std': (lambda x, g, b: leave_one_out(x, sample_std(ddof=1)), False),
+    'mann_whitney': (lambda x, g, b: mann_whitney(*_two_largest(g)), False),
+    'pairwise_mann_whitney': (lambda x, g, b: pairwise_mann_whitney(
+        g.values, g.codes), False),
+    'bootstrap_auc': (lambda x, g, b: bootstrap_auc(
+        *_two_largest(g), n_bootstraps=b, random_state=0), True),
+}
+
+
+def _peak_rss():
+    # peak resident set size of this process in bytes (kilobytes on Linux)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure(task):
+    # runs in a fresh worker process: load, time, then trace allocations
+    case, dataset, b, repeat = task
+    x, groups = load_dataset(dataset)
+    function = CASES[case][0]
+    rss_before = _peak_rss()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(x, groups, b)
+        times.append(time.perf_counter() - start)
+    rss = _peak_rss() - rss_before
+    tracemalloc.start()
+    function(x, groups, b)
+    _, allocated = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'case': case, 'dataset': dataset, 'B': b, 'time': min(times),
+            'peak_rss': rss, 'peak_allocated': allocated}
+
+
+def run(cases, datasets, replicates, repeat=3, max_work=MAX_WORK):
+    """
+    Run the benchmark cases, each in a fresh worker process.
+
+    Parameters
+    ----------
+    cases, datasets, replicates : sequences
+        The cases, datasets and numbers of replicates to combine.
+    repeat : int, optional
+        The number of timed runs; the best one is reported.
+    max_work : float, optional
+        Skip combinations with more rows x replicates.
+
+    Returns
+    -------
+    list of dict
+        One record per case, dataset and B.
+    """
+    sizes = {'ds': 2355, 'spba': 34821, 'synthetic': SYNTHETIC_ROWS}
+    results = []
+    for dataset in datasets:
+        for case in cases:
+            uses_b = CASES[case][1]
+            for b in (replicates if uses_b else replicates[:1]):
+                if uses_b and sizes[dataset] * b > max_work:
+                    print(f'skip {case} {dataset} B={b}')
+                    continue
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(_measure,
+                                             (case, dataset, b, repeat)).result()
+                if not uses_b:
+                    result['B'] = None
+                print('{case:26s} {dataset:9s} B={B!s:6s} {time:9.3f} s '
+                      '{rss_mb:9.1f} MB RSS {alloc_mb:9.1f} MB allocated'.format(
+                          rss_mb=result['peak_rss'] / 2 ** 20,
+                          alloc_mb=result['peak_allocated'] / 2 ** 20, **result))
+                results.append(result)
+    return results
+
+
+def regressions(results, baseline, threshold=0.25):
+    """
+    Cases that got slower or use more memory than in the baseline.
+
+    Parameters
+    ----------
+    results, baseline : list of dict
+        Records from ``run``.
+    threshold : float, optional
+        Allowed relative increase. Default is 0.25.
+
+    Returns
+    -------
+    list of str
+        One message per regression.
+    """
+    previous = {(r['case'], r['dataset'], r['B']): r for r in baseline}
+    messages = []
+    for result in results:
+        old = previous.get((result['case'], result['dataset'], result['B']))
+        if old is None:
+            continue
+        for metric in ('time', 'peak_allocated'):
+            if (result[metric] > old[metric] * (1 + threshold)
+                    and result[metric] - old[metric] > SLACK[metric]):
+                messages.append('{} {} B={}: {} {:.4g} -> {:.4g}'.format(
+                    result['case'], result['dataset'], result['B'], metric,
+                    old[metric], result[metric]))
+    return messages
+
+
+def _quantile_se(replicates, p):
+    # Monte Carlo standard error of a sample quantile, normal approximation
+    sigma = np.std(replicates)
+    return sigma * np.sqrt(p * (1 - p) / len(replicates)) / norm.pdf(norm.ppf(p))
+
+
+def _close_intervals(name, fast, reference, replicates, alpha=0.05, k=4):
+    # both bounds agree within k standard errors of their difference
+    se = np.array([_quantile_se(replicates, alpha / 2),
+                   _quantile_se(replicates, 1 - alpha / 2)]) * np.sqrt(2)
+    ok = bool(np.all(np.abs(np.asarray(fast) - np.asarray(reference)) <= k * se))
+    return name, ok, f'{np.round(fast, 2)} vs {np.round(reference, 2)}'
+
+
+def _worker_counters(n_workers):
+    # counters of the routines running tasks in worker processes
+    x, groups = load_dataset('ds')
+    frame = load_listing(os.path.join(CHAPTERS, 'Bootstrap', 'ds.csv'))
+    a, c = _two_largest(groups)
+    _, spba = load_dataset('spba')
+    with instrumentation.profile() as recorder:
+        parallel_bootstrap(x, np.mean, 'percentile', 3000, seed=1,
+                           n_workers=n_workers)
+        grouped_bootstrap(frame, 'price_m', 'district_name', n_replications=3000,
+                          seed=2, n_workers=n_workers)
+        adaptive_replicates(x[:, None], [np.mean], min_replications=2000,
+                            max_replications=2000, seed=3, n_workers=n_workers)
+        permutation_test(a, c, method='permutation', n_permutations=6000,
+                         early_stop=False, seed=4, n_workers=n_workers)
+        normality_report(spba, n_subsamples=3, seed=5, n_workers=n_workers)
+    return recorder.report()['counters']
+
+
+def check_bootstrap_manually():
+    # the script's bootstraps against plain reference loops
+    x, _ = load_dataset('ds')
+    b = 4000
+    rng = np.random.default_rng(1)
+    # plain resampling loop as the reference of the percentile bootstrap
+    naive = np.array([np.mean(rng.choice(x, len(x))) for _ in range(b)])
+    results = [_close_intervals('percentile_bootstrap vs naive loop',
+                                bootstrap_manually.percentile_bootstrap(
+                                    x, np.mean, n_bootstraps=b, seed=2),
+                                percentile_interval(naive), naive)]
+    # normalized exponential weights as the reference of the Bayesian bootstrap
+    weights = rng.exponential(size=(b, len(x)))
+    naive = weights @ x / weights.sum(axis=1)
+    means, _ = bootstrap_manually.bayesian_bootstrap(x, b, seed=3)
+    results.append(_close_intervals('bayesian_bootstrap vs Dirichlet loop',
+                                    percentile_interval(means),
+                                    percentile_interval(naive), naive))
+    _, lower, upper = appr_bayesian_bootstrap(x, np.mean, b, seed=3)
+    results.append(_close_intervals('appr_bayesian_bootstrap vs Dirichlet loop',
+                                    (lower, upper), shortest_interval(naive),
+                                    naive))
+    return results
+
+
+def check_streaming():
+    x, _ = load_dataset('ds')
+    b = 4000
+    reference = parallel_bootstrap(x, np.mean, 'percentile', b, seed=3)
+    (_, ci), _ = streaming_bootstrap([x], n_replications=b, random_state=4)
+    return [_close_intervals('streaming vs percentile', ci,
+                             percentile_interval(reference), reference)]
+
+
+def check_parallel():
+    x, _ = load_dataset('ds')
+    one = parallel_bootstrap(x, np.mean, 'bayesian', 3000, seed=5)
+    two = parallel_bootstrap(x, np.mean, 'bayesian', 3000, seed=5, n_workers=2)
+    return [('1 vs 2 workers', bool(np.array_equal(one, two)), 'identical')]
+
+
+def check_jackknife():
+    x, _ = load_dataset('ds')
+    std = sample_std(ddof=1)
+    closed = leave_one_out(x[:500], std)
+    loop = np.array([np.std(np.delete(x[:500], i), ddof=1) for i in range(500)])
+    results = [('jackknife closed form', bool(np.allclose(closed, loop)),
+                f'max diff {np.max(np.abs(closed - loop)):.2g}')]
+    # degenerate leave-one-out samples (n = 2, 3, constant) as NumPy and SciPy
+    small = [x[:2], x[:3], np.array([x[0], x[0], x[1]])]
+    agree = True
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for data in small:
+            for statistic in (sample_var(ddof=1), std, skewness(bias=False),
+                              excess_kurtosis(bias=True)):
+                loop = np.array([statistic(np.delete(data, i))
+                                 for i in range(len(data))])
+                agree &= bool(np.allclose(leave_one_out(data, statistic), loop,
+                                          equal_nan=True))
+    results.append(('jackknife small samples', agree, 'n = 2, 3 and ties'))
+    # a large mean with a spread of a few units in the last place is not constant
+    data = 1e6 + np.arange(6) * 5e-10
+    closed = leave_one_out(data, std)
+    loop = np.array([np.std(np.delete(data, i), ddof=1) for i in range(len(data))])
+    results.append(('jackknife large mean, small spread',
+                    bool(np.allclose(closed, loop, rtol=0.01, atol=0)),
+                    f'std {closed.min():.3g} .. {closed.max():.3g}'))
+    return results
+
+
+def check_intervals():
+    # constant data: a zero standard error gives the estimate as both bounds
+    bounds = studentized_interval(np.full(10, 5.0), np.mean, random_state=11)
+    return [('studentized interval of constant data',
+             bool(np.array_equal(bounds, [5.0, 5.0])), f'{bounds}')]
+
+
+def check_mann_whitney():
+    _, groups = load_dataset('ds')
+    a, c = _two_largest(groups)
+    result = mann_whitney(a, c)
+    reference = mannwhitneyu(a, c, method='asymptotic')
+    results = [('mann_whitney vs scipy',
+                bool(np.isclose(result.statistic, reference.statistic)
+                     and np.isclose(result.pvalue, reference.pvalue)),
+                f'p {result.pvalue:.4g} vs {reference.pvalue:.4g}')]
+    pairs = pairwise_mann_whitney(groups.values, groups.codes)
+    i, j = np.argsort(groups.sizes)[::-1][:2]
+    results.append(('pairwise vs single pair',
+                    bool(np.isclose(pairs.statistic.iloc[i, j], result.statistic)),
+                    f'U {pairs.statistic.iloc[i, j]} vs {result.statistic}'))
+    # observations without a label are left out, not made a group of their own
+    labels = np.where(np.arange(len(groups.values)) % 7, groups.codes, -1)
+    named = pd.Series(groups.labels[labels]).where(labels >= 0)
+    missing = pairwise_mann_whitney(groups.values, named.to_numpy(dtype=object))
+    kept = labels >= 0
+    reference = pairwise_mann_whitney(groups.values[kept], groups.labels[labels[kept]])
+    results.append(('pairwise with missing labels',
+                    missing.statistic.equals(reference.statistic),
+                    f'{int(missing.sizes.sum())} of {len(labels)} kept'))
+    boot = bootstrap_auc(a, c, 4000, random_state=6)
+    delong = delong_interval(a, c)
+    width = delong.auc_ci[1] - delong.auc_ci[0]
+    results.append(('bootstrap AUC vs DeLong',
+                    bool(np.all(np.abs(boot.auc_ci - delong.auc_ci) <= 0.1 * width)),
+                    f'{np.round(boot.auc_ci, 4)} vs {np.round(delong.auc_ci, 4)}'))
+    return results
+
+
+def check_normality():
+    # moments and tests of a group far from the overall mean, as SciPy
+    rng = np.random.default_rng(9)
+    frame = pd.DataFrame({'value': np.concatenate([rng.normal(0, 1, 400),
+                                                   rng.gamma(4, 5, 300) + 1e6]),
+                          'group': ['near'] * 400 + ['far'] * 300})
+    report = normality_report(frame, 'value', 'group', seed=10)
+    ok = True
+    for group, values in frame.groupby('group')['value']:
+        row = report.loc[group]
+        reference = (skew(values), kurtosis(values, fisher=False),
+                     *normaltest(values), *jarque_bera(values))
+        ok &= bool(np.allclose([row['skew'], row['kurtosis'], row['normaltest'],
+                                row['normaltest_p'], row['jarque_bera'],
+                                row['jarque_bera_p']], reference))
+    far = report.loc['far']
+    return [('moments of a far-off group vs scipy', ok,
+             f"skew {far['skew']:.4f} vs {skew(frame['value'][400:]):.4f}")]
+
+
+def check_groups():
+    # a row without a group is left out, also when groups are coarsened
+    x, _ = load_dataset('ds')
+    frame = pd.DataFrame({'price_m': x[:6], 'district': ['a-1', 'a-2', None,
+                                                         'b-1', 'a-1', 'b-2']})
+    fine = GroupIndex.from_frame(frame, 'price_m', 'district')
+    coarse = GroupIndex.from_frame(frame, 'price_m', 'district',
+                                   key=lambda label: label[0])
+    return [('missing group left out',
+             fine.sizes.sum() == coarse.sizes.sum() == 5
+             and bool(np.array_equal(coarse.values, x[coarse.order]))
+             and 2 not in coarse.order,
+             f'sizes {fine.sizes.tolist()} and {coarse.sizes.tolist()}')]
+
+
+def check_outliers():
+    # quantiles and MADs of the segmented sort as pandas gives them per group
+    frame = load_listing(os.path.join(CHAPTERS, 'Bootstrap', 'ds.csv'))
+    bounds = group_bounds(frame, 'price_m', 'district_name', methods=('iqr', 'mad'))
+    grouped = frame.groupby('district_name', observed=False)['price_m']
+    q1, q3 = grouped.quantile(0.25), grouped.quantile(0.75)
+    median = grouped.median()
+    mad = grouped.apply(lambda values: (values - values.median()).abs().median())
+    reference = pd.DataFrame({'iqr_lower': q1 - 1.5 * (q3 - q1),
+                              'mad_lower': median - 3 * MAD_SCALE * mad})
+    results = [('group bounds vs pandas',
+                bool(np.allclose(bounds[list(reference)], reference,
+                                 equal_nan=True)),
+                f'{len(bounds)} groups')]
+    # a quantile sketch of a long stream stays within its size bound
+    sketch = QuantileSketch(size=200, rng=7)
+    stream = np.random.default_rng(8)
+    peak = 0
+    for _ in range(1000):
+        sketch.update(stream.lognormal(12, 0.4, 1000))
+        peak = max(peak, sum(len(level) for level in sketch.levels))
+    bound = 3 * sketch.size + 2 * len(sketch.levels)
+    results.append(('quantile sketch bounded', peak <= bound,
+                    f'{peak} of at most {bound} items kept for {sketch.n} values'))
+    return results
+
+
+def check_instrumentation():
+    one, two = _worker_counters(1), _worker_counters(2)
+    return [('worker counters merged', one == two, f'{two}')]
+
+
+def check_listings():
+    # the copies of the Almaty listing spell their headers differently
+    copies = [load_listing(os.path.join(CHAPTERS, chapter, 'almaty-apts-2019-1.csv'))
+              for chapter in ('Mann-Whitney-Wilcoxon', 'Outliers-handling')]
+    return [('listing copies',
+             bool(np.array_equal(copies[0].iloc[:, 1], copies[1].iloc[:, 1])),
+             ' vs '.join(str(list(df.columns)) for df in copies))]
+
+
+def check_result_cache():
+    # a result changed in place by the caller is not changed in the cache
+    cache = ResultCache(directory=None)
+    x, _ = load_dataset('ds')
+    first = cache.call(percentile_interval, x)
+    first[...] = 0
+    second = cache.call(percentile_interval, x)
+    second[...] = 0
+    third = cache.call(percentile_interval, x)
+    return [('cached results are copies',
+             cache.hits == 2 and bool(np.all(third != 0)), f'{third}')]
+
+
+# equivalence checks by the module they cover
+CHECKS = {
+    'bootstrap_manually': check_bootstrap_manually,
+    'streaming': check_streaming,
+    'parallel': check_parallel,
+    'jackknife': check_jackknife,
+    'intervals': check_intervals,
+    'mann_whitney': check_mann_whitney,
+    'normality': check_normality,
+    'groups': check_groups,
+    'outliers': check_outliers,
+    'instrumentation': check_instrumentation,
+    'listings': check_listings,
+    'result_cache': check_result_cache,
+}
+
+
+def check(modules=None):
+    """
+    Statistical equivalence checks of the fast variants.
+
+    Parameters
+    ----------
+    modules : sequence of str, optional
+        The modules to check (keys of CHECKS). Default is all of them.
+
+    Returns
+    -------
+    list of tuple
+        Module, name, whether it passed and details of every check.
+    """
+    return [(module, *result) for module in (modules or CHECKS)
+            for result in CHECKS[module]()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cases', nargs='+', default=list(CASES),
+                        choices=list(CASES))
+    parser.add_argument('--datasets', nargs='+', default=list(DATASETS),
+                        choices=list(DATASETS))
+    parser.add_argument('--replicates', nargs='+', type=int,
+                        default=list(REPLICATES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-work', type=float, default=MAX_WORK)
+    parser.add_argument('--save', help='write the results to a JSON file')
+    parser.add_argument('--baseline', help='compare with a saved JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--check', nargs='*', choices=list(CHECKS),
+                        help='run the equivalence checks (of the given modules) '
+                             'instead')
+    args = parser.parse_args(argv)
+    if args.check is not None:
+        failed = 0
+        for module, name, ok, details in check(args.check):
+            print(f"{'ok  ' if ok else 'FAIL'} {module}: {name}: {details}")
+            failed += not ok
+        return 1 if failed else 0
+    results = run(args.cases, args.datasets, args.replicates, args.repeat,
+                  args.max_work)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            messages = regressions(results, json.load(file), args.threshold)
+        for message in messages:
+            print('REGRESSION', message)
+        return 1 if messages else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
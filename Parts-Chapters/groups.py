@@ -0,0 +1,118 @@
+"""
+Group index of a value column by region, county or district.
+
+The values are stored once, ordered by group, next to the offsets of every
+group (the layout of a CSR matrix row pointer), so the values of a group are
+a slice of one array: a NumPy view, not a copy. Groups come from the codes
+of a categorical column; coarser groups such as the region of a county are
+derived by mapping the categories, never the rows, so no string is scanned
+per row.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class GroupIndex:
+    """
+    Values ordered by group with the offsets of every group.
+
+    Parameters
+    ----------
+    values : array-like
+        The values, e.g. prices.
+    codes : array-like of int
+        The group code (0 .. len(labels) - 1) of every value; values with a
+        negative code (a missing group) are left out.
+    labels : sequence
+        The label of every group code.
+    presorted : bool, optional
+        Also sort the values within every group, so the views can be passed
+        to routines taking sorted samples. Default is False.
+    """
+
+    def __init__(self, values, codes, labels, presorted=False):
+        values = np.asarray(values)
+        codes = np.asarray(codes, dtype=np.intp)
+        # positions of the rows with a group, so that ``order`` still refers
+        # to the rows of the input
+        kept = np.flatnonzero(codes >= 0)
+        codes = codes[kept]
+        if presorted:
+            order = kept[np.lexsort((values[kept], codes))]
+        else:
+            order = kept[np.argsort(codes, kind='stable')]
+        self.values = values[order]
+        self.values.flags.writeable = False
+        self.labels = pd.Index(labels)
+        self.sizes = np.bincount(codes, minlength=len(self.labels))
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes)))
+        self.order = order
+        self.n_rows = len(values)
+        self.presorted = presorted
+
+    @classmethod
+    def from_frame(cls, df, value, by, key=None, presorted=False):
+        """
+        Group index of a DataFrame column.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            The data.
+        value : str
+            The value column, e.g. 'price_m'.
+        by : str
+            The grouping column, preferably categorical, e.g. 'county'.
+        key : callable or dict, optional
+            Maps every category to a coarser group, e.g. the region of a
+            county: ``lambda county: county[0]``.
+        presorted : bool, optional
+            Also sort the values within every group.
+
+        Returns
+        -------
+        GroupIndex
+        """
+        groups = df[by]
+        if isinstance(groups.dtype, pd.CategoricalDtype):
+            codes, categories = groups.cat.codes.to_numpy(), groups.cat.categories
+        else:
+            codes, categories = pd.factorize(groups, sort=True)
+        if key is not None:
+            mapped = pd.Index(categories).map(key)
+            coarse, labels = pd.factorize(mapped, sort=True)
+            # a missing group stays missing instead of wrapping to the last one
+            codes, categories = np.where(codes >= 0, coarse[codes], -1), labels
+        return cls(df[value].to_numpy(), codes, categories, presorted)
+
+    @property
+    def codes(self):
+        """Group codes in the order of ``values``."""
+        return np.repeat(np.arange(len(self.labels)), self.sizes)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.labels
+
+    def __getitem__(self, label):
+        """Values of a group, as a read-only view."""
+        i = self.labels.get_loc(label)
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def items(self):
+        """Pairs of group labels and their values (views)."""
+        for i, label in enumerate(self.labels):
+            yield label, self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def mask(self, label):
+        """Boolean mask of a group over ``values``."""
+        i = self.labels.get_loc(label)
+        mask = np.zeros(len(self.values), dtype=bool)
+        mask[self.offsets[i]:self.offsets[i + 1]] = True
+        return mask
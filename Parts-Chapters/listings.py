@@ -0,0 +1,204 @@
+"""
+Columnar, cached loader of the listing datasets used across the chapters.
+
+Only the needed columns are parsed, with compact dtypes: grouping columns
+become categoricals and integral prices int32. On the first load every
+column is written to a ``.npy`` file in a cache directory next to the CSV,
+keyed by a hash of the file and of the requested columns; later loads map
+these files into memory instead of parsing the CSV, so unused columns (such
+as the listing URLs) never reach RAM. The hash is recorded with the size and
+modification time of the file and only recomputed when one of them changes.
+
+The scripts of a chapter import it with the parent directory on the path::
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# name of the cache directory created next to each CSV file
+CACHE_DIR = '.listing-cache'
+
+# columns and dtypes loaded by default, by file name ('int32' columns fall
+# back to a wider type when the values are not integral or do not fit); the
+# copies of a file spell the names with '.' or '_', whichever the header has
+LISTINGS = {
+    'spba-flats-210928.csv': {'price_m': 'int32', 'county': 'category'},
+    'almaty-apts-2019-1.csv': {'price': 'int64', 'price.m': 'int32',
+                               'district.name': 'category'},
+    'ds.csv': {'price': 'int64', 'price_m': 'int32',
+               'district_name': 'category'},
+}
+
+
+def file_hash(path, block_size=2 ** 20):
+    """
+    SHA-1 of the contents of a file, read in blocks.
+
+    Parameters
+    ----------
+    path : str
+        The file.
+    block_size : int, optional
+        The number of bytes read at a time.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat_hash(path, directory):
+    # the hash of a file, recomputed only if its size or modification time
+    # differ from the ones recorded next to the cache
+    stat = os.stat(path)
+    record = os.path.join(directory, os.path.basename(path) + '.hash.json')
+    try:
+        with open(record, encoding='utf-8') as file:
+            known = json.load(file)
+    except (OSError, ValueError):
+        known = {}
+    if known.get('size') == stat.st_size and known.get('mtime_ns') == stat.st_mtime_ns:
+        return known['sha1']
+    digest = file_hash(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, staging = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w', encoding='utf-8') as file:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                   'sha1': digest}, file)
+    os.replace(staging, record)
+    return digest
+
+
+def _spelled(path, columns):
+    # the default columns as spelled in the header of this copy of the file
+    header = pd.read_csv(path, nrows=0).columns
+    names = {name.replace('.', '_'): name for name in header}
+    return {names.get(column.replace('.', '_'), column): dtype
+            for column, dtype in columns.items()}
+
+
+def _compact(series, dtype):
+    # integral columns without missing values that fit become int32
+    if dtype == 'category':
+        return series.astype('category')
+    if dtype == 'int32':
+        values = series.to_numpy()
+        info = np.iinfo(np.int32)
+        if (not series.isna().any() and np.all(values % 1 == 0)
+                and info.min <= values.min() and values.max() <= info.max):
+            return series.astype(np.int32)
+        return series.astype(float)
+    return series.astype(dtype)
+
+
+def _write_cache(df, directory):
+    # write into a temporary directory and rename it, so an interrupted run
+    # never leaves a partial cache behind
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+    manifest = []
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(staging, f'{i}.npy'), series.cat.codes.to_numpy())
+            np.save(os.path.join(staging, f'{i}.categories.npy'),
+                    series.cat.categories.to_numpy(dtype=str))
+            manifest.append({'name': column, 'kind': 'category'})
+        else:
+            np.save(os.path.join(staging, f'{i}.npy'), series.to_numpy())
+            manifest.append({'name': column, 'kind': 'array'})
+    with open(os.path.join(staging, 'columns.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False)
+    try:
+        os.replace(staging, directory)
+    except OSError:
+        # another process has written the same cache in the meantime
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _read_cache(directory):
+    with open(os.path.join(directory, 'columns.json'), encoding='utf-8') as file:
+        manifest = json.load(file)
+    columns = {}
+    for i, entry in enumerate(manifest):
+        values = np.load(os.path.join(directory, f'{i}.npy'), mmap_mode='r')
+        if entry['kind'] == 'category':
+            categories = np.load(os.path.join(directory, f'{i}.categories.npy'))
+            columns[entry['name']] = pd.Categorical.from_codes(values, categories)
+        else:
+            columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_listing(path, columns=None, cache=True, refresh=False):
+    """
+    Selected columns of a listing CSV, from the cache when possible.
+
+    Parameters
+    ----------
+    path : str
+        The CSV file, e.g. 'spba-flats-210928.csv'.
+    columns : dict or sequence of str, optional
+        Column names mapped to dtypes ('int32', 'category' or any pandas
+        dtype), or a list of names to read with default dtypes. Defaults to
+        the entry of the file in ``LISTINGS`` as spelled in its header, or
+        all columns.
+    cache : bool, optional
+        Read and write the ``.npy`` cache. Default is True.
+    refresh : bool, optional
+        Parse the CSV and rewrite the cache even if it exists.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The requested columns; numeric columns loaded from the cache are
+        read-only memory maps.
+    """
+    if columns is None:
+        columns = LISTINGS.get(os.path.basename(path))
+        if columns is not None:
+            columns = _spelled(path, columns)
+    elif not isinstance(columns, dict):
+        columns = {column: None for column in columns}
+    if not cache:
+        return _parse(path, columns)
+    root = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    key = hashlib.sha1((_stat_hash(path, root) + json.dumps(columns, sort_keys=True))
+                       .encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.join(root, f'{stem}-{key}')
+    if os.path.isdir(directory) and not refresh:
+        return _read_cache(directory)
+    df = _parse(path, columns)
+    if refresh:
+        shutil.rmtree(directory, ignore_errors=True)
+    _write_cache(df, directory)
+    return df
+
+
+def _parse(path, columns):
+    # parse only the requested columns, categoricals directly as such
+    if columns is None:
+        return pd.read_csv(path)
+    dtypes = {column: 'category' for column, dtype in columns.items()
+              if dtype == 'category'}
+    df = pd.read_csv(path, usecols=list(columns), dtype=dtypes)[list(columns)]
+    for column, dtype in columns.items():
+        if dtype is not None:
+            df[column] = _compact(df[column], dtype)
+    return df
@@ -0,0 +1,405 @@
+"""
+Cache of computed results, e.g. bootstrap intervals and U-test results.
+
+A result is stored under a fingerprint of everything it depends on: the
+function (its module, name and bytecode), the sources of the project
+modules it imports, directly or through other project modules, the contents
+of the input arrays and frames, the statistics passed (their code, or their
+kind and parameters for the factories in Bootstrap/resampling.py), and every
+other argument such as the method, alpha, the number of replicates and the
+seed. A change to any of them gives a new fingerprint. What the fingerprint
+cannot see, such as a file the function reads by name or a module outside
+this directory, is covered by the ``version`` argument, to be increased when
+it changes. Results are kept in an in-process LRU and pickled to a
+directory, which is trimmed to a size limit by removing the least recently
+used files. The in-process LRU keeps the pickled bytes as well, so every
+call returns a fresh copy that the caller may change in place.
+
+Calls whose result is random by design are never cached: those passing a
+``numpy.random.Generator``, and those with a seed (or random state) of None
+that draw random numbers from it. A None seed is replaced by a fresh seed
+sequence that records whether it is used, so deterministic calls, e.g. an
+exact permutation test, are cached all the same. The scripts wrap the
+functions they call::
+
+    from result_cache import cached
+    mann_whitney = cached(mann_whitney)
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+import types
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# directory of the on-disk store, relative to the working directory
+CACHE_DIR = '.result-cache'
+
+# size limit of the on-disk store and number of results kept in memory
+MAX_BYTES = 256 * 2 ** 20
+MAX_ENTRIES = 128
+
+# argument names of seeds; a None seed means a fresh random result
+SEED_ARGUMENTS = ('seed', 'random_state')
+
+# modules from files below this directory are part of the fingerprints
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Uncacheable(Exception):
+    # raised while fingerprinting a value whose result must not be reused
+    pass
+
+
+def _update(digest, value):
+    # feed a type tag and the contents of a value to the digest; arrays
+    # mapped from a file (np.memmap) hash like the same array in memory
+    tag = np.ndarray if isinstance(value, np.ndarray) else type(value)
+    digest.update(tag.__qualname__.encode())
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes,
+                                           np.generic)):
+        digest.update(repr(value).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype}{value.shape}'.encode())
+        if value.dtype.hasobject:
+            _update(digest, value.tolist())
+        else:
+            digest.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, pd.DataFrame):
+        _update(digest, list(value.columns))
+        for column in value.columns:
+            _update(digest, value[column])
+    elif isinstance(value, (pd.Series, pd.Index)):
+        _update(digest, value.name)
+        if isinstance(value.dtype, pd.CategoricalDtype):
+            values = pd.Categorical(value)
+            _update(digest, values.codes)
+            _update(digest, values.categories.to_numpy())
+        else:
+            _update(digest, value.to_numpy())
+    elif isinstance(value, (list, tuple)):
+        digest.update(str(len(value)).encode())
+        for item in value:
+            _update(digest, item)
+    elif isinstance(value, dict):
+        digest.update(str(len(value)).encode())
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+    elif isinstance(value, np.random.SeedSequence):
+        _update(digest, (value.entropy, value.spawn_key))
+    elif isinstance(value, np.random.Generator):
+        # its state moves on with every call
+        raise _Uncacheable
+    elif isinstance(value, functools.partial):
+        _update(digest, (value.func, value.args, value.keywords))
+    elif hasattr(value, 'kind') and hasattr(value, 'params') and callable(value):
+        # a statistic of Bootstrap/resampling.py
+        _update(digest, (value.__name__, value.kind, value.params))
+    elif inspect.isfunction(value):
+        _update(digest, (value.__module__, value.__qualname__))
+        _update(digest, _module_sources(value.__module__))
+        _update_code(digest, value.__code__)
+        _update(digest, value.__defaults__)
+        for cell in value.__closure__ or ():
+            _update(digest, cell.cell_contents)
+    elif callable(value) and hasattr(value, '__qualname__'):
+        # built-in functions, NumPy ufuncs and classes
+        _update(digest, (getattr(value, '__module__', None), value.__qualname__))
+    elif hasattr(value, '__dict__'):
+        # e.g. a group index: its attributes hold the data
+        _update(digest, vars(value))
+    else:
+        digest.update(repr(value).encode())
+
+
+def _update_code(digest, code):
+    # bytecode and constants, nested functions included (the repr of a code
+    # object contains its address, which changes from run to run)
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            _update_code(digest, const)
+        else:
+            _update(digest, const)
+    _update(digest, code.co_names)
+
+
+# SHA-1 of the source of every project module, by module name
+_sources = {}
+
+
+def _project_module(name):
+    # the module of that name if it was loaded from a file of this project
+    module = sys.modules.get(name)
+    path = getattr(module, '__file__', None)
+    if path is None or not os.path.abspath(path).startswith(PROJECT_DIR + os.sep):
+        return None
+    return module
+
+
+def _module_sources(name):
+    # digests of the sources of a project module and of the project modules
+    # it imports, directly or through others, as sorted (name, digest) pairs
+    pending, seen = [name], set()
+    while pending:
+        name = pending.pop()
+        module = _project_module(name)
+        if name in seen or module is None:
+            continue
+        seen.add(name)
+        if name not in _sources:
+            with open(module.__file__, 'rb') as file:
+                _sources[name] = hashlib.sha1(file.read()).hexdigest()
+        for value in list(vars(module).values()):
+            if isinstance(value, types.ModuleType):
+                pending.append(value.__name__)
+            elif isinstance(getattr(value, '__module__', None), str):
+                pending.append(value.__module__)
+    return [(name, _sources[name]) for name in sorted(seen)]
+
+
+def fingerprint(*values):
+    """
+    Hash of the contents of values, arrays and frames included.
+
+    Parameters
+    ----------
+    *values
+        Arrays, frames, functions, numbers, strings and containers of them.
+
+    Returns
+    -------
+    str or None
+        The hexadecimal SHA-1 digest, or None if one of the values makes a
+        result unrepeatable (a ``numpy.random.Generator``).
+    """
+    digest = hashlib.sha1()
+    try:
+        _update(digest, values)
+    except _Uncacheable:
+        return None
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Results by key, in memory and on disk.
+
+    Parameters
+    ----------
+    directory : str, optional
+        The on-disk store. Default is CACHE_DIR; None keeps results in
+        memory only.
+    max_bytes : int, optional
+        Size limit of the on-disk store. Default is MAX_BYTES.
+    max_entries : int, optional
+        The number of results kept in memory. Default is MAX_ENTRIES.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES,
+                 max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def _remember(self, key, data):
+        # the pickled result, so that no caller shares an object with the cache
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        The result stored under a key.
+
+        Returns
+        -------
+        tuple
+            (True, result), or (False, None) if there is none; the result
+            is a new copy on every call.
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return True, pickle.loads(self.memory[key])
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as file:
+                    data = file.read()
+                value = pickle.loads(data)
+                # the modification time orders the files for eviction
+                os.utime(path)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                self._remember(key, data)
+                self.hits += 1
+                return True, value
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        """Store a result under a key."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file and rename it, so readers never see a
+        # partial entry
+        handle, staging = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(data)
+            os.replace(staging, self._path(key))
+        except BaseException:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+        self._evict()
+
+    def _evict(self):
+        # remove the least recently used files until the store fits
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pickle'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all results, in memory and on disk."""
+        self.memory.clear()
+        if self.directory is not None and os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pickle'):
+                    os.remove(entry.path)
+
+    def call(self, func, *args, version=0, **kwargs):
+        """
+        The result of a function call, computed only if it is not stored.
+
+        Parameters
+        ----------
+        func : function
+            The function.
+        *args, **kwargs
+            Its arguments.
+        version : int, optional
+            Part of the key; increase it when something the fingerprint
+            misses changes, e.g. a data file read by the function.
+
+        Returns
+        -------
+        object
+            The result of ``func(*args, **kwargs)``.
+        """
+        key, bound = _call_key(func, args, kwargs, version)
+        if key is None:
+            return func(*args, **kwargs)
+        found, value = self.get(key)
+        if found:
+            return value
+        probes = []
+        if bound is not None:
+            # a None seed becomes a fresh one that records whether it is used
+            for name in SEED_ARGUMENTS:
+                if name in bound.arguments and bound.arguments[name] is None:
+                    bound.arguments[name] = _SeedProbe()
+                    probes.append(bound.arguments[name])
+            args, kwargs = bound.args, bound.kwargs
+        value = func(*args, **kwargs)
+        if not any(probe.used for probe in probes):
+            self.put(key, value)
+        return value
+
+
+class _SeedProbe(np.random.SeedSequence):
+    # a fresh seed sequence noting whether random numbers were drawn from it
+    used = False
+
+    def generate_state(self, *args, **kwargs):
+        self.used = True
+        return super().generate_state(*args, **kwargs)
+
+    def spawn(self, *args, **kwargs):
+        self.used = True
+        return super().spawn(*args, **kwargs)
+
+
+def _call_key(func, args, kwargs, version):
+    # fingerprint of a call with all arguments bound to their names, so
+    # positional, keyword and default arguments give the same key; also
+    # returns the bound arguments (None if the signature is unknown)
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return fingerprint(func, version, {'args': args, 'kwargs': kwargs}), None
+    bound.apply_defaults()
+    return fingerprint(func, version, dict(bound.arguments)), bound
+
+
+_default = None
+
+
+def default_cache():
+    """The cache shared by the ``cached`` functions of this process."""
+    global _default
+    if _default is None:
+        _default = ResultCache(os.environ.get('RESULT_CACHE_DIR', CACHE_DIR))
+    return _default
+
+
+def cached(func=None, *, cache=None, version=0):
+    """
+    Wrap a function so that its results are cached.
+
+    Parameters
+    ----------
+    func : function
+        The function; without it, a decorator is returned.
+    cache : ResultCache, optional
+        Defaults to the shared cache (see ``default_cache``).
+    version : int, optional
+        Increase it to invalidate the results when something the fingerprint
+        misses changes (see the module docstring).
+
+    Returns
+    -------
+    function
+    """
+    if func is None:
+        return functools.partial(cached, cache=cache, version=version)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return (cache or default_cache()).call(func, *args, version=version,
+                                               **kwargs)
+    return wrapper